@@ -1,8 +1,10 @@
 import os
 import time
-import pickle as pkl
 import argparse
-from utils import download_audio_from_youtube, run_whisper, print_segments, model_to_answer_choose, chatbot_interface, get_API_KEY_env, check_ollama_models, setup_alias
+import threading
+import json
+import math
+from utils import download_audio_from_youtube, transcribe_with_cache, load_transcript_cache, model_to_answer_incremental, model_to_answer_choose, model_to_answer_chunked, chatbot_interface, resolve_provider, setup_alias, setup_alias_once, get_cache_dir, expand_urls, run_pipeline, set_llm_cache_enabled, llm_cache_stats, migrate_all_segment_pickles, search_index, index_notes, reindex_cache, format_timestamp, get_whisper_model, parse_youtube_video_id, load_caption_transcript, parse_timestamp, parse_time_range, normalize_time_ranges, format_time_range, get_range_name, split_range_name, split_caption_name, slice_transcript, get_video_details, transcribe_time_ranges, atomic_write, get_cache_manager, compact_segments, get_provider_router, CACHE_EVICTION_ORDER, RunReport, set_run_report, use_run_report, write_run_report, print_run_report, aggregate_reports, report_stage, report_cache
 from colorama import Fore, Style, init
 import sys
 import locale
@@ -18,81 +20,449 @@ os.environ["PYTHONIOENCODING"] = "utf-8"
 
 os.environ["TOKENIZERS_PARALLELISM"] = "False"
 
-def main():
-    setup_alias()
-    parser = argparse.ArgumentParser(description="A script that downloads audio from YouTube videos and converts it to text.")
-    parser.add_argument("youtube_url", type=str, help="YouTube URL to be processed")
-    parser.add_argument("--provider", type=str, default="openrouter", choices=["openrouter", "gemini", "ollama"], help="LLM provider to be used (default: openrouter)")
+def add_common_arguments(parser):
+    parser.add_argument("--provider", type=str, default="openrouter", choices=["openrouter", "gemini", "ollama", "auto"], help="LLM provider to be used; auto routes each request to the fastest healthy configured provider (default: openrouter)")
+    parser.add_argument("--hedge", action="store_true", help="With --provider auto, send a second request to the next provider when the first is slower than its usual latency, keep the first answer and cancel the other.")
+    parser.add_argument("--hedge_percentile", type=float, default=None, help="Latency percentile of the first provider after which the hedged request is sent (default: AI_NOTER_HEDGE_PERCENTILE or 0.9)")
     parser.add_argument("--use_ollama", action="store_true", help="Enable Ollama usage (shortcut for --provider ollama).")
     parser.add_argument("--ollama_model_name", type=str, default="deepseek-r1:14b", help="Ollama model to be used (default: deepseek-r1:14b)")
     parser.add_argument("--openrouter_model_name", type=str, default="tencent/hy3:free", help="OpenRouter model to be used (default: tencent/hy3:free)")
+    parser.add_argument("--audio_format", type=str, default="native", choices=["native", "pcm", "mp3"], help="How downloaded audio is stored: native container without re-encoding, 16 kHz mono float32 PCM decoded once, or legacy mp3 (default: native)")
     parser.add_argument("--whisper_model_size", type=str, default="base", help="Whisper model to be used (default: base)")
+    parser.add_argument("--whisper_device", type=str, default="auto", choices=["auto", "cuda", "cpu"], help="Device for Whisper (default: auto, cuda if available otherwise cpu)")
+    parser.add_argument("--whisper_compute_type", type=str, default=None, help="Whisper compute type (default: float16 on cuda, int8 on cpu)")
+    parser.add_argument("--cpu_threads", type=int, default=0, help="Number of CPU threads for Whisper on cpu (default: 0, ctranslate2 default)")
+    parser.add_argument("--num_workers", type=int, default=1, help="Number of parallel Whisper workers sharing the model (default: 1)")
+    parser.add_argument("--parallel_processes", type=int, default=0, help="Split long audio at silences and transcribe the chunks in this many processes, each with its own model (default: 0, disabled)")
+    parser.add_argument("--transcript_source", type=str, default="auto", choices=["auto", "captions", "whisper"], help="Use existing YouTube captions when available (auto), require them (captions) or always run Whisper (whisper) (default: auto)")
     parser.add_argument("--language", type=str, default="tr", help="Language for Whisper transcription (default: None, auto-detect)")
+    parser.add_argument("--chunked", action="store_true", help="Summarize long transcripts chunk by chunk in parallel, then merge the partial notes (map-reduce).")
+    parser.add_argument("--chunk_tokens", type=int, default=6000, help="Approximate token budget per chunk in chunked mode (default: 6000)")
+    parser.add_argument("--chunk_minutes", type=float, default=20, help="Maximum audio duration per chunk in minutes in chunked mode (default: 20)")
+    parser.add_argument("--compact", type=int, default=0, choices=[0, 1, 2, 3], help="Compact the transcript before the LLM call: 1 merges fragments and drops filler sounds and repeated words, 2 also drops discourse fillers, 3 also drops near-duplicate sentences (default: 0, off)")
+    parser.add_argument("--max_workers", type=int, default=4, help="Number of parallel LLM requests in chunked and incremental modes (default: 4)")
+    parser.add_argument("--no_llm_cache", action="store_true", help="Do not read or write the persistent LLM response cache.")
+    parser.add_argument("--report", type=str, default=None, help="Path of the JSON run report (default: ~/.ai_noter_cache/reports/<time>_<name>.json)")
+    parser.add_argument("--report_table", action="store_true", help="Print a summary table of stage timings, cache hits, retries and token usage at the end.")
+
+def resolve_llm(args):
+    """Sağlayıcıyı, model adını ve API anahtarını argümanlardan belirler."""
+    provider = "ollama" if args.use_ollama else args.provider
+    model_names = {"ollama": args.ollama_model_name, "openrouter": args.openrouter_model_name}
+    if provider == "auto":
+        router = get_provider_router()
+        router.hedge = router.hedge or args.hedge
+        if args.hedge_percentile is not None:
+            router.hedge_percentile = args.hedge_percentile
+    return resolve_provider(provider, model_names.get(provider), model_names=model_names)
+
+def whisper_options(args):
+    return dict(model_name=args.whisper_model_size, device=args.whisper_device, compute_type=args.whisper_compute_type,
+                cpu_threads=args.cpu_threads, num_workers=args.num_workers, parallel_processes=args.parallel_processes)
+
+def transcribe(audio_path, video_cache_path, args, title=None, consume=None):
+    return transcribe_with_cache(audio_path, video_cache_path, title=title, consume=consume, **whisper_options(args))
+
+def get_time_ranges(args):
+    """--range ve --start/--end argümanlarından (başlangıç, bitiş) listesi; aralık verilmediyse boş liste."""
+    ranges = list(args.range or [])
+    if args.start is not None or args.end is not None:
+        ranges.append((args.start or 0.0, args.end if args.end is not None else math.inf))
+    return ranges
+
+def fetch_captions(url, video_cache_path, args, language=None):
+    """
+    --transcript_source'a göre videonun altyazılarını dener ve (video_id, başlık, transkript, info) döndürür.
+    Altyazı yoksa transkript None olur; info, ses indirilirken yeniden kullanılır.
+    language verilmezse --language kullanılır; sunucu işleri kendi dillerini verir.
+    """
+    if args.transcript_source == "whisper":
+        return None, None, None, None
+    # Yalnızca auto modunda önbellekteki Whisper transkripti altyazının yerine geçebilir
+    video_name, title, transcript, info = load_caption_transcript(url, video_cache_path, language=language or args.language,
+                                                                  allow_whisper=args.transcript_source == "auto")
+    if transcript is None and args.transcript_source == "captions":
+        raise RuntimeError(f"Bu video için uygun altyazı bulunamadı: {url}")
+    return video_name, title, transcript, info
+
+def save_notes(notes, note_path, video_name):
+    with atomic_write(note_path) as file:
+        file.write(notes)
+    try:
+        index_notes(video_name, notes)
+    except Exception as e:
+        print(Fore.YELLOW + "Notlar arama indeksine eklenemedi:", e)
+
+def generate_notes(segments, language, args, provider, llm_model_name, api_key, stream=False):
+    segments = compact_segments(segments, language=language, level=args.compact)
+    if args.chunked:
+        return model_to_answer_chunked(segments, model_name=llm_model_name, language=language, provider=provider, api_key=api_key,
+                                       max_tokens=args.chunk_tokens, max_seconds=args.chunk_minutes * 60, max_workers=args.max_workers, stream=stream)
+    full_text = "".join([segment[2] for segment in segments])
+    return model_to_answer_choose(full_text, model_name=llm_model_name, prompt=None, language=language, provider=provider, api_key=api_key, stream=stream)
+
+def finish_run_report(report, args):
+    data = report.to_dict()
+    path = write_run_report(data, args.report)
+    if args.report_table:
+        print_run_report(data)
+    print(Fore.YELLOW + f"Çalıştırma raporu: {path}")
+    return data
+
+def print_llm_cache_stats():
+    stats = llm_cache_stats()
+    if stats["hits"] or stats["misses"]:
+        print(Fore.YELLOW + f"LLM önbelleği: {stats['hits']} isabet, {stats['misses']} ıskalama ({stats['entries']} kayıt, {stats['bytes'] / 1024 / 1024:.1f} MB)")
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(prog="ai_noter batch", description="Processes many YouTube videos with a pipelined download -> transcribe -> summarize scheduler.")
+    parser.add_argument("inputs", nargs="+", help="YouTube URLs, playlist/channel URLs or text files with one URL per line")
+    add_common_arguments(parser)
+    parser.add_argument("--download_workers", type=int, default=2, help="Number of parallel downloads (default: 2)")
+    parser.add_argument("--transcribe_workers", type=int, default=1, help="Number of parallel Whisper transcriptions (default: 1)")
+    parser.add_argument("--llm_workers", type=int, default=4, help="Number of parallel note generations (default: 4)")
+    parser.add_argument("--queue_size", type=int, default=2, help="Maximum number of items waiting between two stages (default: 2)")
+    args = parser.parse_args(argv)
+    for option in ("download_workers", "transcribe_workers", "llm_workers", "queue_size"):
+        if getattr(args, option) < 1:
+            parser.error(f"--{option} must be at least 1")
+    set_llm_cache_enabled(not args.no_llm_cache)
+
+    video_cache_path = get_cache_dir()
+    provider, llm_model_name, api_key = resolve_llm(args)
+    urls = expand_urls(args.inputs)
+    print(Fore.GREEN + f"{len(urls)} video işlenecek.")
+
+    def instrumented(stage_function):
+        def run(job):
+            with use_run_report(job["report"]):
+                return stage_function(job)
+        return run
+
+    def download_stage(job):
+        video_name, title, transcript, info = fetch_captions(job["url"], video_cache_path, args)
+        if transcript is not None:
+            print(Fore.GREEN + f"[Altyazı] {title}")
+            _, segments, language = transcript
+            job.update(title=title, video_name=video_name, segments=segments, language=args.language if args.language != "None" else language)
+            return job
+        audio_path, title = download_audio_from_youtube(job["url"], video_cache_path, audio_format=args.audio_format, info=info)
+        if audio_path is None:
+            raise RuntimeError(f"Ses indirilemedi: {job['url']}")
+        print(Fore.GREEN + f"[İndirildi] {title}")
+        job.update(audio_path=audio_path, title=title, video_name=os.path.basename(audio_path).split(".")[0])
+        return job
+
+    def transcribe_stage(job):
+        if "segments" in job:
+            return job
+        _, segments, language = transcribe(job["audio_path"], video_cache_path, args, title=job["title"])
+        print(Fore.GREEN + f"[Transkript] {job['title']}")
+        job.update(segments=segments, language=args.language if args.language != "None" else language)
+        return job
+
+    def notes_stage(job):
+        notes = generate_notes(job.pop("segments"), job["language"], args, provider, llm_model_name, api_key)
+        note_path = os.path.join(video_cache_path, f"{job['video_name']}_notes.txt")
+        save_notes(notes, note_path, job["video_name"])
+        print(Fore.CYAN + f"[Notlar] {job['title']} -> {note_path}")
+        job["note_path"] = note_path
+        return job
+
+    start_time = time.time()
+    results = run_pipeline(
+        [{"url": url, "report": RunReport(name=parse_youtube_video_id(url) or url)} for url in urls],
+        [
+            ("download", instrumented(download_stage), args.download_workers),
+            ("transcribe", instrumented(transcribe_stage), args.transcribe_workers),
+            ("notes", instrumented(notes_stage), args.llm_workers),
+        ],
+        queue_size=args.queue_size,
+    )
+
+    failed = [(job, error) for job, error in results if error is not None]
+    print(Fore.GREEN + f"\n{len(results) - len(failed)}/{len(results)} video {time.time() - start_time:.1f} saniyede işlendi.")
+    for job, (stage, error) in failed:
+        print(Fore.RED + f"  {job['url']} [{stage}]: {error}")
+    print_llm_cache_stats()
+
+    runs = []
+    for job, error in results:
+        run = job["report"].to_dict()
+        run["info"].update(url=job["url"], title=job.get("title"), error=list(error) if error else None)
+        runs.append(run)
+    aggregate = aggregate_reports(runs)
+    aggregate["wall_seconds"] = time.time() - start_time
+    path = write_run_report({"name": "batch", **aggregate, "reports": runs}, args.report)
+    if args.report_table:
+        print_run_report(aggregate)
+    print(Fore.YELLOW + f"Batch raporu: {path}")
+
+def cache_main(argv):
+    parser = argparse.ArgumentParser(prog="ai_noter cache", description="Manages the ~/.ai_noter_cache directory.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("migrate", help="Convert legacy <id>_segments.pkl transcripts to the columnar transcript store")
+    subparsers.add_parser("stats", help="Show the size of each cache category and the byte budget")
+    prune_parser = subparsers.add_parser("prune", help="Evict least recently used entries (audio first) until the cache fits the budget")
+    prune_parser.add_argument("--max_gb", type=float, default=None, help="Byte budget in GB (default: AI_NOTER_CACHE_MAX_GB or 20)")
+    prune_parser.add_argument("--dry_run", action="store_true", help="Only list the entries that would be removed")
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        migrated = migrate_all_segment_pickles(get_cache_dir())
+        print(Fore.GREEN + f"{len(migrated)} transkript taşındı.")
+    elif args.command == "stats":
+        stats = get_cache_manager().stats()
+        print(Fore.CYAN + f"Önbellek: {stats['root']}")
+        for category, data in sorted(stats["categories"].items(), key=lambda item: -item[1]["bytes"]):
+            evictable = "" if category in CACHE_EVICTION_ORDER else " (tahliye edilmez)"
+            print(f"  {category:<12}{data['entries']:>8} kayıt{data['bytes'] / 1024 ** 2:>12.1f} MB{evictable}")
+        print(Fore.GREEN + f"Toplam: {stats['total_bytes'] / 1024 ** 3:.2f} GB / bütçe {stats['max_bytes'] / 1024 ** 3:.2f} GB")
+    elif args.command == "prune":
+        max_bytes = None if args.max_gb is None else int(args.max_gb * 1024 ** 3)
+        removed = get_cache_manager().prune(max_bytes=max_bytes, dry_run=args.dry_run)
+        for entry in removed:
+            print(f"  {entry['category']:<12}{entry['bytes'] / 1024 ** 2:>10.1f} MB  {entry['name']}")
+        action = "silinecek" if args.dry_run else "silindi"
+        print(Fore.GREEN + f"{len(removed)} kayıt {action} ({sum(entry['bytes'] for entry in removed) / 1024 ** 2:.1f} MB).")
+
+def search_main(argv):
+    parser = argparse.ArgumentParser(prog="ai_noter search", description="Searches all cached transcripts and notes.")
+    parser.add_argument("query", nargs="*", help="Words to search for")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of results per type (default: 20)")
+    parser.add_argument("--no_notes", action="store_true", help="Search only transcripts, not notes")
+    parser.add_argument("--reindex", action="store_true", help="Rebuild the index from every cached transcript and note before searching")
+    args = parser.parse_args(argv)
+
+    if args.reindex:
+        count = reindex_cache(get_cache_dir())
+        print(Fore.GREEN + f"{count} video indekslendi.")
+    if not args.query:
+        return
+
+    start_time = time.perf_counter()
+    results = search_index(" ".join(args.query), limit=args.limit, include_notes=not args.no_notes)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+
+    for result in results:
+        title = result["title"] or result["video_id"]
+        if result["type"] == "transcript":
+            video_id = split_caption_name(split_range_name(result["video_id"])[0])[0]
+            link = f"https://www.youtube.com/watch?v={video_id}&t={int(result['start'])}s"
+            print(Fore.GREEN + f"{title} [{format_timestamp(result['start'])} - {format_timestamp(result['end'])}] {link}")
+            print(f"   {result['snippet'].strip()}")
+            if result["words"]:
+                print(Fore.YELLOW + "   " + ", ".join(f"{word} @ {word_start:.2f}s" for word_start, _, word in result["words"]))
+        else:
+            print(Fore.CYAN + f"{title} [notlar] ({result['video_id']})")
+            print(f"   {result['snippet'].strip()}")
+    print(Fore.MAGENTA + f"{len(results)} sonuç, {elapsed_ms:.1f} ms")
+
+def report_main(argv):
+    parser = argparse.ArgumentParser(prog="ai_noter report", description="Aggregates JSON run reports and prints a summary table.")
+    parser.add_argument("paths", nargs="+", help="Run report JSON files (batch reports contribute each of their runs)")
+    parser.add_argument("--output", type=str, default=None, help="Write the aggregated report as JSON to this path")
+    args = parser.parse_args(argv)
+
+    runs = []
+    for path in args.paths:
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        runs.extend(data.get("reports") or [data])
+    aggregate = aggregate_reports(runs)
+    print_run_report(aggregate)
+    if args.output:
+        write_run_report(aggregate, args.output)
+
+def serve_main(argv):
+    from server import make_server
+    parser = argparse.ArgumentParser(prog="ai_noter serve", description="Runs a long-lived HTTP service that queues note jobs and keeps models warm.")
+    add_common_arguments(parser)
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--workers", type=int, default=2, help="Number of jobs processed at the same time (default: 2)")
+    parser.add_argument("--transcribe_workers", type=int, default=1, help="Number of parallel Whisper transcriptions across jobs (default: 1)")
+    parser.add_argument("--max_pending", type=int, default=32, help="Maximum number of queued jobs before new ones are rejected (default: 32)")
+    parser.add_argument("--no_preload", action="store_true", help="Do not load the Whisper model at startup.")
+    args = parser.parse_args(argv)
+    set_llm_cache_enabled(not args.no_llm_cache)
+
+    video_cache_path = get_cache_dir()
+    transcribe_slots = threading.Semaphore(max(1, args.transcribe_workers))
+    video_locks = {}
+    video_locks_lock = threading.Lock()
+    default_provider = "ollama" if args.use_ollama else args.provider
+
+    def job_llm(params):
+        provider = params.get("provider", default_provider)
+        overrides = {"provider": provider, "use_ollama": False}
+        if params.get("model"):
+            overrides["ollama_model_name" if provider == "ollama" else "openrouter_model_name"] = params["model"]
+        return resolve_llm(argparse.Namespace(**{**vars(args), **overrides}))
+
+    def video_lock(url):
+        key = parse_youtube_video_id(url) or url
+        with video_locks_lock:
+            return video_locks.setdefault(key, threading.Lock())
+
+    def process(params):
+        report = RunReport(name=parse_youtube_video_id(params["url"]) if params.get("url") else "text")
+        with use_run_report(report):
+            result = process_job(params)
+        result["report"] = report.to_dict()
+        return result
+
+    def process_job(params):
+        provider, llm_model_name, api_key = job_llm(params)
+        language = params.get("language", args.language)
+        if params.get("text"):
+            notes = model_to_answer_choose(params["text"], model_name=llm_model_name, prompt=None, language=language, provider=provider, api_key=api_key)
+            return {"notes": notes, "provider": provider, "model": llm_model_name}
+
+        # Aynı videoyu farklı modellerle isteyen işler indirme ve transkripti paylaşsın
+        with video_lock(params["url"]):
+            video_name, title, cached_transcript, info = fetch_captions(params["url"], video_cache_path, args, language=language)
+            if cached_transcript is None:
+                audio_path, title = download_audio_from_youtube(params["url"], video_cache_path, audio_format=args.audio_format, info=info)
+                if audio_path is None:
+                    raise RuntimeError(f"Ses indirilemedi: {params['url']}")
+                video_name = os.path.basename(audio_path).split(".")[0]
+                cached_transcript = load_transcript_cache(audio_path, video_cache_path, title=title)
+            if cached_transcript is None:
+                with transcribe_slots:
+                    cached_transcript = transcribe(audio_path, video_cache_path, args, title=title)
+        _, segments, whisper_language = cached_transcript
+        language = language if language != "None" else whisper_language
+
+        notes = generate_notes(segments, language, args, provider, llm_model_name, api_key)
+        note_path = os.path.join(video_cache_path, f"{video_name}_notes.txt")
+        save_notes(notes, note_path, video_name)
+        print(Fore.CYAN + f"[Notlar] {title} -> {note_path}")
+        return {"notes": notes, "title": title, "video_id": video_name, "note_path": note_path, "language": language,
+                "provider": provider, "model": llm_model_name}
+
+    if not args.no_preload:
+        print(Fore.YELLOW + f"Whisper modeli yükleniyor: {args.whisper_model_size}")
+        get_whisper_model(args.whisper_model_size, device=args.whisper_device, compute_type=args.whisper_compute_type,
+                          cpu_threads=args.cpu_threads, num_workers=args.num_workers)
+
+    httpd = make_server(process, host=args.host, port=args.port, workers=args.workers, max_pending=args.max_pending)
+    print(Fore.GREEN + f"Sunucu http://{args.host}:{args.port} adresinde dinliyor.")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        return batch_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "cache":
+        return cache_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "search":
+        return search_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        return serve_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "report":
+        return report_main(sys.argv[2:])
+    if len(sys.argv) > 1 and sys.argv[1] == "setup":
+        return setup_alias()
+
+    setup_alias_once()
+    parser = argparse.ArgumentParser(description="A script that downloads audio from YouTube videos and converts it to text.")
+    parser.add_argument("youtube_url", type=str, help="YouTube URL to be processed")
+    add_common_arguments(parser)
+    parser.add_argument("--incremental", action="store_true", help="Stream the transcription and summarize each completed time window while Whisper is still running.")
+    parser.add_argument("--window_minutes", type=float, default=5, help="Audio duration per window in incremental mode in minutes (default: 5)")
+    parser.add_argument("--no_stream", action="store_true", help="Wait for the complete LLM response instead of printing tokens as they arrive.")
+    parser.add_argument("--start", type=parse_timestamp, default=None, help="Process the video from this time on, e.g. 1:02:00 (default: beginning)")
+    parser.add_argument("--end", type=parse_timestamp, default=None, help="Process the video up to this time, e.g. 1:12:00 (default: end)")
+    parser.add_argument("--range", type=parse_time_range, action="append", default=None, metavar="START-END", help="Time range to process, e.g. 10:00-20:00; can be given multiple times")
     args = parser.parse_args()
-    
-    username = os.environ.get("USER")
-    video_cache_path = f"/home/{username}/.ai_noter_cache"
-    os.makedirs(video_cache_path, exist_ok=True)
-    
-    # yt_start_time = time.time()
-    WHISPER_MODEL_NAME = args.whisper_model_size
+    if args.incremental and (args.parallel_processes > 1 or get_time_ranges(args)):
+        parser.error("--incremental cannot be combined with --parallel_processes or --range/--start/--end")
+    set_llm_cache_enabled(not args.no_llm_cache)
+
+    video_cache_path = get_cache_dir()
+
     VIDEO_URL = args.youtube_url
-    PROVIDER = "ollama" if args.use_ollama else args.provider
     LANGUAGE = args.language
-    API_KEY = None
+    PROVIDER, LLM_MODEL_NAME, API_KEY = resolve_llm(args)
 
-    if PROVIDER == "ollama":
-        # Check models and ensure the specified model is installed
-        installed_models = check_ollama_models()
-        if args.ollama_model_name not in installed_models:
-            raise ValueError(f"The specified model '{args.ollama_model_name}' is not installed in Ollama.")
+    report = RunReport(name=parse_youtube_video_id(VIDEO_URL) or "run")
+    report.info.update(url=VIDEO_URL, provider=PROVIDER, model=LLM_MODEL_NAME, whisper_model=args.whisper_model_size)
+    set_run_report(report)
+    try:
+        video_name, title, cached_transcript, info = fetch_captions(VIDEO_URL, video_cache_path, args)
+        time_ranges = get_time_ranges(args)
+        if time_ranges:
+            # Yalnızca istenen aralıklar indirilir/yazıya dökülür; notlar ve transkriptler aralık adıyla saklanır
+            video_id, title, duration, info = get_video_details(VIDEO_URL, video_cache_path, info=info)
+            time_ranges = normalize_time_ranges(time_ranges, duration)
+            video_name = get_range_name(video_id, time_ranges)
+            report.info["ranges"] = [[start, None if math.isinf(end) else end] for start, end in time_ranges]
+            print(Fore.GREEN + "Aralıklar: " + ", ".join(format_time_range(start, end) for start, end in time_ranges))
+            if cached_transcript is not None:
+                cached_transcript = slice_transcript(cached_transcript, time_ranges)
+            else:
+                cached_transcript = transcribe_time_ranges(VIDEO_URL, video_id, time_ranges, video_cache_path, info=info, title=title, **whisper_options(args))
+        elif cached_transcript is None:
+            audio_path, title = download_audio_from_youtube(VIDEO_URL, video_cache_path, audio_format=args.audio_format, info=info)
+            if audio_path is None:
+                print(Fore.RED + f"Ses indirilemedi: {VIDEO_URL}")
+                return
+            video_name = os.path.basename(audio_path).split(".")[0]
+            cached_transcript = load_transcript_cache(audio_path, video_cache_path, title=title)
+            if cached_transcript is not None:
+                report_cache("segments", True)
+        print(Fore.GREEN + f"Video name:\n {title}\n")
+        report.name = video_name
+        report.info["title"] = title
+
+        STREAM = not args.no_stream
+        incremental_notes = []
+        if args.incremental and cached_transcript is None:
+            def summarize_while_transcribing(word_segments, whisper_language):
+                window_language = LANGUAGE if LANGUAGE != "None" else whisper_language
+                # Transkripsiyon ve pencere özetleri iç içe çalıştığı için tek aşama olarak ölçülür
+                with report_stage("incremental"):
+                    word_by_word_segments, segments, notes = model_to_answer_incremental(
+                        word_segments, model_name=LLM_MODEL_NAME, language=window_language, provider=PROVIDER, api_key=API_KEY,
+                        window_seconds=args.window_minutes * 60, max_workers=args.max_workers, max_tokens=args.chunk_tokens, compact=args.compact, stream=STREAM)
+                incremental_notes.append(notes)
+                return word_by_word_segments, segments
+
+            # Başka bir süreç aynı videoyu bu arada yazıya döktüyse consume çağrılmaz ve notlar aşağıda üretilir
+            word_by_word_segments, segments, language = transcribe(audio_path, video_cache_path, args, title=title, consume=summarize_while_transcribing)
         else:
-            LLM_MODEL_NAME = args.ollama_model_name
-    elif PROVIDER == "gemini":
-        GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") or get_API_KEY_env("GOOGLE_API_KEY")
-        if not GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY is not set. Please set it in the environment variables or .env file.")
-        API_KEY = GOOGLE_API_KEY
-        LLM_MODEL_NAME = "gemini-2.5-flash"
-    else:  # openrouter
-        OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY") or get_API_KEY_env("OPENROUTER_API_KEY")
-        if not OPENROUTER_API_KEY:
-            raise ValueError("OPENROUTER_API_KEY is not set. Please set it in the environment variables or .env file.")
-        API_KEY = OPENROUTER_API_KEY
-        LLM_MODEL_NAME = args.openrouter_model_name
-
-    audio_path, title = download_audio_from_youtube(VIDEO_URL, video_cache_path)
-    print(Fore.GREEN + f"Video name:\n {title}\n")
-    
-    video_name = os.path.basename(audio_path).split(".")[0]
-
-    whisper_pkl_path = os.path.join(video_cache_path, f"{video_name}_segments.pkl")
-    
-    if os.path.exists(whisper_pkl_path):
-        with open(whisper_pkl_path, "rb") as file:
-            word_by_word_segments, segments, language = pkl.load(file)
-    else:
-        word_segments, language = run_whisper(input_file=audio_path, word_timestamps=True, model_name=WHISPER_MODEL_NAME)
-        word_by_word_segments, segments = print_segments(word_segments)
-        pkl.dump([word_by_word_segments, segments, language], open(whisper_pkl_path, "wb"))
-    
-    full_text = "".join([segment[2] for segment in segments])
-    language = LANGUAGE if LANGUAGE != "None" else language
-    extracted_notes = model_to_answer_choose(full_text, model_name=LLM_MODEL_NAME, prompt=None, language=language, provider=PROVIDER, api_key=API_KEY)
-    print(Fore.CYAN + "Notes: \n", extracted_notes)
-
-    note_path = os.path.join(video_cache_path, f"{video_name}_notes.txt")
-
-    print(Fore.MAGENTA + "[Chatbot]: Do you want AI to edit the notes (yes/no):")
-    print(Fore.CYAN + "[Kullanıcı]: ", end="")
-    user_feedback = input()
-    if user_feedback.lower() == "y" or user_feedback.lower() == "yes":
-        extracted_notes = chatbot_interface(extracted_notes, full_text, language, provider=PROVIDER, model_name=LLM_MODEL_NAME, api_key=API_KEY)
-    else:
-        print(Fore.GREEN, "Notes saved.")
-
-    with open(note_path, "w") as file:
-        file.write(extracted_notes)
-    
+            word_by_word_segments, segments, language = cached_transcript or transcribe(audio_path, video_cache_path, args, title=title)
+        language = LANGUAGE if LANGUAGE != "None" else language
+        if incremental_notes:
+            extracted_notes = incremental_notes[0]
+        else:
+            if STREAM:
+                print(Fore.CYAN + "Notes: ")
+            extracted_notes = generate_notes(segments, language, args, PROVIDER, LLM_MODEL_NAME, API_KEY, stream=STREAM)
+
+        full_text = "".join([segment[2] for segment in segments])
+        if not STREAM:
+            print(Fore.CYAN + "Notes: \n", extracted_notes)
+        print_llm_cache_stats()
+
+        note_path = os.path.join(video_cache_path, f"{video_name}_notes.txt")
+
+        print(Fore.MAGENTA + "[Chatbot]: Do you want AI to edit the notes (yes/no):")
+        print(Fore.CYAN + "[Kullanıcı]: ", end="")
+        user_feedback = input()
+        if user_feedback.lower() == "y" or user_feedback.lower() == "yes":
+            extracted_notes = chatbot_interface(extracted_notes, full_text, language, provider=PROVIDER, model_name=LLM_MODEL_NAME, api_key=API_KEY, stream=STREAM, segments=segments)
+        else:
+            print(Fore.GREEN, "Notes saved.")
+
+        save_notes(extracted_notes, note_path, video_name)
+    finally:
+        finish_run_report(report, args)
+
 if __name__ == "__main__":
     main()
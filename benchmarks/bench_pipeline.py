@@ -0,0 +1,321 @@
+"""
+Transkripsiyon ve LLM aşamaları için ağ gerektirmeyen benchmark.
+
+Her grup temiz bir süreçte ve geçici bir HOME ile çalışır; böylece bellek ölçümü gruba özgü olur,
+kullanıcının ~/.ai_noter_cache klasörüne dokunulmaz. LLM çağrıları yerel bir stub sunucusuna gider.
+
+    python benchmarks/bench_pipeline.py --output before.json
+    python benchmarks/bench_pipeline.py --whisper_compute_type int8_float32 --compare before.json
+
+Gruplar:
+  whisper         sentetik (ya da --audio ile verilen) seste model yükleme süresi ve gerçek zaman faktörü
+  print_segments  sahte Whisper segmentlerini listeye çevirme hızı
+  compaction      compact_segments süresi ve seviyelere göre token azalması
+  cache_load      sütunlu transkript deposunu açma/okuma ve eski pickle ile karşılaştırma
+  llm             model_to_answer_choose gecikmesi, eş zamanlı çağrılarda verim ve önbellek isabeti
+  router          yavaş (OpenRouter) ve hızlı (Ollama) iki stub arasında provider="auto" gecikmesi, hedge ile ve hedge'siz
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+BENCHMARK_DIR = os.path.dirname(os.path.realpath(__file__))
+
+GROUPS = ["whisper", "print_segments", "compaction", "cache_load", "llm", "router"]
+
+def metric(value, unit, better="lower"):
+    return {"value": value, "unit": unit, "better": better}
+
+def timed(function, repeat=1):
+    """function'ı repeat kez çalıştırır, (medyan süre, son sonuç) döndürür."""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+def bench_whisper(options, work_dir):
+    import utils
+    from fixtures import write_pcm_fixture
+
+    utils.VAD_PARAMETERS["min_silence_duration_ms"] = options["vad_min_silence_ms"]
+    results = {}
+    start = time.perf_counter()
+    try:
+        utils.get_whisper_model(options["whisper_model_size"], device=options["whisper_device"], compute_type=options["whisper_compute_type"],
+                                cpu_threads=options["cpu_threads"])
+    except Exception as e:
+        # Model yerelde yoksa ve ağ kapalıysa bu grup atlanır
+        return {"skipped": f"Whisper modeli yüklenemedi: {e}"}
+    results["whisper.load_seconds"] = metric(time.perf_counter() - start, "s")
+
+    fixtures = options["audio"] or []
+    if not fixtures:
+        for seconds in options["durations"]:
+            fixtures.append(write_pcm_fixture(os.path.join(work_dir, f"synthetic_{seconds}s.pcm"), seconds))
+
+    for path in fixtures:
+        name = os.path.splitext(os.path.basename(path))[0]
+        duration = len(utils.load_audio(path)) / utils.WHISPER_SAMPLING_RATE if path.endswith(".pcm") else None
+
+        def transcribe():
+            segments, info = utils.get_whisper_model(options["whisper_model_size"], device=options["whisper_device"],
+                                                     compute_type=options["whisper_compute_type"], cpu_threads=options["cpu_threads"]
+                                                     ).transcribe(utils.load_audio(path), vad_filter=True, vad_parameters=utils.VAD_PARAMETERS, word_timestamps=True)
+            return utils.print_segments(segments), info.duration
+
+        elapsed, ((_, segments), info_duration) = timed(transcribe, options["repeat"])
+        duration = duration or info_duration
+        results[f"whisper.{name}.transcribe_seconds"] = metric(elapsed, "s")
+        results[f"whisper.{name}.real_time_factor"] = metric(elapsed / duration, "x")
+        results[f"whisper.{name}.segments"] = metric(len(segments), "count", better="none")
+    return results
+
+def bench_print_segments(options, work_dir):
+    import utils
+    from fixtures import fake_whisper_segments
+
+    results = {}
+    for count in options["segment_counts"]:
+        segments = fake_whisper_segments(count)
+        elapsed, _ = timed(lambda: utils.print_segments(iter(segments)), options["repeat"])
+        results[f"print_segments.{count}.seconds"] = metric(elapsed, "s")
+        results[f"print_segments.{count}.segments_per_second"] = metric(count / elapsed, "1/s", better="higher")
+    return results
+
+def bench_compaction(options, work_dir):
+    import utils
+    from fixtures import fake_whisper_segments
+
+    results = {}
+    for count in options["segment_counts"]:
+        _, segments = utils.print_segments(iter(fake_whisper_segments(count)))
+        tokens_before = utils.estimate_tokens("".join(segment[2] for segment in segments))
+        for level in (1, 2, 3):
+            elapsed, compacted = timed(lambda: utils.compact_segments(segments, language="en", level=level), options["repeat"])
+            tokens_after = utils.estimate_tokens("".join(segment[2] for segment in compacted))
+            results[f"compaction.{count}.level{level}.seconds"] = metric(elapsed, "s")
+            results[f"compaction.{count}.level{level}.token_ratio"] = metric(tokens_after / tokens_before, "ratio")
+    return results
+
+def bench_cache_load(options, work_dir):
+    import pickle
+    import utils
+    from fixtures import fake_whisper_segments
+
+    results = {}
+    cache_dir = utils.get_cache_dir()
+    for count in options["segment_counts"]:
+        word_by_word_segments, segments = utils.print_segments(fake_whisper_segments(count))
+        audio_path = os.path.join(cache_dir, "audio_files", f"bench{count}.pcm")
+
+        elapsed, _ = timed(lambda: utils.save_transcript_cache(audio_path, cache_dir, word_by_word_segments, segments, "tr"))
+        results[f"cache_load.{count}.save_seconds"] = metric(elapsed, "s")
+        elapsed, _ = timed(lambda: utils.load_transcript_store(audio_path, cache_dir), options["repeat"])
+        results[f"cache_load.{count}.open_store_seconds"] = metric(elapsed, "s")
+        elapsed, _ = timed(lambda: utils.load_transcript_cache(audio_path, cache_dir), options["repeat"])
+        results[f"cache_load.{count}.load_lists_seconds"] = metric(elapsed, "s")
+
+        # Eski format ile karşılaştırma
+        pickle_path = os.path.join(work_dir, f"bench{count}_segments.pkl")
+        with open(pickle_path, "wb") as file:
+            pickle.dump((word_by_word_segments, segments, "tr"), file)
+
+        def load_pickle():
+            with open(pickle_path, "rb") as file:
+                return pickle.load(file)
+        elapsed, _ = timed(load_pickle, options["repeat"])
+        results[f"cache_load.{count}.legacy_pickle_seconds"] = metric(elapsed, "s")
+    return results
+
+def bench_llm(options, work_dir):
+    from fixtures import fixed_text, start_stub_llm_server
+
+    server = start_stub_llm_server(options["llm_latency_ms"] / 1000)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["OPENROUTER_BASE_URL"] = base_url
+    os.environ["OLLAMA_HOST"] = base_url
+    import utils
+
+    results = {}
+    for provider in options["providers"]:
+        model_name = "stub"
+        # İlk çağrıdaki içe aktarma ve bağlantı kurulumu ölçüme girmesin
+        utils.set_llm_cache_enabled(False)
+        utils.model_to_answer_choose(fixed_text(100), model_name=model_name, provider=provider, api_key="benchmark")
+        for characters in options["text_sizes"]:
+            text = fixed_text(characters)
+            utils.set_llm_cache_enabled(False)
+            latencies = []
+            for _ in range(options["llm_calls"]):
+                start = time.perf_counter()
+                utils.model_to_answer_choose(text, model_name=model_name, provider=provider, api_key="benchmark")
+                latencies.append(time.perf_counter() - start)
+            prefix = f"llm.{provider}.{characters}"
+            results[f"{prefix}.p50_seconds"] = metric(statistics.median(latencies), "s")
+            results[f"{prefix}.p95_seconds"] = metric(percentile(latencies, 0.95), "s")
+            # Stub gecikmesi dışında kalan istemci tarafı yük
+            results[f"{prefix}.overhead_ms"] = metric((statistics.median(latencies) - options["llm_latency_ms"] / 1000) * 1000, "ms")
+
+            utils.set_llm_cache_enabled(True)
+            utils.model_to_answer_choose(text, model_name=model_name, provider=provider, api_key="benchmark")
+            elapsed, _ = timed(lambda: utils.model_to_answer_choose(text, model_name=model_name, provider=provider, api_key="benchmark"), options["repeat"])
+            results[f"{prefix}.cache_hit_seconds"] = metric(elapsed, "s")
+
+        utils.set_llm_cache_enabled(False)
+        text = fixed_text(options["text_sizes"][0])
+        for concurrency in options["concurrency"]:
+            calls = max(concurrency * 2, options["llm_calls"])
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                list(executor.map(lambda _: utils.model_to_answer_choose(text, model_name=model_name, provider=provider, api_key="benchmark"), range(calls)))
+            results[f"llm.{provider}.concurrency_{concurrency}.calls_per_second"] = metric(calls / (time.perf_counter() - start), "1/s", better="higher")
+    server.shutdown()
+    return results
+
+def bench_router(options, work_dir):
+    from fixtures import fixed_text, start_stub_llm_server
+
+    fast_latency = options["llm_latency_ms"] / 1000
+    slow_latency = fast_latency * options["router_slow_factor"]
+    slow = start_stub_llm_server(slow_latency)
+    fast = start_stub_llm_server(fast_latency)
+    os.environ["OPENROUTER_BASE_URL"] = f"http://127.0.0.1:{slow.server_address[1]}"
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{fast.server_address[1]}"
+    import utils
+
+    utils.set_llm_cache_enabled(False)
+    text = fixed_text(options["text_sizes"][0])
+    routes = [("openrouter", "stub", "benchmark"), ("ollama", "stub", None)]
+    results = {}
+    for hedge in (False, True):
+        # Her ölçüm boş istatistiklerle başlar: ilk çağrı yapılandırma sırasındaki yavaş rotaya gider
+        router = utils.ProviderRouter(routes, hedge=hedge, hedge_after=slow_latency / 2,
+                                      stats_path=os.path.join(work_dir, f"provider_stats_{hedge}.json"))
+        utils._PROVIDER_ROUTER["router"] = router
+        prefix = f"router.{'hedged' if hedge else 'routed'}"
+        start = time.perf_counter()
+        utils.model_to_answer_choose(text, provider="auto")
+        results[f"{prefix}.first_call_seconds"] = metric(time.perf_counter() - start, "s")
+        latencies = []
+        for _ in range(options["llm_calls"]):
+            start = time.perf_counter()
+            utils.model_to_answer_choose(text, provider="auto")
+            latencies.append(time.perf_counter() - start)
+        results[f"{prefix}.p50_seconds"] = metric(statistics.median(latencies), "s")
+        results[f"{prefix}.p95_seconds"] = metric(percentile(latencies, 0.95), "s")
+    slow.shutdown()
+    fast.shutdown()
+    return results
+
+def run_group(name, options):
+    """Grubu yeni bir süreçte, geçici HOME ile çalıştırır."""
+    sys.path[:0] = [PROJECT_DIR, BENCHMARK_DIR]
+    with tempfile.TemporaryDirectory(prefix="ai_noter_bench_") as work_dir:
+        os.environ["HOME"] = work_dir
+        import contextlib
+        import utils
+        start = time.perf_counter()
+        # İlerleme çıktıları ölçümü etkilemesin
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            results = globals()[f"bench_{name}"](options, work_dir)
+        if "skipped" not in results:
+            results[f"{name}.total_seconds"] = metric(time.perf_counter() - start, "s")
+            results[f"{name}.peak_rss_mb"] = metric(utils.get_peak_rss_mb(), "MB")
+        return results
+
+def environment(options):
+    def version(package):
+        try:
+            from importlib.metadata import version as package_version
+            return package_version(package)
+        except Exception:
+            return None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "packages": {package: version(package) for package in ("faster-whisper", "ctranslate2", "numpy", "requests", "ollama")},
+        "options": options,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def compare(previous, current, threshold):
+    """İki sonuç dosyasını karşılaştırır; eşik üstü gerileme varsa True döndürür."""
+    regressed = False
+    print(f"\n{'metric':<52}{'önce':>12}{'sonra':>12}{'değişim':>10}")
+    for name, new in current["results"].items():
+        old = previous["results"].get(name)
+        if old is None or new["better"] == "none" or not old["value"]:
+            continue
+        change = (new["value"] - old["value"]) / abs(old["value"])
+        worse = change > threshold if new["better"] == "lower" else change < -threshold
+        regressed = regressed or worse
+        flag = "  <- gerileme" if worse else ""
+        print(f"{name:<52}{old['value']:>12.4g}{new['value']:>12.4g}{change:>+9.1%}{flag}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for transcription, segment handling, cache loading and LLM calls.")
+    parser.add_argument("--groups", nargs="+", default=GROUPS, choices=GROUPS, help="Benchmark groups to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per measurement, the median is reported (default: 3)")
+    parser.add_argument("--durations", nargs="+", type=int, default=[30, 120, 600], help="Synthetic audio durations in seconds (default: 30 120 600)")
+    parser.add_argument("--audio", nargs="+", default=None, help="Use these audio files instead of synthetic audio for the whisper group")
+    parser.add_argument("--whisper_model_size", type=str, default="tiny", help="Whisper model name or local path (default: tiny)")
+    parser.add_argument("--whisper_device", type=str, default="cpu", help="Whisper device (default: cpu)")
+    parser.add_argument("--whisper_compute_type", type=str, default=None, help="Whisper compute type (default: device default)")
+    parser.add_argument("--cpu_threads", type=int, default=0, help="Whisper CPU threads (default: 0, ctranslate2 default)")
+    parser.add_argument("--vad_min_silence_ms", type=int, default=100, help="VAD min_silence_duration_ms (default: 100)")
+    parser.add_argument("--segment_counts", nargs="+", type=int, default=[1000, 10000], help="Segment counts for print_segments, compaction and cache_load (default: 1000 10000)")
+    parser.add_argument("--providers", nargs="+", default=["openrouter", "ollama"], choices=["openrouter", "ollama"], help="Stubbed providers (default: openrouter ollama)")
+    parser.add_argument("--text_sizes", nargs="+", type=int, default=[2000, 20000, 100000], help="Input text sizes in characters (default: 2000 20000 100000)")
+    parser.add_argument("--llm_latency_ms", type=float, default=200, help="Latency of the stub LLM server in ms (default: 200)")
+    parser.add_argument("--router_slow_factor", type=float, default=10, help="Latency of the slow stub in the router group as a multiple of --llm_latency_ms (default: 10)")
+    parser.add_argument("--llm_calls", type=int, default=5, help="Sequential calls per text size (default: 5)")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 8], help="Concurrency levels for the throughput measurement (default: 1 4 8)")
+    parser.add_argument("--output", type=str, default=None, help="Results path (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--compare", type=str, default=None, help="Compare with an earlier results file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change treated as a regression when comparing (default: 0.10)")
+    args = parser.parse_args()
+
+    options = {key: value for key, value in vars(args).items() if key not in ("groups", "output", "compare", "threshold")}
+    output = {"environment": environment(options), "results": {}, "skipped": {}}
+    for name in args.groups:
+        print(f"[{name}] çalışıyor...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results = executor.submit(run_group, name, options).result()
+        if "skipped" in results:
+            print(f"[{name}] atlandı: {results['skipped']}")
+            output["skipped"][name] = results["skipped"]
+            continue
+        for metric_name, value in results.items():
+            print(f"  {metric_name:<52}{value['value']:>12.4g} {value['unit']}")
+        output["results"].update(results)
+
+    path = args.output or os.path.join(BENCHMARK_DIR, "results", f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(output, file, indent=2)
+    print(f"Sonuçlar: {path}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            previous = json.load(file)
+        sys.exit(1 if compare(previous, output, args.threshold) else 0)
+
+if __name__ == "__main__":
+    main()
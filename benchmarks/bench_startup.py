@@ -0,0 +1,66 @@
+"""
+CLI başlangıç süresi ölçümü.
+
+Her ölçüm yeni bir Python süreci başlatır ve modülü içe aktarır; boş bir yorumlayıcının
+başlangıç süresi çıkarılır. Ağır bağımlılıklardan biri içe aktarma sırasında yüklenirse
+ya da medyan süre bütçeyi aşarsa 1 çıkış koduyla biter.
+
+    python benchmarks/bench_startup.py --budget_ms 150
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# Bu modüller yalnızca kullanıldıkları kod yolunda yüklenmeli
+HEAVY_MODULES = ["yt_dlp", "faster_whisper", "ctranslate2", "onnxruntime", "google.generativeai", "ollama", "requests", "numpy"]
+
+TARGETS = {
+    "utils": "import utils",
+    "ai_noter": "import ai_noter",
+}
+
+def measure(code, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=PROJECT_DIR, check=True, stdout=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def loaded_heavy_modules(code):
+    check = f"{code}\nimport sys, json\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", check], cwd=PROJECT_DIR, check=True, capture_output=True, text=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures import time of the CLI modules and fails on regressions.")
+    parser.add_argument("--runs", type=int, default=7, help="Number of runs per target (default: 7)")
+    parser.add_argument("--budget_ms", type=float, default=150, help="Maximum allowed median import time over a bare interpreter in ms (default: 150)")
+    parser.add_argument("--output", type=str, default=None, help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    baseline = measure("pass", args.runs)
+    results = {"baseline_ms": baseline, "budget_ms": args.budget_ms, "targets": {}}
+    failed = False
+    for name, code in TARGETS.items():
+        import_ms = measure(code, args.runs) - baseline
+        heavy = loaded_heavy_modules(code)
+        ok = import_ms <= args.budget_ms and not heavy
+        failed = failed or not ok
+        results["targets"][name] = {"import_ms": import_ms, "heavy_modules": heavy, "ok": ok}
+        status = "OK" if ok else "FAIL"
+        print(f"[{status}] {name}: {import_ms:.1f} ms (budget {args.budget_ms:.0f} ms)" + (f", heavy modules loaded: {', '.join(heavy)}" if heavy else ""))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Ağ gerektirmeyen benchmark girdileri: sentetik ses, sahte Whisper segmentleri, sabit boyutlu metinler
+ve OpenRouter/Ollama yerine geçen ayarlanabilir gecikmeli yerel bir LLM sunucusu.
+Tüm rastgele üretim sabit tohumla yapılır, böylece iki çalıştırma aynı girdileri kullanır.
+"""
+import json
+import random
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLING_RATE = 16000
+SEED = 1234
+
+Word = namedtuple("Word", ["start", "end", "word", "probability"])
+Segment = namedtuple("Segment", ["start", "end", "text", "words"])
+
+WORDS = ("bugün", "video", "konu", "önemli", "bilgi", "çünkü", "örnek", "sonra", "model", "veri",
+         "today", "the", "important", "because", "example", "then", "data", "system", "people", "time")
+
+def synthesize_speech_like_audio(seconds, seed=SEED, sampling_rate=SAMPLING_RATE):
+    """
+    Konuşmaya benzeyen (harmonikli, perde ve genlik modülasyonlu) 1-4 sn'lik seslerle aralarındaki
+    sessizliklerden oluşan float32 mono ses üretir. VAD ve kodlayıcı yolunu gerçekçi biçimde çalıştırır.
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    total = int(seconds * sampling_rate)
+    audio = np.zeros(total, dtype=np.float32)
+    position = 0
+    while position < total:
+        length = min(int(rng.uniform(1.0, 4.0) * sampling_rate), total - position)
+        t = np.arange(length) / sampling_rate
+        pitch = rng.uniform(100, 220) + 25 * np.sin(2 * np.pi * rng.uniform(2, 5) * t)
+        phase = 2 * np.pi * np.cumsum(pitch) / sampling_rate
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 10))
+        envelope = 0.5 + 0.5 * np.sin(2 * np.pi * rng.uniform(3, 6) * t)
+        burst = 0.15 * voiced * envelope + 0.01 * rng.standard_normal(length)
+        audio[position:position + length] = burst.astype(np.float32)
+        position += length + int(rng.uniform(0.2, 1.2) * sampling_rate)
+    return audio
+
+def write_pcm_fixture(path, seconds, seed=SEED):
+    synthesize_speech_like_audio(seconds, seed=seed).tofile(path)
+    return path
+
+def fake_whisper_segments(count, words_per_segment=12, seed=SEED):
+    """faster_whisper çıktısıyla aynı özniteliklere sahip sahte segmentler (print_segments girdisi)."""
+    rng = random.Random(seed)
+    segments = []
+    time_cursor = 0.0
+    for _ in range(count):
+        words = []
+        start = time_cursor
+        for _ in range(words_per_segment):
+            duration = rng.uniform(0.15, 0.6)
+            words.append(Word(time_cursor, time_cursor + duration, " " + rng.choice(WORDS), rng.random()))
+            time_cursor += duration
+        segments.append(Segment(start, time_cursor, "".join(word.word for word in words), words))
+        time_cursor += rng.uniform(0.1, 0.8)
+    return segments
+
+def fixed_text(characters, seed=SEED):
+    """ai_noterp.py'ye yapıştırılan metni temsil eden, verilen uzunlukta cümlelerden oluşan metin."""
+    rng = random.Random(seed)
+    parts = []
+    length = 0
+    while length < characters:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 16))).capitalize() + ". "
+        parts.append(sentence)
+        length += len(sentence)
+    return "".join(parts)[:characters]
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """OpenRouter (/chat/completions) ve Ollama (/api/generate, /api/chat, akışlı ve akışsız) uç noktalarını taklit eder."""
+    protocol_version = "HTTP/1.1"
+    # Başlık ve gövde ayrı yazıldığında Nagle + gecikmeli ACK her isteğe ~40 ms ekler
+    disable_nagle_algorithm = True
+    latency = 0.0
+    answer = fixed_text(800, seed=SEED + 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # ollama.list() için
+        if self.path.startswith("/api/tags"):
+            return self._send_json({"models": [{"name": "stub", "model": "stub"}]})
+        self.send_error(404)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        time.sleep(self.latency)
+        prompt_tokens = len(json.dumps(request)) // 4
+        completion_tokens = len(self.answer) // 4
+
+        if self.path.endswith("/chat/completions"):
+            if request.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for index in range(0, len(self.answer), 16):
+                    chunk = {"choices": [{"delta": {"content": self.answer[index:index + 16]}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                usage = {"choices": [], "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}}
+                self.wfile.write(f"data: {json.dumps(usage)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+                self.close_connection = True
+                return
+            return self._send_json({"choices": [{"message": {"role": "assistant", "content": self.answer}}],
+                                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}})
+        if self.path.startswith(("/api/generate", "/api/chat")):
+            chat = self.path.startswith("/api/chat")
+            def body(text, done):
+                data = {"model": request.get("model"), "done": done}
+                if chat:
+                    data["message"] = {"role": "assistant", "content": text}
+                else:
+                    data["response"] = text
+                if done:
+                    data.update(prompt_eval_count=prompt_tokens, eval_count=completion_tokens)
+                return data
+            if not request.get("stream", True):
+                return self._send_json(body(self.answer, True))
+            # Ollama akışı: satır başına bir JSON nesnesi (NDJSON)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for index in range(0, len(self.answer), 16):
+                self.wfile.write((json.dumps(body(self.answer[index:index + 16], False)) + "\n").encode("utf-8"))
+            self.wfile.write((json.dumps(body("", True)) + "\n").encode("utf-8"))
+            self.close_connection = True
+            return
+        self.send_error(404)
+
+def start_stub_llm_server(latency_seconds=0.0):
+    """Stub sunucusunu rastgele bir portta arka planda başlatır ve sunucuyu döndürür."""
+    handler = type("BoundStubLLMHandler", (StubLLMHandler,), {"latency": latency_seconds})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -3,33 +3,30 @@ import os
 current_dir = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.join(current_dir, "../"))
 
-import json
-from utils import chatbot_interface
+import time
+import argparse
+from utils import chatbot_interface, load_paste_record, append_paste_record, resolve_provider
 from colorama import Fore
 
-username = os.environ.get("USER")
-cache_dir = f"/home/{username}/.ai_noter_cache/paste_notes"
-INPUT_FILE = f"{cache_dir}/notes.json"
-
 if __name__ == "__main__":
-    try:
-        with open(INPUT_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        print(Fore.RED + f"Hata: {INPUT_FILE} bulunamadı. Önce 'pbpaste | python ai_noterp.py' çalıştırın.")
+    parser = argparse.ArgumentParser(description="Edits the notes of a pasted text with the chatbot.")
+    parser.add_argument("--id", type=str, default=None, help="Paste id to edit (default: the latest paste)")
+    parser.add_argument("--no_stream", action="store_true", help="Wait for the complete LLM response instead of printing tokens as they arrive.")
+    args = parser.parse_args()
+
+    data = load_paste_record(args.id)
+    if data is None:
+        print(Fore.RED + "Hata: Kayıtlı not bulunamadı. Önce 'pbpaste | python ai_noterp.py' çalıştırın.")
         sys.exit(1)
 
-    full_text = data["full_text"]
-    extracted_notes = data["extracted_notes"]
-    language = data["language"]
-    USE_OLLAMA = data["use_ollama"]
+    with open(data["text_path"], "r", encoding="utf-8") as f:
+        full_text = f.read()
+    provider, model_name, api_key = resolve_provider(data["provider"], data["model"])
 
     # Chatbot ile düzenleme sürecine gir
-    updated_notes = chatbot_interface(extracted_notes, full_text, language, use_ollama=USE_OLLAMA)
-
-    # Güncellenmiş notları JSON dosyasına geri kaydet
-    data["extracted_notes"] = updated_notes
-    with open(INPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    updated_notes = chatbot_interface(data["extracted_notes"], full_text, data["language"], provider=provider, model_name=model_name,
+                                      api_key=api_key, stream=not args.no_stream)
 
-    print(Fore.GREEN + f"\n✅ Güncellenmiş notlar {INPUT_FILE} dosyasına kaydedildi.")
+    # Güncellenmiş notları yeni bir revizyon olarak geçmişe ekle
+    append_paste_record({**data, "revision": data["revision"] + 1, "created": time.time(), "extracted_notes": updated_notes})
+    print(Fore.GREEN + f"\n✅ Güncellenmiş notlar geçmişe kaydedildi ({data['id']}).")
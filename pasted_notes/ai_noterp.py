@@ -3,36 +3,53 @@ import os
 current_dir = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(os.path.join(current_dir, "../"))
 
-from utils import model_to_answer
+import time
+import argparse
+from utils import model_to_answer_text_stream, resolve_provider, new_paste_id, get_paste_text_path, append_paste_record
 from colorama import Fore
-import json
 
 sys.stdin.reconfigure(encoding='utf-8')  
 sys.stdout.reconfigure(encoding='utf-8')  
 
-username = os.environ.get("USER")
-cache_dir = f"/home/{username}/.ai_noter_cache/paste_notes"
-os.makedirs(cache_dir, exist_ok=True)
-OUTPUT_FILE = f"{cache_dir}/notes.json"
-
 if __name__ == "__main__":
-    full_text = sys.stdin.read().strip()
-    language = "tr"  
-    USE_OLLAMA = False  
-
-    if full_text:
-        extracted_notes = model_to_answer(full_text)
+    parser = argparse.ArgumentParser(description="Summarizes text piped to stdin and appends the notes to the paste history.")
+    parser.add_argument("--provider", type=str, default="gemini", choices=["openrouter", "gemini", "ollama", "auto"], help="LLM provider to be used; auto routes each request to the fastest healthy configured provider (default: gemini)")
+    parser.add_argument("--model", type=str, default=None, help="Model name (default: the provider's default model)")
+    parser.add_argument("--language", type=str, default="tr", help="Language of the notes (default: tr)")
+    parser.add_argument("--chunk_tokens", type=int, default=6000, help="Approximate token budget per chunk (default: 6000)")
+    parser.add_argument("--max_workers", type=int, default=4, help="Number of parallel LLM requests (default: 4)")
+    parser.add_argument("--no_stream", action="store_true", help="Wait for the complete LLM response instead of printing tokens as they arrive.")
+    args = parser.parse_args()
+
+    provider, model_name, api_key = resolve_provider(args.provider, args.model)
+    stream = not args.no_stream
+    paste_id = new_paste_id()
+    text_path = get_paste_text_path(paste_id)
+
+    # Metin okunurken diske yazılır ve parça parça özetlenir; tamamı bellekte tutulmaz
+    with open(text_path, "w", encoding="utf-8") as spool:
+        extracted_notes, chunk_count = model_to_answer_text_stream(
+            sys.stdin, model_name=model_name, language=args.language, provider=provider, api_key=api_key,
+            max_tokens=args.chunk_tokens, max_workers=args.max_workers, spool=spool, stream=stream)
+
+    if extracted_notes is None:
+        os.remove(text_path)
+        print(Fore.RED + "Hata: Girdi boş.")
+        sys.exit(1)
+
+    if not stream:
         print(Fore.CYAN + "Notes: \n", extracted_notes)
 
-        # JSON formatında kaydet
-        output_data = {
-            "full_text": full_text,
-            "extracted_notes": extracted_notes,
-            "language": language,
-            "use_ollama": USE_OLLAMA
-        }
-
-        with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=4)
-
-        print(Fore.GREEN + f"📌 Notlar {OUTPUT_FILE} dosyasına kaydedildi.")
+    append_paste_record({
+        "id": paste_id,
+        "revision": 0,
+        "created": time.time(),
+        "language": args.language,
+        "provider": provider,
+        "model": model_name,
+        "text_path": text_path,
+        "text_bytes": os.path.getsize(text_path),
+        "chunks": chunk_count,
+        "extracted_notes": extracted_notes,
+    })
+    print(Fore.GREEN + f"📌 Notlar geçmişe kaydedildi ({paste_id}).")
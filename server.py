@@ -0,0 +1,167 @@
+"""
+Uzun süre çalışan HTTP servisi: YouTube bağlantısı ya da yapıştırılmış metin için not çıkarma işlerini
+sınırlı sayıda işçiyle sıraya alır. Whisper modelleri ve sağlayıcı istemcileri süreç boyunca sıcak kalır,
+aynı video için eş zamanlı gelen istekler tek bir işte birleştirilir.
+
+    POST /jobs        {"url": "...", "provider": "...", "model": "...", "language": "tr"} veya {"text": "..."}
+    GET  /jobs        tüm işlerin durumu
+    GET  /jobs/<id>   tek işin durumu ve sonucu
+    GET  /health      kuyruk ve işçi durumu
+"""
+import json
+import queue
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from utils import parse_youtube_video_id
+
+JOB_STATES = ("queued", "running", "done", "error")
+
+class QueueFullError(Exception):
+    pass
+
+class JobQueue:
+    """
+    process(job) çağrısını workers kadar iş parçacığında çalıştırır. Bekleyen iş sayısı max_pending ile sınırlıdır.
+    Aynı anahtara sahip bekleyen ya da çalışan bir iş varsa yeni iş açılmaz, mevcut iş döndürülür.
+    """
+
+    def __init__(self, process, workers=2, max_pending=32, max_finished=1000):
+        self.process = process
+        self.max_finished = max_finished
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._jobs = {}
+        self._active_keys = {}
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._worker, daemon=True, name=f"job-worker-{i}") for i in range(max(1, workers))]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, params, key=None):
+        """Yeni işi sıraya alır ve (iş, yeni_mi) döndürür."""
+        with self._lock:
+            if key is not None and key in self._active_keys:
+                return self._jobs[self._active_keys[key]], False
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "status": "queued",
+                "params": params,
+                "created": time.time(),
+                "started": None,
+                "finished": None,
+                "result": None,
+                "error": None,
+                "key": key,
+            }
+            try:
+                self._queue.put_nowait(job["id"])
+            except queue.Full:
+                raise QueueFullError("İş kuyruğu dolu") from None
+            self._jobs[job["id"]] = job
+            if key is not None:
+                self._active_keys[key] = job["id"]
+            return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def stats(self):
+        with self._lock:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+        return {"workers": len(self._threads), "pending": self._queue.qsize(), "jobs": counts}
+
+    def _worker(self):
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs[job_id]
+                job["status"] = "running"
+                job["started"] = time.time()
+            try:
+                result, error = self.process(job["params"]), None
+            except Exception as e:
+                result, error = None, f"{type(e).__name__}: {e}"
+            with self._lock:
+                job.update(result=result, error=error, status="done" if error is None else "error", finished=time.time())
+                if job["key"] is not None and self._active_keys.get(job["key"]) == job_id:
+                    del self._active_keys[job["key"]]
+                self._prune_finished()
+
+    def _prune_finished(self):
+        finished = [job for job in self._jobs.values() if job["finished"] is not None]
+        for job in sorted(finished, key=lambda job: job["finished"])[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job["id"]]
+
+def job_key(params):
+    """Aynı çıktıyı üretecek işler için tekilleştirme anahtarı; metin işleri tekilleştirilmez."""
+    if not params.get("url"):
+        return None
+    video = parse_youtube_video_id(params["url"]) or params["url"]
+    return (video, params.get("provider"), params.get("model"), params.get("language"))
+
+def job_to_json(job, include_result=True):
+    data = {key: job[key] for key in ("id", "status", "created", "started", "finished", "error")}
+    data["params"] = {key: value for key, value in job["params"].items() if key != "text"}
+    if include_result:
+        data["result"] = job["result"]
+    return data
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    jobs = None  # make_server tarafından atanır
+
+    def _send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/health":
+            return self._send_json(200, {"status": "ok", **self.jobs.stats()})
+        if path == "/jobs":
+            return self._send_json(200, {"jobs": [job_to_json(job, include_result=False) for job in self.jobs.list()]})
+        if path.startswith("/jobs/"):
+            job = self.jobs.get(path[len("/jobs/"):])
+            if job is None:
+                return self._send_json(404, {"error": "İş bulunamadı"})
+            return self._send_json(200, job_to_json(job))
+        self._send_json(404, {"error": "Bilinmeyen adres"})
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            return self._send_json(404, {"error": "Bilinmeyen adres"})
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            params = json.loads(self.rfile.read(length) or b"{}")
+        except (ValueError, json.JSONDecodeError):
+            return self._send_json(400, {"error": "Geçersiz JSON"})
+        if not isinstance(params, dict) or bool(params.get("url")) == bool(params.get("text")):
+            return self._send_json(400, {"error": "'url' ya da 'text' alanlarından tam olarak biri gerekli"})
+
+        params = {key: params.get(key) for key in ("url", "text", "provider", "model", "language") if params.get(key) is not None}
+        try:
+            job, created = self.jobs.submit(params, key=job_key(params))
+        except QueueFullError as e:
+            return self._send_json(503, {"error": str(e)})
+        self._send_json(202 if created else 200, {**job_to_json(job, include_result=False), "deduplicated": not created})
+
+    def log_message(self, format, *args):
+        pass
+
+def make_server(process, host="127.0.0.1", port=8765, workers=2, max_pending=32):
+    """process(params) çağrısını kullanan iş kuyruğunu ve HTTP sunucusunu kurar."""
+    handler = type("BoundJobRequestHandler", (JobRequestHandler,), {"jobs": JobQueue(process, workers=workers, max_pending=max_pending)})
+    return ThreadingHTTPServer((host, port), handler)
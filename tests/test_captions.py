@@ -0,0 +1,100 @@
+"""
+Altyazı ayrıştırıcıları ve iz seçimi için ağ gerektirmeyen testler; girdiler tests/fixtures/captions altındadır.
+
+    python -m unittest discover tests
+"""
+import os
+import sys
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+FIXTURE_DIR = os.path.join(PROJECT_DIR, "tests", "fixtures", "captions")
+sys.path.insert(0, PROJECT_DIR)
+
+import utils
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURE_DIR, name), "r", encoding="utf-8") as file:
+        return file.read()
+
+def rounded(rows):
+    return [[round(start, 3), round(end, 3), text] for start, end, text in rows]
+
+class ParseVttCaptionsTest(unittest.TestCase):
+    def test_rolling_lines_are_not_repeated(self):
+        _, segments = utils.parse_vtt_captions(read_fixture("auto.vtt"))
+        self.assertEqual(rounded(segments), [[0.0, 2.0, " hello world this"], [2.01, 4.0, " is a test"]])
+
+    def test_inline_word_times(self):
+        words, _ = utils.parse_vtt_captions(read_fixture("auto.vtt"))
+        self.assertEqual(rounded(words), [
+            [0.0, 0.5, " hello"], [0.5, 1.0, " world"], [1.0, 2.0, " this"],
+            [2.01, 2.8, " is"], [2.8, 3.2, " a"], [3.2, 4.0, " test"],
+        ])
+
+    def test_manual_cues_without_word_times(self):
+        words, segments = utils.parse_vtt_captions(read_fixture("manual.vtt"))
+        self.assertEqual(rounded(segments), [[1.0, 3.0, " Merhaba & hoş geldiniz"], [63.5, 65.0, " İkinci satır"]])
+        # Kelime zamanları satır süresine orantılı dağıtılır ve satırın sınırları içinde kalır
+        self.assertEqual([word[2] for word in words], [" Merhaba", " &", " hoş", " geldiniz", " İkinci", " satır"])
+        self.assertEqual((words[0][0], words[3][1]), (1.0, 3.0))
+        self.assertTrue(all(earlier[1] <= later[0] + 1e-9 for earlier, later in zip(words, words[1:])))
+
+class ParseSrvCaptionsTest(unittest.TestCase):
+    def test_srv1(self):
+        words, segments = utils.parse_srv_captions(read_fixture("manual.srv1"))
+        self.assertEqual(rounded(segments), [[0.5, 2.5, " Merhaba & hoş geldiniz"], [3.0, 4.5, " İkinci satır"]])
+        self.assertEqual((words[0][0], words[3][1]), (0.5, 2.5))
+
+    def test_srv3_word_offsets(self):
+        words, segments = utils.parse_srv_captions(read_fixture("auto.srv3"))
+        self.assertEqual(rounded(segments), [[1.0, 4.0, " hello world again"], [4.0, 5.0, " plain line"]])
+        self.assertEqual(rounded(words[:3]), [[1.0, 1.6, " hello"], [1.6, 2.2, " world"], [2.2, 4.0, " again"]])
+
+class ParseJson3CaptionsTest(unittest.TestCase):
+    def test_word_offsets_and_appended_events(self):
+        words, segments = utils.parse_json3_captions(read_fixture("auto.json3"))
+        # aAppend olayı yalnızca satır sonu ekler ve atlanır; üst üste binen satır bir sonrakinin başında biter
+        self.assertEqual(rounded(segments), [[1.0, 3.0, " hello world again"], [3.0, 6.0, " second line"]])
+        self.assertEqual(rounded(words), [
+            [1.0, 1.5, " hello"], [1.5, 2.2, " world"], [2.2, 3.0, " again"],
+            [3.0, 3.4, " second"], [3.4, 6.0, " line"],
+        ])
+
+    def test_parse_captions_dispatch(self):
+        self.assertEqual(utils.parse_captions(read_fixture("auto.json3"), "json3"), utils.parse_json3_captions(read_fixture("auto.json3")))
+        with self.assertRaises(ValueError):
+            utils.parse_captions("", "ttml")
+
+def track(ext, url=None):
+    return {"ext": ext, "url": url or f"https://example.com/{ext}"}
+
+class SelectCaptionTrackTest(unittest.TestCase):
+    def test_manual_before_original_auto_captions(self):
+        info = {
+            "language": "tr",
+            "subtitles": {"tr": [track("vtt", "manual")]},
+            "automatic_captions": {"tr-orig": [track("json3", "orig")], "tr": [track("json3", "auto")]},
+        }
+        self.assertEqual(utils.select_caption_track(info, "tr"), ("tr", "vtt", "manual", "manual"))
+
+    def test_original_auto_captions_before_plain_code(self):
+        info = {"language": "tr", "automatic_captions": {"tr": [track("json3", "auto")], "tr-orig": [track("vtt", "orig")]}}
+        self.assertEqual(utils.select_caption_track(info, "tr"), ("tr", "vtt", "orig", "auto"))
+
+    def test_translated_auto_captions_are_skipped(self):
+        # Video İngilizce; otomatik "tr" izi makine çevirisidir
+        info = {"language": "en", "automatic_captions": {"en-orig": [track("json3")], "tr": [track("json3")]}}
+        self.assertIsNone(utils.select_caption_track(info, "tr"))
+        self.assertEqual(utils.select_caption_track(info, "en")[:2], ("en", "json3"))
+
+    def test_format_preference(self):
+        info = {"subtitles": {"en": [track("vtt"), track("srv1"), track("json3")]}}
+        self.assertEqual(utils.select_caption_track(info, "en")[1], "json3")
+
+    def test_no_language_uses_video_language(self):
+        info = {"language": "en-US", "subtitles": {"en": [track("srv3")]}}
+        self.assertEqual(utils.select_caption_track(info, "None")[:2], ("en", "srv3"))
+
+if __name__ == "__main__":
+    unittest.main()
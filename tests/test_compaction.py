@@ -0,0 +1,66 @@
+"""
+Transkript sıkıştırmasının (compact_segments) önce/sonra çıktıları için testler.
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import sys
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import utils
+
+def compact(text, language, level=1):
+    # compact_segments token sayılarını ekrana yazar; testlerde sessiz tutulur
+    with contextlib.redirect_stdout(io.StringIO()):
+        segments = utils.compact_segments([[0.0, 1.0, text]], language=language, level=level)
+    return segments[0][2] if segments else None
+
+class CompactSegmentsEnglishTest(unittest.TestCase):
+    def test_filler_sentences_leave_no_orphan_punctuation(self):
+        self.assertEqual(compact(" Hmm. umbrella is here. Ahh ha.", "en"), " umbrella is here. ha.")
+
+    def test_repeated_words_keep_first_casing(self):
+        self.assertEqual(compact(" The the the cat.", "en"), " The cat.")
+
+    def test_filler_between_commas(self):
+        self.assertEqual(compact(" model, uh, done", "en"), " model done")
+        self.assertEqual(compact(" this is done, uh.", "en"), " this is done.")
+
+    def test_repeated_phrase_level_two(self):
+        self.assertEqual(compact(" I think I think, you know, it works.", "en", level=2), " I think it works.")
+
+    def test_meaningful_phrases_are_kept(self):
+        self.assertEqual(compact(" What kind of model is this sort of thing?", "en", level=2), " What kind of model is this sort of thing?")
+
+    def test_closing_quote_is_kept(self):
+        self.assertEqual(compact(' "Well well" he said', "en"), ' "Well" he said')
+        self.assertEqual(compact(' "Well" well he said', "en"), ' "Well" he said')
+
+class CompactSegmentsTurkishTest(unittest.TestCase):
+    def test_repeated_words_and_fillers(self):
+        self.assertEqual(compact(" Bu bu, ıı, güzel bir örnek.", "tr"), " Bu güzel bir örnek.")
+
+    def test_filler_sentence_at_start(self):
+        self.assertEqual(compact(" eee. Şimdi başlıyoruz", "tr"), " Şimdi başlıyoruz")
+
+    def test_level_two_fillers(self):
+        self.assertEqual(compact(" Yani işte bu konu çok çok önemli.", "tr", level=2), " bu konu çok önemli.")
+
+    def test_roman_numerals_are_not_fillers(self):
+        self.assertEqual(compact(" II. Dünya Savaşı ve III. Selim dönemi.", "tr"), " II. Dünya Savaşı ve III. Selim dönemi.")
+
+    def test_english_i_is_not_a_filler(self):
+        self.assertEqual(compact(" Bu konuda I think", "tr"), " Bu konuda I think")
+        self.assertEqual(compact(' Ona "I think" dedi.', "tr"), ' Ona "I think" dedi.')
+
+    def test_level_zero_is_untouched(self):
+        segments = [[0.0, 1.0, " eee bu bu"]]
+        self.assertIs(utils.compact_segments(segments, language="tr", level=0), segments)
+
+if __name__ == "__main__":
+    unittest.main()
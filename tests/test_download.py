@@ -0,0 +1,78 @@
+"""
+Ses indirme hatalarında mp3/m4a yedeğine düşülmesi için ağ gerektirmeyen testler.
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import yt_dlp
+import utils
+
+INFO = {"id": "abcdefghijk", "title": "Title", "duration": 10, "webpage_url": "https://www.youtube.com/watch?v=abcdefghijk"}
+
+def fake_youtube_dl(failing_codecs):
+    """failing_codecs içindeki biçimlerde ("native", "mp3", "aac") DownloadError veren YoutubeDL yerine geçen sınıf."""
+    class FakeYoutubeDL:
+        def __init__(self, options):
+            self.options = options
+            postprocessors = options.get("postprocessors")
+            self.codec = postprocessors[0]["preferredcodec"] if postprocessors else "native"
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def process_ie_result(self, info, download=True):
+            if self.codec in failing_codecs:
+                raise yt_dlp.utils.DownloadError(f"{self.codec} indirilemedi")
+            extension = {"native": ".webm", "mp3": ".mp3", "aac": ".m4a"}[self.codec]
+            with open(self.options["outtmpl"].replace(".%(ext)s", "").replace("%(id)s", info["id"]) + extension, "wb") as file:
+                file.write(b"audio")
+            return {**info, "ext": extension[1:]}
+
+        def prepare_filename(self, info):
+            return self.options["outtmpl"].replace("%(id)s", info["id"]).replace("%(ext)s", info["ext"])
+    return FakeYoutubeDL
+
+class DownloadFallbackTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.audio_dir = os.path.join(self.cache_dir.name, "audio_files")
+
+    def download(self, failing_codecs, audio_format="native"):
+        with mock.patch.object(yt_dlp, "YoutubeDL", fake_youtube_dl(failing_codecs)), contextlib.redirect_stdout(io.StringIO()):
+            return utils.download_audio_from_youtube(INFO["webpage_url"], self.cache_dir.name, audio_format=audio_format, info=dict(INFO))
+
+    def test_native_download_error_falls_back_to_mp3(self):
+        audio_path, title = self.download({"native"})
+        self.assertEqual((audio_path, title), (os.path.join(self.audio_dir, "abcdefghijk.mp3"), "Title"))
+
+    def test_mp3_error_falls_back_to_m4a(self):
+        audio_path, _ = self.download({"native", "mp3"})
+        self.assertEqual(audio_path, os.path.join(self.audio_dir, "abcdefghijk.m4a"))
+
+    def test_every_format_failing_returns_none(self):
+        self.assertEqual(self.download({"native", "mp3", "aac"}), (None, None))
+
+    def test_pcm_decode_error_falls_back_to_mp3(self):
+        with mock.patch.object(utils, "decode_audio_to_pcm", side_effect=subprocess.CalledProcessError(1, "ffmpeg")):
+            audio_path, _ = self.download(set(), audio_format="pcm")
+        self.assertEqual(audio_path, os.path.join(self.audio_dir, "abcdefghijk.mp3"))
+        # Çözülemeyen kap silinir, önbellekte yalnızca mp3 kalır
+        self.assertEqual(sorted(os.listdir(self.audio_dir)), ["abcdefghijk.mp3"])
+
+if __name__ == "__main__":
+    unittest.main()
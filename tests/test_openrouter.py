@@ -0,0 +1,86 @@
+"""
+OpenRouterClient tekrar deneme ve geri çekilme mantığı için testler; istekler benchmarks/fixtures.py'deki
+yerel stub sunucusuna gönderilir.
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import sys
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+from unittest import mock
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import utils
+from benchmarks.fixtures import StubLLMHandler
+
+class ScriptedStubHandler(StubLLMHandler):
+    """Sıradaki (durum kodu, başlıklar) cevabını verir; liste bitince stub'ın normal cevabına döner."""
+    script = []
+    requests_seen = 0
+
+    def do_POST(self):
+        type(self).requests_seen += 1
+        if not self.script:
+            return super().do_POST()
+        status, headers = self.script.pop(0)
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"error": {"message": "stub"}}'
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class OpenRouterRetryTest(unittest.TestCase):
+    def start(self, script, max_retries=3):
+        handler = type("BoundScriptedStubHandler", (ScriptedStubHandler,), {"script": list(script), "requests_seen": 0})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.handler = handler
+        client = utils.OpenRouterClient("test-key", base_url=f"http://127.0.0.1:{server.server_address[1]}/api/v1",
+                                        max_retries=max_retries, backoff_base=0.01, backoff_max=5.0)
+        self.addCleanup(client.session.close)
+        return client
+
+    def complete(self, client):
+        # Beklemeler gerçekten yapılmaz, yalnızca süreleri kaydedilir
+        self.delays = []
+        with mock.patch.object(utils, "llm_retry_sleep", self.delays.append), contextlib.redirect_stdout(io.StringIO()):
+            return client.complete("merhaba", model="stub")
+
+    def test_rate_limit_honours_retry_after_then_succeeds(self):
+        client = self.start([(429, {"Retry-After": "2"})])
+        self.assertEqual(self.complete(client), StubLLMHandler.answer)
+        self.assertEqual(self.delays, [2.0])
+        self.assertEqual(self.handler.requests_seen, 2)
+
+    def test_non_retryable_error_raises_immediately(self):
+        client = self.start([(400, {})])
+        with self.assertRaises(utils.OpenRouterError) as raised:
+            self.complete(client)
+        self.assertEqual(raised.exception.status_code, 400)
+        self.assertEqual(self.delays, [])
+        self.assertEqual(self.handler.requests_seen, 1)
+
+    def test_retries_are_exhausted(self):
+        client = self.start([(503, {})] * 5, max_retries=2)
+        with self.assertRaises(utils.OpenRouterError) as raised:
+            self.complete(client)
+        self.assertIn("3 denemede", str(raised.exception))
+        self.assertEqual(len(self.delays), 2)
+        self.assertTrue(all(0 <= delay <= 0.04 for delay in self.delays))
+        self.assertEqual(self.handler.requests_seen, 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Sunucu işlerinin (ai_noter serve) altyazı dili seçimi için ağ gerektirmeyen testler.
+
+    python -m unittest discover tests
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+import ai_noter
+
+VIDEO_URL = "https://www.youtube.com/watch?v=abcdefghijk"
+
+def start_server(argv=()):
+    """serve_main'i HTTP sunucusu açmadan çalıştırır ve make_server'a verilen iş fonksiyonunu döndürür."""
+    captured = {}
+
+    def fake_make_server(process, **kwargs):
+        captured["process"] = process
+        return mock.MagicMock()
+
+    with mock.patch("server.make_server", fake_make_server), contextlib.redirect_stdout(io.StringIO()):
+        ai_noter.serve_main(["--no_preload", *argv])
+    return captured["process"]
+
+class ServeCaptionLanguageTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        segments = [[0.0, 1.0, " hello world"]]
+        self.load_captions = mock.Mock(return_value=("abcdefghijk", "Title", ([], segments, "en"), {}))
+        for name, value in {"get_cache_dir": mock.Mock(return_value=self.cache_dir.name),
+                            "resolve_llm": mock.Mock(return_value=("ollama", "model", None)),
+                            "load_caption_transcript": self.load_captions,
+                            "generate_notes": mock.Mock(return_value="notes"),
+                            "save_notes": mock.Mock()}.items():
+            patcher = mock.patch.object(ai_noter, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_job(self, params, argv=()):
+        process = start_server(argv)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return process(params)
+
+    def test_job_language_selects_caption_track(self):
+        result = self.run_job({"url": VIDEO_URL, "language": "en"})
+        self.assertEqual(self.load_captions.call_args.kwargs["language"], "en")
+        self.assertEqual(result["language"], "en")
+
+    def test_server_language_is_the_default(self):
+        self.run_job({"url": VIDEO_URL}, argv=["--language", "de"])
+        self.assertEqual(self.load_captions.call_args.kwargs["language"], "de")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,19 +1,34 @@
 import warnings as w
 w.simplefilter("ignore")  # Import kaynaklı uyarıları (ör. google.generativeai FutureWarning) sustur
 
-import yt_dlp
 import os
-from faster_whisper import WhisperModel
-import google.generativeai as genai
 import time
-import ollama
+import importlib
 import subprocess
 import json
+import math
 import re
-import requests
+import hashlib
+import random
+import queue
+import pickle as pkl
+import shutil
+import glob
+import bisect
+import unicodedata
+import contextlib
+import errno
+import itertools
 from colorama import Fore, Style, init
 import sys
 import locale
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import fcntl
+except ImportError:  # Windows: süreçler arası kilit yok, yazmalar yine atomik
+    fcntl = None
 
 sys.stdin.reconfigure(encoding='utf-8')  # input() için UTF-8 kodlamasını zorla
 sys.stdout.reconfigure(encoding='utf-8')  # print() için UTF-8 kodlamasını zorla
@@ -22,6 +37,372 @@ sys.stdout.reconfigure(encoding='utf-8')  # print() için UTF-8 kodlamasını zo
 
 init(autoreset=True)
 
+class LazyModule:
+    """Modülü ilk öznitelik erişiminde içe aktarır; ağır bağımlılıklar yalnızca kullanıldıkları yolda yüklenir."""
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attribute)
+
+yt_dlp = LazyModule("yt_dlp")
+genai = LazyModule("google.generativeai")
+ollama = LazyModule("ollama")
+requests = LazyModule("requests")
+
+class RunReport:
+    """
+    Bir çalıştırmanın (ya da batch'teki tek bir videonun) ölçümlerini toplar: aşama başına duvar/CPU süresi,
+    önbellek isabet/ıskalamaları, tekrar deneme sayıları, sağlayıcı token kullanımı ve ses süresi.
+    CPU süresi süreç geneli ölçülür; eş zamanlı çalışan aşamalarda birbirinin üstüne biner.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.started = time.time()
+        self.stages = {}
+        self.counters = {}
+        self.tokens = {}
+        self.audio_seconds = 0.0
+        self.info = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            with self._lock:
+                stage = self.stages.setdefault(name, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+                stage["calls"] += 1
+                stage["wall_seconds"] += wall
+                stage["cpu_seconds"] += cpu
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def add_tokens(self, provider, model, prompt_tokens=0, completion_tokens=0):
+        with self._lock:
+            usage = self.tokens.setdefault(f"{provider}/{model}", {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            usage["requests"] += 1
+            usage["prompt_tokens"] += prompt_tokens or 0
+            usage["completion_tokens"] += completion_tokens or 0
+
+    def add_audio(self, seconds):
+        with self._lock:
+            self.audio_seconds += seconds or 0.0
+
+    def to_dict(self):
+        with self._lock:
+            transcribe_seconds = self.stages.get("transcribe", {}).get("wall_seconds", 0.0)
+            return {
+                "name": self.name,
+                "started": self.started,
+                "wall_seconds": time.time() - self.started,
+                "stages": {name: dict(stage) for name, stage in self.stages.items()},
+                "counters": dict(self.counters),
+                "tokens": {name: dict(usage) for name, usage in self.tokens.items()},
+                "audio_seconds": self.audio_seconds,
+                "real_time_factor": transcribe_seconds / self.audio_seconds if self.audio_seconds else None,
+                "peak_rss_mb": get_peak_rss_mb(),
+                "info": dict(self.info),
+            }
+
+def get_peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux'ta KB, macOS'ta bayt cinsinden
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+_RUN_REPORT = threading.local()
+_RUN_REPORT_DEFAULT = [None]
+
+def set_run_report(report):
+    """Tüm iş parçacıkları için varsayılan raporu ayarlar (tek video çalıştırmaları)."""
+    _RUN_REPORT_DEFAULT[0] = report
+
+def get_run_report():
+    return getattr(_RUN_REPORT, "report", None) or _RUN_REPORT_DEFAULT[0]
+
+@contextlib.contextmanager
+def use_run_report(report):
+    """Bu iş parçacığındaki ölçümleri verilen rapora yönlendirir (batch'te video başına rapor)."""
+    previous = getattr(_RUN_REPORT, "report", None)
+    _RUN_REPORT.report = report
+    try:
+        yield report
+    finally:
+        _RUN_REPORT.report = previous
+
+def bind_run_report(function):
+    """Fonksiyonu çağıran iş parçacığının raporuna bağlar; havuz iş parçacıklarına gönderilen işler için."""
+    report = get_run_report()
+    if report is None:
+        return function
+
+    def bound(*args, **kwargs):
+        with use_run_report(report):
+            return function(*args, **kwargs)
+    return bound
+
+def report_stage(name):
+    report = get_run_report()
+    return report.stage(name) if report is not None else contextlib.nullcontext()
+
+def report_count(name, amount=1):
+    report = get_run_report()
+    if report is not None:
+        report.count(name, amount)
+
+def report_cache(kind, hit):
+    report_count(f"{kind}_cache_{'hits' if hit else 'misses'}")
+
+def report_tokens(provider, model, prompt_tokens=0, completion_tokens=0):
+    report = get_run_report()
+    if report is not None:
+        report.add_tokens(provider, model, prompt_tokens, completion_tokens)
+
+def report_audio(seconds):
+    report = get_run_report()
+    if report is not None:
+        report.add_audio(seconds)
+
+def aggregate_reports(reports):
+    """Rapor sözlüklerini toplar; batch çalıştırmalarının özeti için."""
+    total = {"name": "aggregate", "runs": len(reports), "stages": {}, "counters": {}, "tokens": {}, "audio_seconds": 0.0, "peak_rss_mb": None}
+    for report in reports:
+        for name, stage in report["stages"].items():
+            target = total["stages"].setdefault(name, {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0})
+            for key in target:
+                target[key] += stage[key]
+        for name, value in report["counters"].items():
+            total["counters"][name] = total["counters"].get(name, 0) + value
+        for name, usage in report["tokens"].items():
+            target = total["tokens"].setdefault(name, {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            for key in target:
+                target[key] += usage[key]
+        total["audio_seconds"] += report["audio_seconds"]
+        if report.get("peak_rss_mb") is not None:
+            total["peak_rss_mb"] = max(total["peak_rss_mb"] or 0.0, report["peak_rss_mb"])
+    transcribe_seconds = total["stages"].get("transcribe", {}).get("wall_seconds", 0.0)
+    total["real_time_factor"] = transcribe_seconds / total["audio_seconds"] if total["audio_seconds"] else None
+    return total
+
+def get_report_dir():
+    return os.path.join(get_cache_dir(), "reports")
+
+def write_run_report(report, path=None):
+    """Raporu JSON olarak yazar; yol verilmezse ~/.ai_noter_cache/reports altına zaman damgalı dosya açar."""
+    data = report.to_dict() if isinstance(report, RunReport) else report
+    if path is None:
+        name = re.sub(r"[^\w.-]+", "_", data.get("name") or "run")
+        path = os.path.join(get_report_dir(), f"{time.strftime('%Y%m%d-%H%M%S')}_{name}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(data, file, ensure_ascii=False, indent=2)
+    return path
+
+def print_run_report(data):
+    """Rapor sözlüğünü okunabilir bir tablo olarak yazdırır."""
+    print(Fore.YELLOW + f"\n{'Aşama':<16}{'Çağrı':>7}{'Süre (s)':>11}{'CPU (s)':>10}")
+    for name, stage in data["stages"].items():
+        print(f"{name:<16}{stage['calls']:>7}{stage['wall_seconds']:>11.2f}{stage['cpu_seconds']:>10.2f}")
+    if data["counters"]:
+        print(Fore.YELLOW + "Sayaçlar: " + Style.RESET_ALL + ", ".join(f"{name}={value}" for name, value in sorted(data["counters"].items())))
+    for name, usage in data["tokens"].items():
+        print(Fore.YELLOW + f"Tokenlar [{name}]: " + Style.RESET_ALL + f"{usage['requests']} istek, {usage['prompt_tokens']} girdi, {usage['completion_tokens']} çıktı")
+    if data["audio_seconds"]:
+        rtf = data.get("real_time_factor")
+        print(Fore.YELLOW + "Ses süresi: " + Style.RESET_ALL + f"{data['audio_seconds']:.1f} s" + (f", gerçek zaman faktörü {rtf:.3f}" if rtf is not None else ""))
+    if data.get("peak_rss_mb") is not None:
+        print(Fore.YELLOW + "En yüksek bellek (RSS): " + Style.RESET_ALL + f"{data['peak_rss_mb']:.0f} MB")
+
+def get_cache_dir():
+    cache_dir = os.path.join(os.path.expanduser("~"), ".ai_noter_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+CACHE_MAX_BYTES = int(float(os.getenv("AI_NOTER_CACHE_MAX_GB", "20")) * 1024 ** 3)
+# Bütçe aşıldığında tahliye sırası: önce en büyük ve yeniden üretmesi en ucuz olan ses.
+# Notlar, arama/meta veri indeksleri, raporlar ve yapıştırma geçmişi hiç tahliye edilmez.
+CACHE_EVICTION_ORDER = ("audio", "llm", "transcripts")
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w", encoding="utf-8"):
+    """Geçici dosyaya yazıp os.replace ile yerine koyar; yarıda kalan yazma eski dosyayı bozmaz."""
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(temp_path, mode, encoding=None if "b" in mode else encoding) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+def _path_size(path):
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+class CacheManager:
+    """
+    ~/.ai_noter_cache dizininin sahibi:
+      - lock(anahtar): süreçler arası kilit (fcntl.flock). Aynı videoyu isteyen ikinci süreç indirme ya da
+        transkripsiyonu tekrarlamak yerine ilk üreticiyi bekler, ardından onun sonucunu önbellekten okur.
+      - touch(yol): okunan kaydın son kullanım zamanını günceller (LRU).
+      - prune(): toplam boyut bütçeyi aşarsa CACHE_EVICTION_ORDER sırasıyla en eski kullanılanları siler;
+        o anda kilitli (üretilmekte ya da kullanılmakta olan) kayıtlara dokunmaz.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or get_cache_dir()
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.lock_dir = os.path.join(self.root, "locks")
+
+    def _lock_path(self, key):
+        os.makedirs(self.lock_dir, exist_ok=True)
+        return os.path.join(self.lock_dir, re.sub(r"[^\w.-]", "_", key) + ".lock")
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path(key), "a") as file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                print(Fore.YELLOW + f"{key} başka bir işlem tarafından hazırlanıyor, bekleniyor...")
+                fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def is_locked(self, key):
+        if fcntl is None or not os.path.exists(self._lock_path(key)):
+            return False
+        with open(self._lock_path(key), "a") as file:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(file, fcntl.LOCK_UN)
+            return False
+
+    @staticmethod
+    def touch(path):
+        with contextlib.suppress(OSError):
+            os.utime(path)
+
+    def entries(self):
+        """Önbellekteki kayıtlar: kategori, ad, yol, bayt, son kullanım ve kaydı kullanan kilit anahtarları."""
+        entries = []
+
+        def add(category, name, path, lock_keys=()):
+            try:
+                entries.append({"category": category, "name": name, "path": path, "bytes": _path_size(path),
+                                "last_used": os.path.getmtime(path), "lock_keys": lock_keys})
+            except OSError:
+                pass  # Bu arada silinmiş
+
+        audio_dir = os.path.join(self.root, "audio_files")
+        for name in sorted(os.listdir(audio_dir)) if os.path.isdir(audio_dir) else []:
+            if name.endswith((".tmp", ".part", ".ytdl")):
+                continue
+            video_name = get_video_name(name)
+            add("audio", video_name, os.path.join(audio_dir, name), (f"audio-{video_name}", f"transcript-{video_name}"))
+        known = {"audio_files", "locks", os.path.basename(get_llm_cache_dir())}
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if name.endswith("_transcript") and os.path.isdir(path):
+                add("transcripts", name[:-len("_transcript")], path, (f"transcript-{name[:-len('_transcript')]}",))
+            elif name.endswith("_segments.pkl"):
+                add("transcripts", name[:-len("_segments.pkl")], path, (f"transcript-{name[:-len('_segments.pkl')]}",))
+            elif name.endswith("_notes.txt"):
+                add("notes", name[:-len("_notes.txt")], path)
+            elif name not in known and not name.endswith((".tmp", ".old")):
+                add("other", name, path)
+        for root, _, files in os.walk(os.path.join(self.root, os.path.basename(get_llm_cache_dir()))):
+            for name in files:
+                add("llm", name, os.path.join(root, name))
+        return entries
+
+    def stats(self, entries=None):
+        entries = self.entries() if entries is None else entries
+        categories = {}
+        for entry in entries:
+            category = categories.setdefault(entry["category"], {"entries": 0, "bytes": 0})
+            category["entries"] += 1
+            category["bytes"] += entry["bytes"]
+        return {"root": self.root, "total_bytes": sum(entry["bytes"] for entry in entries), "max_bytes": self.max_bytes,
+                "categories": categories}
+
+    def prune(self, max_bytes=None, dry_run=False, keep=()):
+        """
+        Toplam boyut max_bytes altına inene kadar kayıtları tahliye eder ve silinen kayıtları döndürür.
+        keep'teki yollar (ör. henüz yazıya dökülmemiş yeni indirilen ses) bütçe aşılsa da silinmez.
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        keep = {os.path.abspath(path) for path in keep if path}
+        entries = self.entries()
+        total_bytes = sum(entry["bytes"] for entry in entries)
+        removed = []
+        for category in CACHE_EVICTION_ORDER:
+            for entry in sorted((entry for entry in entries if entry["category"] == category), key=lambda entry: entry["last_used"]):
+                if total_bytes <= max_bytes:
+                    return removed
+                if os.path.abspath(entry["path"]) in keep or any(self.is_locked(key) for key in entry["lock_keys"]):
+                    continue
+                if not dry_run:
+                    try:
+                        if os.path.isdir(entry["path"]):
+                            shutil.rmtree(entry["path"])
+                        else:
+                            os.remove(entry["path"])
+                    except OSError:
+                        continue
+                total_bytes -= entry["bytes"]
+                removed.append(entry)
+        return removed
+
+_CACHE_MANAGERS = {}
+_CACHE_MANAGERS_LOCK = threading.Lock()
+
+def get_cache_manager(video_cache_path=None):
+    root = video_cache_path or get_cache_dir()
+    with _CACHE_MANAGERS_LOCK:
+        if root not in _CACHE_MANAGERS:
+            _CACHE_MANAGERS[root] = CacheManager(root)
+        return _CACHE_MANAGERS[root]
+
+def prune_cache_safe(video_cache_path=None, keep=()):
+    """
+    Yeni büyük kayıtlar yazıldıktan sonra bütçeyi uygular; tahliye hataları ana akışı durdurmaz.
+    Yeni kaydın kilidi tutulurken çağrılmalı ve kayıt keep ile korunmalıdır; aksi halde yazıya dökülmeden silinebilir.
+    """
+    try:
+        removed = get_cache_manager(video_cache_path).prune(keep=keep)
+    except Exception as e:
+        print(Fore.YELLOW + "Önbellek temizlenemedi:", e)
+        return
+    if removed:
+        print(Fore.YELLOW + f"Önbellek bütçesi aşıldı, {len(removed)} kayıt silindi ({sum(entry['bytes'] for entry in removed) / 1024 ** 2:.1f} MB).")
+
 def get_API_KEY_env(key_name="GOOGLE_API_KEY"):
     if os.path.exists(".env"):
         with open(".env", "r") as f:
@@ -29,13 +410,30 @@ def get_API_KEY_env(key_name="GOOGLE_API_KEY"):
                 if key_name in line:
                     return line.split("=")[1].strip()
 
-def setup_alias():
+def get_alias_command():
     project_dir = os.path.dirname(os.path.realpath(__file__))
     script_path = os.path.join(project_dir, "ai_noter.py")
     # Proje klasöründeki .venv ortamının python yorumlayıcısını kullan
     venv_python = os.path.join(project_dir, ".venv", "bin", "python")
     python_executable = venv_python if os.path.exists(venv_python) else (sys.executable or "python3")
-    alias_command = f"alias ai_noter='{python_executable} {script_path}'"
+    return f"alias ai_noter='{python_executable} {script_path}'"
+
+def setup_alias_once():
+    """Alias kurulumunu yalnızca alias komutu değiştiğinde çalıştırır; her çağrıda kabuk dosyası okunmaz."""
+    marker_path = os.path.join(get_cache_dir(), ".alias")
+    alias_command = get_alias_command()
+    try:
+        with open(marker_path, "r") as file:
+            if file.read() == alias_command:
+                return
+    except OSError:
+        pass
+    setup_alias()
+    with open(marker_path, "w") as file:
+        file.write(alias_command)
+
+def setup_alias():
+    alias_command = get_alias_command()
 
     # Kullanıcının kabuğunu belirle ve uygun dosyayı seç
     shell_rc = os.path.expanduser("~/.bashrc") if os.path.exists(os.path.expanduser("~/.bashrc")) else os.path.expanduser("~/.zshrc")
@@ -57,24 +455,43 @@ def setup_alias():
         print(Fore.GREEN, "Alias added/updated successfully. Restart your shell or run 'source ~/.bashrc' (or ~/.zshrc) to apply changes.")
 
 def check_ollama_models():
+    """Yüklü Ollama modellerini HTTP API üzerinden listeler."""
     try:
-        result = subprocess.run(["ollama", "list"], capture_output=True, text=True)
-        if result.returncode != 0:
-            raise RuntimeError("Failed to execute the Ollama command. Ensure Ollama is installed and running.")
-        output = result.stdout.strip()
-        if not output:
-            raise RuntimeError("Ollama command returned an empty response. Ensure Ollama is running.")
-        # Çıktıyı satır bazında ayır
-        lines = output.split("\n")
-        # İlk satır başlık olduğu için onu atla
-        model_lines = lines[1:]
-        if not model_lines:
-            raise RuntimeError("No models are installed in Ollama. Please install a model first.")
-        model_names = [line.split("\t")[0] for line in model_lines]  # İlk sütun model adı
-        return model_names
-
+        model_names = get_ollama_client().list_models()
     except Exception as e:
-        raise RuntimeError(f"Error while checking Ollama models: {e}")
+        raise RuntimeError(f"Error while checking Ollama models: {e}. Ensure Ollama is installed and running.")
+    if not model_names:
+        raise RuntimeError("No models are installed in Ollama. Please install a model first.")
+    return model_names
+
+DEFAULT_MODELS = {"openrouter": "tencent/hy3:free", "gemini": "gemini-2.5-flash", "ollama": "deepseek-r1:14b"}
+
+def resolve_provider(provider="openrouter", model_name=None, model_names=None):
+    """
+    Sağlayıcı için (sağlayıcı, model adı, API anahtarı) döndürür; anahtar ya da Ollama modeli eksikse ValueError.
+    provider="auto" ise kullanılabilir tüm sağlayıcılar yönlendiriciye rota olarak verilir (model_names: sağlayıcı -> model).
+    """
+    if provider == "auto":
+        get_provider_router().routes = resolve_routes(model_names)
+        return "auto", "auto", None
+    model_name = model_name or DEFAULT_MODELS[provider]
+    api_key = None
+    if provider == "ollama":
+        # Check models and ensure the specified model is installed
+        installed = check_ollama_models()
+        if model_name not in installed and f"{model_name}:latest" not in installed:
+            raise ValueError(f"The specified model '{model_name}' is not installed in Ollama.")
+        # Model, indirme ve transkripsiyon sürerken arka planda belleğe yüklensin
+        get_ollama_client().warm_async(model_name)
+    elif provider == "gemini":
+        api_key = os.getenv("GOOGLE_API_KEY") or get_API_KEY_env("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY is not set. Please set it in the environment variables or .env file.")
+    else:  # openrouter
+        api_key = os.getenv("OPENROUTER_API_KEY") or get_API_KEY_env("OPENROUTER_API_KEY")
+        if not api_key:
+            raise ValueError("OPENROUTER_API_KEY is not set. Please set it in the environment variables or .env file.")
+    return provider, model_name, api_key
 
 def get_model(model_name='gemini-1.5-flash', prompt=None, language="tr", GOOGLE_API_KEY=None):
     if prompt is None:
@@ -88,45 +505,341 @@ def get_chatbot_model(model_name='gemini-1.5-flash', prompt=None, language="tr",
     genai.configure(api_key=GOOGLE_API_KEY)
     return genai.GenerativeModel(model_name, system_instruction=prompt)
 
-def get_ollama_response(prompt, model="deepseek-r1:14b"):
-    response = ollama.chat(model=model, messages=[{"role": "user", "content": prompt}])
-    return response["message"]["content"] if "message" in response else "Hata oluştu."
+def get_ollama_response(prompt, model="deepseek-r1:14b", stream=False):
+    client = get_ollama_client()
+    messages = [{"role": "user", "content": prompt}]
+    if stream:
+        return print_stream(client.stream_chat(messages, model))
+    return client.chat(messages, model)
+
+class OpenRouterError(RuntimeError):
+    """Tekrar denenemeyen ya da deneme hakkı tükenen OpenRouter hataları."""
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class OpenRouterClient:
+    """
+    Kalıcı bağlantı havuzu kullanan OpenRouter istemcisi.
+    Bağlantı/okuma zaman aşımları, jitter'lı üstel geri çekilme, 429'da Retry-After desteği
+    ve model başına eşzamanlılık/istek hızı sınırı içerir. İş parçacıkları arasında paylaşılabilir.
+    """
+    RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+    def __init__(self, api_key, base_url=None, connect_timeout=None, read_timeout=None, max_retries=None,
+                 backoff_base=1.0, backoff_max=60.0, max_concurrency_per_model=None, requests_per_minute=None, pool_size=16):
+        self.api_key = api_key
+        self.base_url = (base_url or os.getenv("OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1")).rstrip("/")
+        self.connect_timeout = connect_timeout or float(os.getenv("OPENROUTER_CONNECT_TIMEOUT", "10"))
+        self.read_timeout = read_timeout or float(os.getenv("OPENROUTER_READ_TIMEOUT", "300"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("OPENROUTER_MAX_RETRIES", "6"))
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency_per_model = max_concurrency_per_model or int(os.getenv("OPENROUTER_MAX_CONCURRENCY", "4"))
+        requests_per_minute = requests_per_minute or float(os.getenv("OPENROUTER_REQUESTS_PER_MINUTE", "0"))
+        self.min_interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+
+        self._limits_lock = threading.Lock()
+        self._model_semaphores = {}
+        self._model_next_request = {}
+
+    def _acquire_model_slot(self, model):
+        with self._limits_lock:
+            semaphore = self._model_semaphores.setdefault(model, threading.BoundedSemaphore(self.max_concurrency_per_model))
+        semaphore.acquire()
+        if self.min_interval:
+            with self._limits_lock:
+                now = time.monotonic()
+                start = max(now, self._model_next_request.get(model, now))
+                self._model_next_request[model] = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+        return semaphore
+
+    def _backoff_delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Full jitter: [0, min(max, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _parse_retry_after(value):
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            import email.utils
+            retry_at = email.utils.parsedate_to_datetime(value)
+            return max(0.0, retry_at.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
 
-def get_openrouter_response(prompt, system_prompt=None, model="tencent/hy3:free", api_key=None, reasoning=True):
-    """OpenRouter chat/completions API'sine istek atar ve cevabı döndürür."""
+    def _post_with_retries(self, payload, stream=False):
+        """
+        İsteği tekrar denemelerle gönderir. stream=False ise JSON cevabı döndürür.
+        stream=True ise (açık cevap, model slotu) döndürür; slot akış bitince çağıran tarafından bırakılır.
+        """
+        model = payload["model"]
+        max_retries = llm_max_retries(self.max_retries)
+        last_error = None
+        for attempt in range(max_retries + 1):
+            retry_after = None
+            keep_slot = False
+            semaphore = self._acquire_model_slot(model)
+            try:
+                response = self.session.post(
+                    f"{self.base_url}/chat/completions",
+                    data=json.dumps(payload),
+                    timeout=(self.connect_timeout, self.read_timeout),
+                    stream=stream,
+                )
+                if response.status_code >= 400:
+                    message = f"HTTP {response.status_code}: {response.text[:500]}"
+                    if response.status_code not in self.RETRYABLE_STATUS_CODES:
+                        raise OpenRouterError(message, status_code=response.status_code)
+                    retry_after = self._parse_retry_after(response.headers.get("Retry-After"))
+                    raise requests.HTTPError(message, response=response)
+                if stream:
+                    keep_slot = True
+                    return response, semaphore
+                data = response.json()
+                if "error" in data and not data.get("choices"):
+                    # OpenRouter bazı sağlayıcı hatalarını 200 ile gövde içinde döndürür
+                    code = data["error"].get("code")
+                    message = f"{code}: {data['error'].get('message')}"
+                    if isinstance(code, int) and code not in self.RETRYABLE_STATUS_CODES:
+                        raise OpenRouterError(message, status_code=code)
+                    raise requests.HTTPError(message)
+                return data
+            except OpenRouterError:
+                raise
+            except (requests.RequestException, ValueError, KeyError) as e:
+                last_error = e
+            finally:
+                if not keep_slot:
+                    semaphore.release()
+
+            if attempt < max_retries:
+                delay = self._backoff_delay(attempt, retry_after)
+                print("OpenRouter Modeli Hata", last_error)
+                print(f"{delay:.1f} saniye sonra tekrar deneniyor ({attempt + 1}/{max_retries})...")
+                report_count("openrouter_retries")
+                llm_retry_sleep(delay)
+        raise OpenRouterError(f"OpenRouter isteği {max_retries + 1} denemede başarısız oldu: {last_error}")
+
+    def chat(self, messages, model, reasoning=True, **extra):
+        """chat/completions isteği atar ve JSON cevabı döndürür."""
+        data = self._post_with_retries({"model": model, "messages": messages, "reasoning": {"enabled": reasoning}, **extra})
+        usage = data.get("usage") or {}
+        report_tokens("openrouter", model, usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0))
+        return data
+
+    def stream_chat(self, messages, model, reasoning=True, **extra):
+        """chat/completions isteğini SSE ile akış halinde atar, içerik parçalarını geldikçe verir."""
+        payload = {"model": model, "messages": messages, "reasoning": {"enabled": reasoning}, "stream": True, **extra}
+        response, semaphore = self._post_with_retries(payload, stream=True)
+        response.encoding = "utf-8"
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                # Boş satırlar olay ayırıcı, ":" ile başlayanlar keep-alive yorumlarıdır
+                if not line or line.startswith(":") or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if "error" in chunk:
+                    raise OpenRouterError(f"Akış sırasında hata: {chunk['error']}")
+                if chunk.get("usage"):
+                    # Kullanım bilgisi akışın son parçasında gelir
+                    report_tokens("openrouter", model, chunk["usage"].get("prompt_tokens", 0), chunk["usage"].get("completion_tokens", 0))
+                choices = chunk.get("choices") or []
+                if choices:
+                    content = (choices[0].get("delta") or {}).get("content")
+                    if content:
+                        yield content
+        finally:
+            response.close()
+            semaphore.release()
+
+    @staticmethod
+    def build_messages(prompt, system_prompt=None):
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    def complete(self, prompt, system_prompt=None, model="tencent/hy3:free", reasoning=True):
+        data = self.chat(self.build_messages(prompt, system_prompt), model, reasoning=reasoning)
+        try:
+            return data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError):
+            raise OpenRouterError(f"Beklenmeyen OpenRouter cevabı: {str(data)[:500]}")
+
+_OPENROUTER_CLIENTS = {}
+_OPENROUTER_CLIENTS_LOCK = threading.Lock()
+
+def get_openrouter_client(api_key=None):
+    """API anahtarı başına tek bir paylaşılan OpenRouterClient döndürür (sıcak bağlantılar yeniden kullanılır)."""
     if api_key is None:
         api_key = os.getenv("OPENROUTER_API_KEY") or get_API_KEY_env("OPENROUTER_API_KEY")
     if not api_key:
         raise ValueError("OPENROUTER_API_KEY is not set. Please set it in the environment variables or .env file.")
+    with _OPENROUTER_CLIENTS_LOCK:
+        if api_key not in _OPENROUTER_CLIENTS:
+            _OPENROUTER_CLIENTS[api_key] = OpenRouterClient(api_key)
+        return _OPENROUTER_CLIENTS[api_key]
+
+def get_openrouter_response(prompt, system_prompt=None, model="tencent/hy3:free", api_key=None, reasoning=True, stream=False):
+    """OpenRouter chat/completions API'sine istek atar ve cevabı döndürür. stream=True ise tokenları geldikçe yazdırır."""
+    client = get_openrouter_client(api_key)
+    if stream:
+        return print_stream(client.stream_chat(client.build_messages(prompt, system_prompt), model, reasoning=reasoning))
+    return client.complete(prompt, system_prompt=system_prompt, model=model, reasoning=reasoning)
+
+def _parse_keep_alive(value):
+    """"30m" gibi süreleri olduğu gibi, "-1" ya da "3600" gibi sayıları saniye olarak verir."""
+    try:
+        return float(value)
+    except ValueError:
+        return value
 
-    messages = []
-    if system_prompt:
-        messages.append({"role": "system", "content": system_prompt})
-    messages.append({"role": "user", "content": prompt})
-
-    answer = None
-    while answer is None:
+class OllamaClient:
+    """
+    ollama.Client üzerine kurulu, iş parçacıkları arasında paylaşılan Ollama istemcisi.
+    Modeller HTTP API ile listelenir, seçilen model başlangıçta arka planda yüklenir ve her istekte verilen
+    keep_alive ile özet ve sohbet turları arasında bellekte tutulur. num_ctx girdiye göre seçilir ama model
+    başına yalnızca büyür; num_ctx değiştiğinde Ollama modeli yeniden yüklediği için küçültülmez.
+    Eş zamanlı istekler sunucunun paralel sınırı (OLLAMA_NUM_PARALLEL) ile sınırlıdır.
+    """
+    NON_RETRYABLE_STATUS_CODES = {400, 404}
+
+    def __init__(self, host=None, keep_alive=None, max_concurrency=None, num_thread=None, min_ctx=None, max_ctx=None,
+                 answer_tokens=2048, max_retries=None, retry_delay=10.0):
+        self.host = host or os.getenv("OLLAMA_HOST")
+        self.keep_alive = _parse_keep_alive(keep_alive or os.getenv("AI_NOTER_OLLAMA_KEEP_ALIVE", "30m"))
+        self.max_concurrency = max_concurrency or int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+        self.num_thread = num_thread or int(os.getenv("AI_NOTER_OLLAMA_NUM_THREAD", "0"))
+        self.min_ctx = min_ctx or int(os.getenv("AI_NOTER_OLLAMA_MIN_CTX", "8192"))
+        self.max_ctx = max_ctx or int(os.getenv("AI_NOTER_OLLAMA_MAX_CTX", "32768"))
+        self.answer_tokens = answer_tokens
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("AI_NOTER_OLLAMA_MAX_RETRIES", "6"))
+        self.retry_delay = retry_delay
+
+        self.client = ollama.Client(host=self.host)
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._model_ctx = {}
+        self._warm_models = set()
+
+    def list_models(self):
+        response = self.client.list()
+        return [model.get("model") or model.get("name") for model in response["models"]]
+
+    def options_for(self, model, text):
+        """Girdiye yetecek num_ctx (2'nin katları, model başına yalnızca büyür) ve varsa num_thread."""
+        needed = estimate_tokens(text) * 5 // 4 + self.answer_tokens  # Türkçe ~4 karakter/token'dan daha yoğun
+        with self._lock:
+            num_ctx = self._model_ctx.get(model, self.min_ctx)
+            while num_ctx < needed and num_ctx < self.max_ctx:
+                num_ctx = min(num_ctx * 2, self.max_ctx)
+            self._model_ctx[model] = num_ctx
+        options = {"num_ctx": num_ctx}
+        if self.num_thread:
+            options["num_thread"] = self.num_thread
+        return options
+
+    def warm(self, model):
+        """Modeli boş bir istemle belleğe yükler; aynı model için bir kez çalışır."""
+        with self._lock:
+            if model in self._warm_models:
+                return
+            self._warm_models.add(model)
         try:
-            response = requests.post(
-                url="https://openrouter.ai/api/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {api_key}",
-                    "Content-Type": "application/json",
-                },
-                data=json.dumps({
-                    "model": model,
-                    "messages": messages,
-                    "reasoning": {"enabled": reasoning},
-                }),
-            )
-            response.raise_for_status()
-            data = response.json()
-            answer = data["choices"][0]["message"]["content"]
+            self.client.generate(model=model, prompt="", keep_alive=self.keep_alive, options=self.options_for(model, ""))
         except Exception as e:
-            print("OpenRouter Modeli Hata", e)
-            print("Tekrar denenmeden önce biraz bekleniyor...")
-            time.sleep(10)
-    return answer
+            with self._lock:
+                self._warm_models.discard(model)
+            print(Fore.YELLOW + f"Ollama modeli önceden yüklenemedi ({model}):", e)
+
+    def warm_async(self, model):
+        threading.Thread(target=self.warm, args=(model,), daemon=True, name="ollama-warm").start()
+
+    def _with_retries(self, call):
+        max_retries = llm_max_retries(self.max_retries)
+        last_error = None
+        for attempt in range(max_retries + 1):
+            try:
+                return call()
+            except ollama.ResponseError as e:
+                if e.status_code in self.NON_RETRYABLE_STATUS_CODES:
+                    raise
+                last_error = e
+            except Exception as e:  # Bağlantı hataları (sunucu kapalı, zaman aşımı)
+                last_error = e
+            if attempt < max_retries:
+                print("Ollama Modeli Hata", last_error)
+                print(f"{self.retry_delay:.0f} saniye sonra tekrar deneniyor ({attempt + 1}/{max_retries})...")
+                report_count("ollama_retries")
+                llm_retry_sleep(self.retry_delay)
+        raise RuntimeError(f"Ollama isteği {max_retries + 1} denemede başarısız oldu: {last_error}")
+
+    def _request(self, method, model, text, **request):
+        with self._semaphore:
+            response = self._with_retries(lambda: method(model=model, keep_alive=self.keep_alive, options=self.options_for(model, text), **request))
+        report_ollama_usage(response, model)
+        return response
+
+    def _stream(self, method, model, text, text_of, **request):
+        """Akışı ilk parça gelene kadar tekrar deneyerek açar; paralel slot akış bitene kadar tutulur."""
+        def open_stream():
+            chunks = iter(method(model=model, keep_alive=self.keep_alive, options=self.options_for(model, text), stream=True, **request))
+            return chunks, next(chunks, None)
+
+        with self._semaphore:
+            chunks, first = self._with_retries(open_stream)
+            for chunk in itertools.chain([first] if first is not None else [], chunks):
+                if chunk.get("done"):
+                    report_ollama_usage(chunk, model)
+                yield text_of(chunk)
+
+    def generate(self, prompt, model, system=None):
+        return self._request(self.client.generate, model, (system or "") + prompt, prompt=prompt, system=system)["response"]
+
+    def stream_generate(self, prompt, model, system=None):
+        return self._stream(self.client.generate, model, (system or "") + prompt, lambda chunk: chunk["response"], prompt=prompt, system=system)
+
+    def chat(self, messages, model):
+        text = "".join(message["content"] for message in messages)
+        return self._request(self.client.chat, model, text, messages=messages)["message"]["content"]
+
+    def stream_chat(self, messages, model):
+        text = "".join(message["content"] for message in messages)
+        return self._stream(self.client.chat, model, text, lambda chunk: chunk["message"]["content"], messages=messages)
+
+_OLLAMA_CLIENTS = {}
+_OLLAMA_CLIENTS_LOCK = threading.Lock()
+
+def get_ollama_client(host=None):
+    """Sunucu adresi başına tek bir paylaşılan OllamaClient döndürür (model sıcak, bağlantılar yeniden kullanılır)."""
+    host = host or os.getenv("OLLAMA_HOST")
+    with _OLLAMA_CLIENTS_LOCK:
+        if host not in _OLLAMA_CLIENTS:
+            _OLLAMA_CLIENTS[host] = OllamaClient(host=host)
+        return _OLLAMA_CLIENTS[host]
 
 def get_chatbot_prompt(language="tr"):
     if language == "tr":
@@ -141,11 +854,165 @@ def get_chatbot_prompt(language="tr"):
         """
     return prompt
 
-def chatbot_interface(initial_notes, full_text, language="tr", provider="openrouter", model_name=None, api_key=None):
+def text_to_segments(full_text):
+    """Zaman damgası olmayan metni (ör. yapıştırılan metin) cümle bazlı [None, None, text] segmentlerine böler."""
+    sentences = re.split(r"(?<=[.!?])\s+|\n{2,}", full_text)
+    return [[None, None, sentence.strip() + " "] for sentence in sentences if sentence.strip()]
+
+def tokenize_words(text):
+    return re.findall(r"\w{3,}", text.casefold())
+
+class ChatSession:
+    """
+    Notları düzenlemek için sınırlı bağlamlı sohbet oturumu.
+    Her turda tüm transkript yerine yalnızca güncel notlar, son birkaç tur, daha eski isteklerin kısa özeti
+    ve isteğe en ilgili transkript pasajları (zaman damgası veya anahtar kelimeyle bulunur) gönderilir.
+    Model/istemci oturum boyunca bir kez oluşturulur, böylece tur başına gecikme oturum uzadıkça artmaz.
+    """
+    TIMESTAMP_PATTERN = re.compile(r"\b(?:(\d{1,2}):)?(\d{1,2}):(\d{2})\b")
+
+    def __init__(self, notes, segments, language="tr", provider="openrouter", model_name=None, api_key=None,
+                 history_turns=3, passage_tokens=250, context_tokens=2500, stream=False):
+        self.notes = notes
+        self.language = language
+        self.provider = provider
+        self.api_key = api_key
+        self.history_turns = history_turns
+        self.context_tokens = context_tokens
+        self.stream = stream
+        self.system_prompt = get_chatbot_prompt(language)
+        self.history = []
+        if provider == "auto":
+            # Oturum geçmişi tek bir sağlayıcıda tutulur; o an en hızlı sağlıklı rota seçilir
+            provider, model_name, api_key = get_provider_router().best_route(stream)
+            self.provider = provider
+            self.api_key = api_key
+        self.older_requests = []
+
+        if provider == "ollama":
+            self.model_name = model_name or "deepseek-r1:14b"
+            self.ollama_client = get_ollama_client()
+        elif provider == "gemini":
+            self.model_name = model_name or "gemini-1.5-flash"
+            self.gemini_model = get_chatbot_model(model_name=self.model_name, language=language, GOOGLE_API_KEY=api_key)
+        else:
+            self.model_name = model_name or "tencent/hy3:free"
+            self.openrouter_client = get_openrouter_client(api_key)
+
+        # Pasajları ve kelime kümelerini bir kez hazırla, her turda yalnızca puanla
+        self.passages = []
+        for chunk in chunk_segments(segments, max_tokens=passage_tokens, max_seconds=None):
+            text = "".join([segment[2] for segment in chunk])
+            self.passages.append((chunk[0][0], chunk[-1][1], text, set(tokenize_words(text))))
+        document_frequency = {}
+        for _, _, _, words in self.passages:
+            for word in words:
+                document_frequency[word] = document_frequency.get(word, 0) + 1
+        self.idf = {word: math.log(1 + len(self.passages) / count) for word, count in document_frequency.items()}
+
+    def _requested_seconds(self, user_input):
+        seconds = []
+        for hours, minutes, secs in self.TIMESTAMP_PATTERN.findall(user_input):
+            seconds.append(int(hours or 0) * 3600 + int(minutes) * 60 + int(secs))
+        return seconds
+
+    def retrieve_passages(self, user_input):
+        """İstekteki zaman damgalarını kapsayan ve anahtar kelimelerle en çok eşleşen pasajları bütçe dahilinde seçer."""
+        requested_seconds = self._requested_seconds(user_input)
+        query_words = set(tokenize_words(user_input))
+        scored = []
+        for index, (start, end, _, words) in enumerate(self.passages):
+            score = sum(self.idf.get(word, 0.0) for word in query_words & words)
+            if start is not None and any(start - 30 <= second <= end + 30 for second in requested_seconds):
+                score += 100.0
+            if score > 0:
+                scored.append((score, index))
+
+        selected = []
+        used_tokens = 0
+        for score, index in sorted(scored, reverse=True):
+            tokens = estimate_tokens(self.passages[index][2])
+            if used_tokens + tokens > self.context_tokens:
+                continue
+            selected.append(index)
+            used_tokens += tokens
+        return [self.passages[index] for index in sorted(selected)]
+
+    def build_messages(self, user_input):
+        tr = self.language == "tr"
+        parts = [("Mevcut notlar:\n" if tr else "Current notes:\n") + (self.notes or "")]
+        if self.older_requests:
+            header = "Daha önceki istekler (özet):\n" if tr else "Earlier requests (summary):\n"
+            parts.append(header + "\n".join(f"- {request}" for request in self.older_requests))
+        passages = self.retrieve_passages(user_input)
+        if passages:
+            header = "Videodan ilgili bölümler:\n" if tr else "Relevant passages from the video:\n"
+            lines = []
+            for start, end, text, _ in passages:
+                prefix = f"[{format_timestamp(start)} - {format_timestamp(end)}] " if start is not None else ""
+                lines.append(prefix + text.strip())
+            parts.append(header + "\n".join(lines))
+        parts.append(("Kullanıcı isteği: " if tr else "User request: ") + user_input)
+
+        messages = [{"role": "system", "content": self.system_prompt}]
+        messages += self.history[-2 * self.history_turns:]
+        messages.append({"role": "user", "content": "\n\n".join(parts)})
+        return messages
+
+    def _complete(self, messages):
+        if self.provider == "ollama":
+            if self.stream:
+                return print_stream(self.ollama_client.stream_chat(messages, self.model_name))
+            return remove_think_sections(self.ollama_client.chat(messages, self.model_name))
+        elif self.provider == "gemini":
+            # Sistem promptu modelde tanımlı; geri kalan mesajlar Gemini rol formatına çevrilir
+            contents = [{"role": "model" if message["role"] == "assistant" else "user", "parts": [message["content"]]}
+                        for message in messages if message["role"] != "system"]
+            if self.stream:
+                return print_stream(gemini_stream_text(start_stream(lambda: self.gemini_model.generate_content(contents, stream=True), "Gemini"), self.model_name))
+            response = self.gemini_model.generate_content(contents)
+            report_gemini_usage(response, self.model_name)
+            return response_to_answer(response)
+        else:
+            if self.stream:
+                return print_stream(self.openrouter_client.stream_chat(messages, self.model_name))
+            data = self.openrouter_client.chat(messages, self.model_name)
+            return remove_think_sections(data["choices"][0]["message"]["content"])
+
+    def ask(self, user_input):
+        """İsteği gönderir, güncellenmiş notları döndürür ve oturum durumunu günceller."""
+        messages = self.build_messages(user_input)
+        streamed = []
+
+        def call():
+            streamed.append(self.stream)
+            return self._complete(messages)
+
+        answer = cached_llm_call(json.dumps(messages[1:], ensure_ascii=False), self.system_prompt, self.model_name, self.provider, call)
+        if self.stream and not streamed:
+            print(answer)
+        if not answer:
+            return self.notes
+
+        # Geçmişte notların tamamı yerine kısa bir özet tutulur; güncel notlar zaten her turda gönderiliyor
+        self.history.append({"role": "user", "content": user_input})
+        self.history.append({"role": "assistant", "content": answer[:500]})
+        while len(self.history) > 2 * self.history_turns:
+            self.older_requests.append(self.history.pop(0)["content"][:200])
+            self.history.pop(0)
+        self.older_requests = self.older_requests[-10:]
+        self.notes = answer
+        return answer
+
+def chatbot_interface(initial_notes, full_text, language="tr", provider="openrouter", model_name=None, api_key=None, stream=False, segments=None):
     """
     Kullanıcı ile iteratif olarak notları geliştiren bir chatbot arayüzü.
+    segments verilirse ilgili pasajlar zaman damgalarıyla bulunur; verilmezse metin cümlelere bölünür.
+    stream=True ise güncellenmiş notlar tokenlar geldikçe yazdırılır.
     """
-    conversation = f"Video'dan çıkarılan metin: {full_text}\nMevcut notlar:\n{initial_notes}\n" if language == "tr" else f"Extracted text from the video: {full_text}\nCurrent notes:\n{initial_notes}\n"
+    session = ChatSession(initial_notes, segments if segments is not None else text_to_segments(full_text), language=language,
+                          provider=provider, model_name=model_name, api_key=api_key, stream=stream)
+    updated_notes_header = "\nChatbot: Güncellenmiş notlar:\n" if language == "tr" else "\nChatbot: Updated notes:\n"
     
     if language == "tr":
         print("\nNotları düzenlemek için chatbot ile sohbet edebilirsiniz. Çıkmak için 'exit' yazın.\n")
@@ -154,8 +1021,8 @@ def chatbot_interface(initial_notes, full_text, language="tr", provider="openrou
     
     updated_notes = None
     while True:
-        if not updated_notes is None:
-            print(Fore.MAGENTA + ("\nChatbot: Güncellenmiş notlar:\n" if language == "tr" else "\nChatbot: Updated notes:\n"), updated_notes)
+        if not updated_notes is None and not stream:
+            print(Fore.MAGENTA + updated_notes_header, updated_notes)
         print(Fore.MAGENTA + "[Chatbot]: ", end="")
         print(Fore.MAGENTA + ("Düzenlemek için isteğinizi girin: " if language == "tr" else "Enter your request to edit: "))
         print(Fore.CYAN + "[Kullanıcı]: ", end="")
@@ -164,23 +1031,13 @@ def chatbot_interface(initial_notes, full_text, language="tr", provider="openrou
         if user_input.lower() == "exit":
             print("Chatbot oturumu kapatıldı." if language == "tr" else "Chatbot session ended.")
             break
-        
-        conversation += f"\nKullanıcı isteği: {user_input}\n" if language == "tr" else f"\nUser request: {user_input}\n"
-        
-        if provider == "ollama":
-            updated_notes = get_ollama_response(conversation, model=model_name or "deepseek-r1:14b")
-            updated_notes = remove_think_sections(updated_notes)
-        elif provider == "gemini":
-            model = get_chatbot_model(language=language)
-            response = model.generate_content(conversation)
-            updated_notes = response_to_answer(response)
-        else:
-            system_prompt = get_chatbot_prompt(language)
-            updated_notes = get_openrouter_response(conversation, system_prompt=system_prompt, model=model_name or "tencent/hy3:free", api_key=api_key)
-            updated_notes = remove_think_sections(updated_notes)
+        if not user_input:
+            continue
 
-        initial_notes = updated_notes  # Notları güncelleyerek döngüye devam et
-    return updated_notes
+        if stream:
+            print(Fore.MAGENTA + updated_notes_header)
+        updated_notes = session.ask(user_input)
+    return updated_notes if updated_notes is not None else initial_notes
 
 def get_prompt(language="tr"):
     if language == "tr":
@@ -309,17 +1166,25 @@ def response_to_answer(response):
         print("Modelden cevap alınamadı. Hata:", e)
         return None
 
-def model_to_answer(full_text, model_name='gemini-1.5-flash', prompt=None, language="tr"):
+def model_to_answer(full_text, model_name='gemini-1.5-flash', prompt=None, language="tr", stream=False):
     model = get_model(model_name=model_name, prompt=prompt, language=language)
     # print("Model girdisi: ", full_text)
+    if stream:
+        return print_stream(gemini_stream_text(start_stream(lambda: model.generate_content(full_text, stream=True), "Gemini"), model_name))
+    max_retries = llm_max_retries(GEMINI_MAX_RETRIES)
     response = None
-    while response is None:
+    for attempt in itertools.count():
         try:
             response = model.generate_content(full_text)
+            break
         except Exception as e:
+            if attempt >= max_retries:
+                raise
             print("Gemini Modeli Hata", e)
             print("Tekrar denenmeden önce biraz bekleniyor...")
-            time.sleep(10)
+            report_count("gemini_retries")
+            llm_retry_sleep(10)
+    report_gemini_usage(response, model_name)
     answer = response_to_answer(response)
     return answer
 
@@ -328,104 +1193,2400 @@ def remove_think_sections(text):
     cleaned_text = re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
     return cleaned_text.strip()
 
-def model_to_answer_ollama(full_text, model_name='mistral', prompt=None, language="tr"):
-    if prompt is None:
-        prompt = get_prompt(language)
-    
-    response = None
-    while response is None:
+class ThinkStripper:
+    """remove_think_sections'ın akış versiyonu: parçalar arasında bölünmüş etiketler dahil <think>...</think> bloklarını temizler."""
+    OPEN_TAG = "<think>"
+    CLOSE_TAG = "</think>"
+
+    def __init__(self):
+        self.buffer = ""
+        self.in_think = False
+        self.started = False
+
+    def _visible(self, text):
+        # Çıktının başındaki boşlukları at (remove_think_sections'taki strip gibi)
+        if not self.started:
+            text = text.lstrip()
+            self.started = bool(text)
+        return text
+
+    def feed(self, text):
+        self.buffer += text
+        output = []
+        while True:
+            tag = self.CLOSE_TAG if self.in_think else self.OPEN_TAG
+            index = self.buffer.find(tag)
+            if index == -1:
+                # Sonda yarım kalmış olabilecek etiket önekini sonraki parçaya sakla
+                keep = 0
+                for length in range(min(len(tag) - 1, len(self.buffer)), 0, -1):
+                    if tag.startswith(self.buffer[-length:]):
+                        keep = length
+                        break
+                safe = self.buffer[:len(self.buffer) - keep]
+                if not self.in_think:
+                    output.append(safe)
+                self.buffer = self.buffer[len(safe):]
+                break
+            if not self.in_think:
+                output.append(self.buffer[:index])
+            self.buffer = self.buffer[index + len(tag):]
+            self.in_think = not self.in_think
+        return self._visible("".join(output))
+
+    def flush(self):
+        remaining = "" if self.in_think else self.buffer
+        self.buffer = ""
+        return self._visible(remaining)
+
+def print_stream(chunks):
+    """Token parçalarını geldikçe yazdırır, <think> bloklarını akış halinde ayıklar ve temiz metni döndürür."""
+    stripper = ThinkStripper()
+    parts = []
+    for chunk in chunks:
+        visible = stripper.feed(chunk or "")
+        if visible:
+            print(visible, end="", flush=True)
+            parts.append(visible)
+    parts.append(stripper.flush())
+    print(parts[-1])
+    return "".join(parts).strip()
+
+# Gemini için tekrar sınırı; varsayılan eskisi gibi sınırsız. Yönlendirici içindeki çağrılar her durumda
+# AI_NOTER_ROUTER_MAX_RETRIES ile sınırlanır, böylece takılan sağlayıcıdan diğerine geçilebilir.
+GEMINI_MAX_RETRIES = float(os.getenv("AI_NOTER_GEMINI_MAX_RETRIES", "inf"))
+
+class LLMCallCancelled(RuntimeError):
+    """Yönlendirici, yarışı kaybeden ya da vazgeçilen bir LLM denemesini iptal etti."""
+
+_LLM_CALL = threading.local()
+
+@contextlib.contextmanager
+def llm_call_context(cancelled, max_retries):
+    """Bu iş parçacığındaki LLM çağrılarının tekrar sayısını sınırlar ve bekleme sırasında iptal edilebilir yapar."""
+    previous = getattr(_LLM_CALL, "context", None)
+    _LLM_CALL.context = (cancelled, max_retries)
+    try:
+        yield
+    finally:
+        _LLM_CALL.context = previous
+
+def llm_max_retries(default):
+    context = getattr(_LLM_CALL, "context", None)
+    return default if context is None else min(default, context[1])
+
+def llm_retry_sleep(seconds):
+    """Tekrar denemeden önce bekler; deneme iptal edilirse beklemeyi keser ve LLMCallCancelled fırlatır."""
+    context = getattr(_LLM_CALL, "context", None)
+    if context is None:
+        time.sleep(seconds)
+    elif context[0].wait(seconds):
+        raise LLMCallCancelled()
+
+def start_stream(open_stream, provider_name):
+    """Akışı ilk parça gelene kadar tekrar deneyerek başlatır (akışsız yoldaki 10 sn'lik tekrar davranışıyla aynı)."""
+    max_retries = llm_max_retries(GEMINI_MAX_RETRIES)
+    for attempt in itertools.count():
         try:
-            response = ollama.generate(model=model_name, prompt=f"{prompt}\n\n{full_text}")
+            stream = iter(open_stream())
+            first = next(stream, None)
+            break
         except Exception as e:
-            print("Ollama Modeli Hata", e)
+            if attempt >= max_retries:
+                raise
+            print(f"{provider_name} Modeli Hata", e)
             print("Tekrar denenmeden önce biraz bekleniyor...")
-            time.sleep(10)
-    
-    answer = response["response"]
-    answer = remove_think_sections(answer)
+            report_count(f"{provider_name.lower()}_retries")
+            llm_retry_sleep(10)
+
+    def chained():
+        if first is not None:
+            yield first
+        yield from stream
+    return chained()
+
+def gemini_stream_text(response, model_name=None):
+    chunk = None
+    for chunk in response:
+        try:
+            yield chunk.text
+        except Exception as e:
+            print("Modelden cevap alınamadı. Hata:", e)
+    # Kullanım bilgisi son parçada kümülatif olarak gelir
+    if chunk is not None:
+        report_gemini_usage(chunk, model_name)
 
-    return answer
+def report_gemini_usage(response, model_name):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is not None:
+        report_tokens("gemini", model_name, getattr(usage, "prompt_token_count", 0), getattr(usage, "candidates_token_count", 0))
 
-def model_to_answer_openrouter(full_text, model_name='tencent/hy3:free', prompt=None, language="tr", api_key=None):
+def report_ollama_usage(response, model_name):
+    report_tokens("ollama", model_name, response.get("prompt_eval_count") or 0, response.get("eval_count") or 0)
+
+def model_to_answer_ollama(full_text, model_name='mistral', prompt=None, language="tr", stream=False):
     if prompt is None:
         prompt = get_prompt(language)
-    answer = get_openrouter_response(full_text, system_prompt=prompt, model=model_name, api_key=api_key)
+
+    client = get_ollama_client()
+    if stream:
+        return print_stream(client.stream_generate(full_text, model_name, system=prompt))
+    return remove_think_sections(client.generate(full_text, model_name, system=prompt))
+
+def model_to_answer_openrouter(full_text, model_name='tencent/hy3:free', prompt=None, language="tr", api_key=None, reasoning=True, stream=False):
+    if prompt is None:
+        prompt = get_prompt(language)
+    answer = get_openrouter_response(full_text, system_prompt=prompt, model=model_name, api_key=api_key, reasoning=reasoning, stream=stream)
     answer = remove_think_sections(answer)
     return answer
 
-def model_to_answer_choose(full_text, model_name='gemini-1.5-flash', prompt=None, language="tr", provider="openrouter", api_key=None):
+# Kalıcı LLM cevap önbelleği: anahtar = hash(normalize metin, sistem promptu, model, sağlayıcı, reasoning)
+LLM_CACHE_MAX_BYTES = int(float(os.getenv("AI_NOTER_LLM_CACHE_MAX_MB", "200")) * 1024 * 1024)
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("AI_NOTER_LLM_CACHE_MAX_AGE_DAYS", "90"))
+_LLM_CACHE = {"enabled": os.getenv("AI_NOTER_LLM_CACHE", "1") != "0", "hits": 0, "misses": 0, "writes": 0}
+_LLM_CACHE_LOCK = threading.Lock()
+
+def set_llm_cache_enabled(enabled):
+    _LLM_CACHE["enabled"] = enabled
+
+def get_llm_cache_dir():
+    return os.path.join(get_cache_dir(), "llm_responses")
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+def llm_cache_key(full_text, system_prompt, model_name, provider, reasoning=True):
+    payload = json.dumps([normalize_text(full_text), normalize_text(system_prompt), model_name, provider, bool(reasoning)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _llm_cache_path(key):
+    return os.path.join(get_llm_cache_dir(), key[:2], f"{key}.json")
+
+def llm_cache_get(key):
+    path = _llm_cache_path(key)
+    try:
+        if time.time() - os.path.getmtime(path) > LLM_CACHE_MAX_AGE_DAYS * 86400:
+            os.remove(path)
+            raise FileNotFoundError(path)
+        with open(path, "r", encoding="utf-8") as file:
+            answer = json.load(file)["answer"]
+        os.utime(path)  # LRU tahliyesi için son erişim zamanını güncelle
+    except (OSError, ValueError, KeyError):
+        with _LLM_CACHE_LOCK:
+            _LLM_CACHE["misses"] += 1
+        return None
+    with _LLM_CACHE_LOCK:
+        _LLM_CACHE["hits"] += 1
+    return answer
+
+def llm_cache_put(key, answer, model_name=None, provider=None):
+    path = _llm_cache_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump({"answer": answer, "model": model_name, "provider": provider, "created": time.time()}, file, ensure_ascii=False)
+    os.replace(temp_path, path)
+    with _LLM_CACHE_LOCK:
+        _LLM_CACHE["writes"] += 1
+        should_prune = _LLM_CACHE["writes"] % 50 == 1
+    if should_prune:
+        prune_llm_cache()
+
+def prune_llm_cache(max_bytes=None, max_age_days=None):
+    """Süresi dolan kayıtları siler, ardından boyut bütçesine inene kadar en eski erişilenleri tahliye eder."""
+    max_bytes = LLM_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_age_days = LLM_CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    entries = []
+    now = time.time()
+    for root, _, files in os.walk(get_llm_cache_dir()):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > max_age_days * 86400:
+                os.remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_bytes -= size
+        removed += 1
+    return removed
+
+def llm_cache_stats():
+    entries = 0
+    total_bytes = 0
+    for root, _, files in os.walk(get_llm_cache_dir()):
+        for name in files:
+            entries += 1
+            total_bytes += os.path.getsize(os.path.join(root, name))
+    with _LLM_CACHE_LOCK:
+        hits, misses = _LLM_CACHE["hits"], _LLM_CACHE["misses"]
+    return {
+        "entries": entries,
+        "bytes": total_bytes,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+    }
+
+def cached_llm_call(full_text, system_prompt, model_name, provider, call, reasoning=True):
+    """call() sonucunu önbellekten döndürür; yoksa çağırıp boş olmayan cevabı önbelleğe yazar."""
+    if not _LLM_CACHE["enabled"]:
+        with report_stage("llm"):
+            return call()
+    key = llm_cache_key(full_text, system_prompt, model_name, provider, reasoning)
+    answer = llm_cache_get(key)
+    report_cache("notes", answer is not None)
+    if answer is not None:
+        return answer
+    with report_stage("llm"):
+        answer = call()
+    if answer:
+        llm_cache_put(key, answer, model_name=model_name, provider=provider)
+    return answer
+
+def model_to_answer_choose(full_text, model_name='gemini-1.5-flash', prompt=None, language="tr", provider="openrouter", api_key=None, reasoning=True, stream=False):
+    """
+    stream=True ise cevap tokenları geldikçe yazdırılır (önbellekten gelen cevap tek seferde yazdırılır).
+    provider="auto" ise istek ProviderRouter ile en hızlı sağlıklı sağlayıcıya yönlendirilir.
+    """
+    if provider == "auto":
+        return model_to_answer_routed(full_text, prompt=prompt, language=language, reasoning=reasoning, stream=stream)
+    streamed = []
+
+    def call():
+        streamed.append(stream)
+        if provider == "ollama":
+            return model_to_answer_ollama(full_text, model_name=model_name, prompt=prompt, language=language, stream=stream)
+        elif provider == "gemini":
+            return model_to_answer(full_text, model_name=model_name, prompt=prompt, language=language, stream=stream)
+        else:
+            return model_to_answer_openrouter(full_text, model_name=model_name, prompt=prompt, language=language, api_key=api_key, reasoning=reasoning, stream=stream)
+
+    system_prompt = prompt if prompt is not None else get_prompt(language)
+    answer = cached_llm_call(full_text, system_prompt, model_name, provider, call, reasoning=reasoning)
+    if stream and not streamed:
+        print(answer)
+    return answer
+
+ROUTER_PROVIDERS = ("openrouter", "gemini", "ollama")
+ROUTER_MAX_RETRIES = int(os.getenv("AI_NOTER_ROUTER_MAX_RETRIES", "1"))
+ROUTER_WINDOW = int(os.getenv("AI_NOTER_ROUTER_WINDOW", "50"))
+
+class ProviderRouter:
+    """
+    LLM isteklerini openrouter/gemini/ollama rotaları (sağlayıcı, model, API anahtarı) arasında yönlendirir.
+    Her rota için son ROUTER_WINDOW isteğin ilk parçaya kadar geçen süresi (akışlı ve akışsız ayrı) ve başarı
+    durumu tutulur. İstek, medyan gecikmesi hata oranıyla cezalandırılmış en düşük sağlıklı rotaya gider; üst
+    üste başarısız olan rota bir süre dinlendirilir. hedge=True ise ilk deneme o rotanın hedge_percentile
+    yüzdelik gecikmesini aştığında sıradaki rotaya ikinci bir istek gönderilir; ilk parçayı veren kazanır,
+    diğeri iptal edilir. Hata veren denemeden beklemeden sıradaki rotaya geçilir.
+    İstatistikler ~/.ai_noter_cache/provider_stats.json dosyasında saklanır, böylece kısa CLI çalıştırmaları
+    da önceki çalıştırmalardan öğrenir.
+    """
+    FAILURES_BEFORE_COOLDOWN = 3
+    COOLDOWN_SECONDS = 60.0
+    MAX_COOLDOWN_SECONDS = 600.0
+    MIN_HEDGE_SAMPLES = 5
+    MIN_HEDGE_DELAY = 1.0
+
+    def __init__(self, routes=(), hedge=False, hedge_percentile=0.9, hedge_after=30.0, stats_path=None):
+        self.routes = list(routes)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        # Yeterli gecikme örneği yokken ikinci isteğin gönderileceği süre (sn)
+        self.hedge_after = hedge_after
+        self.stats_path = stats_path or os.path.join(get_cache_dir(), "provider_stats.json")
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._load_stats()
+
+    @staticmethod
+    def route_name(route):
+        return f"{route[0]}/{route[1]}"
+
+    def _load_stats(self):
+        try:
+            with open(self.stats_path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        for name, entry in data.items():
+            try:
+                self._stats[name] = {
+                    "latency": {mode: deque(entry["latency"].get(mode, []), maxlen=ROUTER_WINDOW) for mode in ("stream", "complete")},
+                    "outcomes": deque(entry["outcomes"], maxlen=ROUTER_WINDOW),
+                    "consecutive_failures": int(entry.get("consecutive_failures", 0)),
+                    "cooldown_until": float(entry.get("cooldown_until", 0.0)),
+                }
+            except (KeyError, TypeError, ValueError, AttributeError):
+                continue
+
+    def save_stats(self):
+        with self._lock:
+            data = {name: {"latency": {mode: list(values) for mode, values in entry["latency"].items()},
+                           "outcomes": list(entry["outcomes"]),
+                           "consecutive_failures": entry["consecutive_failures"],
+                           "cooldown_until": entry["cooldown_until"]}
+                    for name, entry in self._stats.items()}
+        try:
+            with atomic_write(self.stats_path) as file:
+                json.dump(data, file)
+        except OSError as e:
+            print(Fore.YELLOW + "Sağlayıcı istatistikleri kaydedilemedi:", e)
+
+    def _entry(self, route):
+        name = self.route_name(route)
+        if name not in self._stats:
+            self._stats[name] = {"latency": {"stream": deque(maxlen=ROUTER_WINDOW), "complete": deque(maxlen=ROUTER_WINDOW)},
+                                 "outcomes": deque(maxlen=ROUTER_WINDOW), "consecutive_failures": 0, "cooldown_until": 0.0}
+        return self._stats[name]
+
+    def record_latency(self, route, latency, stream):
+        with self._lock:
+            self._entry(route)["latency"]["stream" if stream else "complete"].append(round(latency, 3))
+
+    def record_success(self, route, latency, stream):
+        self.record_latency(route, latency, stream)
+        # Duvar saati: cooldown süresi çalıştırmalar arasında saklanıyor
+        with self._lock:
+            entry = self._entry(route)
+            entry["outcomes"].append(1)
+            entry["consecutive_failures"] = 0
+            entry["cooldown_until"] = 0.0
+
+    def record_failure(self, route):
+        with self._lock:
+            entry = self._entry(route)
+            entry["outcomes"].append(0)
+            entry["consecutive_failures"] += 1
+            excess = entry["consecutive_failures"] - self.FAILURES_BEFORE_COOLDOWN
+            if excess >= 0:
+                entry["cooldown_until"] = time.time() + min(self.COOLDOWN_SECONDS * 2 ** excess, self.MAX_COOLDOWN_SECONDS)
+
+    @staticmethod
+    def _percentile(values, fraction):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def route_stats(self, route, stream=False):
+        """Rotanın medyan ve hedge yüzdelik gecikmesi, hata oranı ve dinlenme durumu."""
+        with self._lock:
+            entry = self._entry(route)
+            latencies = list(entry["latency"]["stream" if stream else "complete"])
+            outcomes = list(entry["outcomes"])
+            cooldown_until = entry["cooldown_until"]
+        return {
+            "p50": self._percentile(latencies, 0.5) if latencies else None,
+            "hedge_latency": self._percentile(latencies, self.hedge_percentile) if len(latencies) >= self.MIN_HEDGE_SAMPLES else None,
+            "samples": len(latencies),
+            "error_rate": 1 - sum(outcomes) / len(outcomes) if outcomes else 0.0,
+            "cooling_down": cooldown_until > time.time(),
+            "cooldown_until": cooldown_until,
+        }
+
+    def ranked_routes(self, stream=False):
+        """
+        Rotaları tahmini gecikmeye göre sıralar: medyan * (1 + 4 * hata oranı). Hiç ölçülmemiş rotalar
+        yapılandırma sırasıyla öne alınır, böylece her rota en az bir kez denenip ölçülür.
+        Dinlenmedeki rotalar en sona, dinlenmesi en erken biteni önce olacak şekilde eklenir.
+        """
+        stats = [self.route_stats(route, stream) for route in self.routes]
+
+        def score(index):
+            entry = stats[index]
+            if entry["cooling_down"]:
+                return (1, entry["cooldown_until"], index)
+            if entry["p50"] is None:
+                return (0, -1.0, index)
+            return (0, entry["p50"] * (1 + 4 * entry["error_rate"]), index)
+        return [self.routes[index] for index in sorted(range(len(self.routes)), key=score)]
+
+    def best_route(self, stream=False):
+        if not self.routes:
+            raise ValueError("Yönlendirici için yapılandırılmış LLM sağlayıcısı yok.")
+        return self.ranked_routes(stream)[0]
+
+    def hedge_delay(self, route, stream=False):
+        latency = self.route_stats(route, stream)["hedge_latency"]
+        return max(self.MIN_HEDGE_DELAY, latency if latency is not None else self.hedge_after)
+
+    def _run_attempt(self, attempt, full_text, system_prompt, reasoning, stream, results):
+        """Denemeyi kendi iş parçacığında çalıştırır; parçaları (deneme, tür, değer) olarak kuyruğa koyar."""
+        route = attempt["route"]
+        cancelled = attempt["cancelled"]
+        started = attempt["started"]
+        try:
+            with llm_call_context(cancelled, ROUTER_MAX_RETRIES):
+                if stream:
+                    chunks = open_route_stream(full_text, route, system_prompt, reasoning)
+                else:
+                    answer = route_answer(full_text, route, system_prompt, reasoning)
+                    if not answer:
+                        raise RuntimeError("Boş cevap")
+                    chunks = iter([answer])
+                try:
+                    for index, chunk in enumerate(chunks):
+                        if cancelled.is_set():
+                            return
+                        if index == 0:
+                            self.record_success(route, time.monotonic() - started, stream)
+                        results.put((attempt, "chunk", chunk))
+                finally:
+                    # Akışı kapatmak HTTP bağlantısını ve model slotunu bırakır
+                    close = getattr(chunks, "close", None)
+                    if close is not None:
+                        close()
+            results.put((attempt, "done", None))
+        except LLMCallCancelled:
+            pass
+        except Exception as e:
+            if not cancelled.is_set():
+                self.record_failure(route)
+                results.put((attempt, "error", e))
+
+    def iter_answer(self, full_text, system_prompt, reasoning=True, stream=False, winner=None):
+        """
+        Cevap parçalarını kazanan denemeden verir. Akışsız istekte tek parça tam cevaptır; akışlıda yarış
+        ilk token'a kadardır. Kazanan rota winner sözlüğüne yazılır.
+        """
+        candidates = self.ranked_routes(stream)
+        if not candidates:
+            raise ValueError("Yönlendirici için yapılandırılmış LLM sağlayıcısı yok.")
+        results = queue.Queue()
+        active = []
+        errors = []
+
+        def launch():
+            route = candidates.pop(0)
+            attempt = {"route": route, "cancelled": threading.Event(), "started": time.monotonic()}
+            active.append(attempt)
+            # Kaybeden deneme arka planda bitebilir; daemon iş parçacığı programın kapanmasını bekletmez
+            threading.Thread(target=bind_run_report(self._run_attempt), daemon=True, name="llm-route",
+                             args=(attempt, full_text, system_prompt, reasoning, stream, results)).start()
+            return attempt
+
+        first = launch()
+        hedge_at = time.monotonic() + self.hedge_delay(first["route"], stream) if self.hedge and candidates else None
+        chosen = None
+        try:
+            while True:
+                timeout = None if chosen is not None or hedge_at is None else max(0.0, hedge_at - time.monotonic())
+                try:
+                    attempt, kind, value = results.get(timeout=timeout)
+                except queue.Empty:
+                    hedge_at = None
+                    hedged = launch()
+                    report_count("llm_hedged")
+                    print(Fore.YELLOW + f"{self.route_name(first['route'])} gecikti, {self.route_name(hedged['route'])} rotasına ikinci istek gönderildi.")
+                    continue
+                if chosen is None:
+                    if kind == "error":
+                        active.remove(attempt)
+                        errors.append(f"{self.route_name(attempt['route'])}: {value}")
+                        if candidates and not active:
+                            report_count("llm_failovers")
+                            print(Fore.YELLOW + f"{errors[-1]} hatası, {self.route_name(candidates[0])} rotasına geçiliyor.")
+                            launch()
+                        elif not active:
+                            raise RuntimeError("Tüm LLM sağlayıcıları başarısız oldu: " + "; ".join(errors))
+                        continue
+                    chosen = attempt
+                    for other in active:
+                        if other is not chosen:
+                            other["cancelled"].set()
+                            # Kaybedenin gecikmesi en az bu kadar; kaydedilmezse sürekli kaybeden yavaş rota hızlı görünmeye devam eder
+                            self.record_latency(other["route"], time.monotonic() - other["started"], stream)
+                    if chosen is not first:
+                        report_count("llm_hedge_wins")
+                    if winner is not None:
+                        winner["route"] = chosen["route"]
+                if attempt is not chosen:
+                    continue
+                if kind == "chunk":
+                    yield value
+                elif kind == "done":
+                    return
+                else:
+                    raise value
+        finally:
+            # Tüketici erken bıraktıysa ya da hata olduysa süren tüm denemeleri iptal et
+            for attempt in active:
+                attempt["cancelled"].set()
+            self.save_stats()
+
+def route_answer(full_text, route, system_prompt, reasoning=True):
+    provider, model_name, api_key = route
     if provider == "ollama":
-        return model_to_answer_ollama(full_text, model_name=model_name, prompt=prompt, language=language)
+        return model_to_answer_ollama(full_text, model_name=model_name, prompt=system_prompt)
     elif provider == "gemini":
-        return model_to_answer(full_text, model_name=model_name, prompt=prompt, language=language)
+        return model_to_answer(full_text, model_name=model_name, prompt=system_prompt)
+    return model_to_answer_openrouter(full_text, model_name=model_name, prompt=system_prompt, api_key=api_key, reasoning=reasoning)
+
+def open_route_stream(full_text, route, system_prompt, reasoning=True):
+    """Rotanın ham token akışını açar (<think> blokları dahil; print_stream temizler)."""
+    provider, model_name, api_key = route
+    if provider == "ollama":
+        return get_ollama_client().stream_generate(full_text, model_name, system=system_prompt)
+    elif provider == "gemini":
+        model = get_model(model_name=model_name, prompt=system_prompt, GOOGLE_API_KEY=api_key)
+        return gemini_stream_text(start_stream(lambda: model.generate_content(full_text, stream=True), "Gemini"), model_name)
+    client = get_openrouter_client(api_key)
+    return client.stream_chat(client.build_messages(full_text, system_prompt), model_name, reasoning=reasoning)
+
+_PROVIDER_ROUTER = {}
+_PROVIDER_ROUTER_LOCK = threading.Lock()
+
+def get_provider_router():
+    """Süreç boyunca paylaşılan yönlendirici; hedge ayarları AI_NOTER_HEDGE* ortam değişkenlerinden okunur."""
+    with _PROVIDER_ROUTER_LOCK:
+        if "router" not in _PROVIDER_ROUTER:
+            _PROVIDER_ROUTER["router"] = ProviderRouter(
+                hedge=os.getenv("AI_NOTER_HEDGE", "0") == "1",
+                hedge_percentile=float(os.getenv("AI_NOTER_HEDGE_PERCENTILE", "0.9")),
+                hedge_after=float(os.getenv("AI_NOTER_HEDGE_AFTER", "30")),
+            )
+        return _PROVIDER_ROUTER["router"]
+
+def resolve_routes(model_names=None, preferred=None):
+    """Kullanılabilir (API anahtarı olan ya da sunucusu çalışan) tüm sağlayıcıları rota olarak döndürür."""
+    model_names = model_names or {}
+    providers = sorted(ROUTER_PROVIDERS, key=lambda provider: provider != preferred)
+    routes = []
+    for provider in providers:
+        try:
+            routes.append(resolve_provider(provider, model_names.get(provider)))
+        except (ValueError, RuntimeError) as e:
+            print(Fore.YELLOW + f"{provider} yönlendirmeye eklenmedi:", e)
+    if not routes:
+        raise ValueError("No LLM provider is available for routing. Set OPENROUTER_API_KEY or GOOGLE_API_KEY, or start Ollama.")
+    return routes
+
+def model_to_answer_routed(full_text, prompt=None, language="tr", reasoning=True, stream=False):
+    """
+    İsteği ProviderRouter ile gönderir. Önbellekte herhangi bir rotanın cevabı varsa o kullanılır;
+    yeni cevap, onu üreten rotanın anahtarıyla önbelleğe yazılır.
+    """
+    router = get_provider_router()
+    system_prompt = prompt if prompt is not None else get_prompt(language)
+    if _LLM_CACHE["enabled"]:
+        for provider, model_name, _ in router.routes:
+            answer = llm_cache_get(llm_cache_key(full_text, system_prompt, model_name, provider, reasoning))
+            if answer is not None:
+                report_cache("notes", True)
+                if stream:
+                    print(answer)
+                return answer
+        report_cache("notes", False)
+
+    winner = {}
+    with report_stage("llm"):
+        chunks = router.iter_answer(full_text, system_prompt, reasoning=reasoning, stream=stream, winner=winner)
+        answer = print_stream(chunks) if stream else "".join(chunks)
+    if answer and _LLM_CACHE["enabled"]:
+        provider, model_name, _ = winner["route"]
+        llm_cache_put(llm_cache_key(full_text, system_prompt, model_name, provider, reasoning), answer, model_name=model_name, provider=provider)
+    return answer
+
+def get_chunk_prompt(language="tr"):
+    if language == "tr":
+        prefix = """
+        Sana uzun bir video metninin yalnızca bir bölümünü vereceğim. Metnin başındaki [başlangıç - bitiş] zaman aralığını notlarında koru.
+        Sadece bu bölümdeki bilgileri çıkar; diğer bölümler ayrıca işlenip daha sonra birleştirilecek.
+        """
+    else:
+        prefix = """
+        I will give you only one section of a long video transcript. Keep the [start - end] time range at the beginning of the text in your notes.
+        Extract only the information in this section; the other sections are processed separately and merged later.
+        """
+    return prefix + get_prompt(language)
+
+def get_reduce_prompt(language="tr"):
+    if language == "tr":
+        prefix = """
+        Sana uzun bir videonun ardışık bölümlerinden çıkarılmış kısmi notları vereceğim.
+        Bu notları tek bir bütün not halinde birleştir: tekrar eden bilgileri ayıkla, bölümler arası bağlantıları kur ve hiçbir kritik detayı kaybetme.
+        Zaman aralıklarını ilgili başlıkların yanında koru.
+        """
     else:
-        return model_to_answer_openrouter(full_text, model_name=model_name, prompt=prompt, language=language, api_key=api_key)
+        prefix = """
+        I will give you partial notes extracted from consecutive sections of a long video.
+        Merge them into a single coherent note: remove duplicated information, connect related points across sections and do not lose any critical detail.
+        Keep the time ranges next to the related headings.
+        """
+    return prefix + get_prompt(language)
+
+def estimate_tokens(text):
+    """Metnin token sayısını kabaca tahmin eder (~4 karakter = 1 token)."""
+    return (len(text) + 3) // 4
+
+def format_timestamp(seconds):
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+def chunk_segments(segments, max_tokens=6000, max_seconds=1200):
+    """[start, end, text] segmentlerini token ve süre bütçesine göre ardışık parçalara böler (max_seconds=None ise yalnızca token)."""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for segment in segments:
+        tokens = estimate_tokens(segment[2])
+        too_long = bool(current) and max_seconds is not None and segment[1] - current[0][0] > max_seconds
+        if current and (current_tokens + tokens > max_tokens or too_long):
+            chunks.append(current)
+            current = []
+            current_tokens = 0
+        current.append(segment)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def chunk_to_text(chunk):
+    time_range = f"[{format_timestamp(chunk[0][0])} - {format_timestamp(chunk[-1][1])}]"
+    return time_range + "\n" + "".join([segment[2] for segment in chunk])
+
+def map_chunks(texts, prompt, model_name, language="tr", provider="openrouter", api_key=None, max_workers=4):
+    """Her parçayı aynı sağlayıcıya paralel olarak gönderir, sonuçları sırayı koruyarak döndürür."""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(bind_run_report(model_to_answer_choose), text, model_name=model_name, prompt=prompt, language=language, provider=provider, api_key=api_key)
+            for text in texts
+        ]
+        return [future.result() or "" for future in futures]
+
+def reduce_notes(partial_notes, model_name, language="tr", provider="openrouter", api_key=None, max_tokens=6000, max_workers=4, stream=False):
+    """Kısmi notları birleştirir; bütçeyi aşarsa önce gruplar halinde ara birleştirme yapar."""
+    reduce_prompt = get_reduce_prompt(language)
+    separator = "\n\n---\n\n"
+    while len(partial_notes) > 1 and estimate_tokens(separator.join(partial_notes)) > max_tokens:
+        groups = []
+        current = []
+        for note in partial_notes:
+            if current and estimate_tokens(separator.join(current + [note])) > max_tokens:
+                groups.append(current)
+                current = []
+            current.append(note)
+        if current:
+            groups.append(current)
+        if len(groups) == len(partial_notes):
+            # Her not tek başına bütçeyi dolduruyor, ara birleştirme ilerleme sağlamaz
+            break
+        partial_notes = map_chunks([separator.join(group) for group in groups], reduce_prompt, model_name, language=language, provider=provider, api_key=api_key, max_workers=max_workers)
+    return model_to_answer_choose(separator.join(partial_notes), model_name=model_name, prompt=reduce_prompt, language=language, provider=provider, api_key=api_key, stream=stream)
+
+def model_to_answer_chunked(segments, model_name='gemini-1.5-flash', language="tr", provider="openrouter", api_key=None, max_tokens=6000, max_seconds=1200, max_workers=4, stream=False):
+    """Uzun transkriptler için map-reduce özetleme: parçaları paralel özetler, ardından notları birleştirir."""
+    chunks = chunk_segments(segments, max_tokens=max_tokens, max_seconds=max_seconds)
+    if len(chunks) <= 1:
+        full_text = "".join([segment[2] for segment in segments])
+        return model_to_answer_choose(full_text, model_name=model_name, prompt=None, language=language, provider=provider, api_key=api_key, stream=stream)
+
+    print(Fore.YELLOW + f"Transkript {len(chunks)} parçaya bölündü, {min(max_workers, len(chunks))} paralel istekle özetleniyor...")
+    partial_notes = map_chunks([chunk_to_text(chunk) for chunk in chunks], get_chunk_prompt(language), model_name, language=language, provider=provider, api_key=api_key, max_workers=max_workers)
+    return reduce_notes(partial_notes, model_name, language=language, provider=provider, api_key=api_key, max_tokens=max_tokens, max_workers=max_workers, stream=stream)
+
+# Transkript sıkıştırma: LLM'e gitmeden önce dolguları, tekrarlanan kelime gruplarını ve Whisper'ın tekrar
+# döngülerini atarak istem token sayısını azaltır. Her seviye bir öncekini içerir:
+#   1: bölünmüş parçaları birleştirme, dolgu sesleri (ıı, eee, uh, um), art arda tekrarlanan 1-4 kelimelik gruplar
+#   2: + söylem dolguları (yani, işte, hani / you know, I mean, basically)
+#   3: + son birkaç cümleyle neredeyse aynı olan cümlelerin atılması
+COMPACTION_FILLERS = {
+    "tr": {1: ("ı+", "ıh+", "e{2,}", "eh+", "ah+", "hı+m*", "h?m{2,}", "hm+"),
+           2: ("yani", "işte", "hani", "falan", "filan", "aslında", "açıkçası")},
+    "en": {1: ("u+h+", "u+m+", "e+r+m+", "a+h+", "h?m{2,}", "hm+"),
+           2: ("you know", "i mean", "basically", "literally", "actually")},
+}
+_FILLER_PATTERNS = {}
+_SENTENCE_END = (".", "!", "?", "…")
+
+def get_filler_pattern(language, level):
+    key = (language, level)
+    if key not in _FILLER_PATTERNS:
+        fillers = [filler for filler_level, words in COMPACTION_FILLERS.get(language, {}).items() if filler_level <= level for filler in words]
+        # IGNORECASE altında "ı" da "i", "I" ve "İ" ile eşleşir; "ı" içeren dolgular Roma rakamlarını ("II", "III"),
+        # İngilizce "I"yı ve "him" gibi kelimeleri silmesin diye büyük/küçük harfe duyarlı eşleştirilir
+        alternatives = [filler.replace(" ", r"\s+") for filler in fillers]
+        alternatives = [f"(?-i:{alternative})" if "ı" in alternative else alternative for alternative in alternatives]
+        # Dolguyu çevreleyen virgüller de atılır: "model, uh, done" -> "model done"
+        _FILLER_PATTERNS[key] = re.compile(r"(?:,\s*)?(?<!\w)(?:" + "|".join(alternatives) + r")(?!\w),?",
+                                           re.IGNORECASE) if fillers else None
+    return _FILLER_PATTERNS[key]
+
+def merge_segment_fragments(segments, max_gap=1.0, max_seconds=30.0):
+    """Cümle sonu noktalaması olmayan ve hemen ardından gelen segmentle birleştirilebilen VAD parçalarını birleştirir."""
+    merged = []
+    for start, end, text in segments:
+        if merged:
+            previous = merged[-1]
+            if (not previous[2].rstrip().endswith(_SENTENCE_END) and start - previous[1] <= max_gap
+                    and end - previous[0] <= max_seconds):
+                previous[1] = end
+                previous[2] += text
+                continue
+        merged.append([start, end, text])
+    return merged
+
+_WORD_PUNCTUATION = ".,;:!?…\"'()[]-"
+_CLAUSE_PUNCTUATION = ".,;:!?…"
+
+def attach_orphan_punctuation(words):
+    """
+    Atılan dolgudan geriye kalan tek başına noktalamayı ("Hmm." -> ".") önceki kelimeye ekler;
+    önceki kelime zaten noktalamayla bitiyorsa ya da önceki kelime yoksa atar.
+    """
+    result = []
+    for word in words:
+        if word.strip(_CLAUSE_PUNCTUATION):
+            result.append(word)
+        elif result and not result[-1].endswith(tuple(_CLAUSE_PUNCTUATION)):
+            result[-1] += word
+    return result
+
+def drop_repeated_ngrams(words, max_n=4):
+    """
+    Art arda tekrarlanan 1..max_n kelimelik grupları tek kopyaya indirir ("The the", "I think I think");
+    ilk kopya yazımıyla kalır, son kopyanın sondaki noktalaması ona taşınır. (kelimeler, karşılaştırma anahtarları) döndürür.
+    """
+    # Baştaki None dolgusu sınır kontrollerini gereksiz kılar; None hiçbir anahtara eşit olmaz
+    result = [None] * (2 * max_n)
+    keys = [None] * (2 * max_n)
+    ngram_sizes = range(1, max_n + 1)
+    for word, key in zip(words, [word.strip(_WORD_PUNCTUATION) for word in map(str.casefold, words)]):
+        result.append(word)
+        keys.append(key)
+        if not key:
+            continue
+        for n in ngram_sizes:
+            # Ucuz ön kontrol: yalnızca son kelime n önceki kelimeyle aynıysa dilimleri karşılaştır
+            if keys[-1 - n] == key and keys[-n:] == keys[-2 * n:-n]:
+                kept = result[-n - 1]
+                stem = kept.rstrip(_WORD_PUNCTUATION)
+                # Son kopyanın noktalaması yoksa ilk kopyanın kapanış tırnağı/parantezi korunur, virgülü atılır
+                trailing = word[len(word.rstrip(_WORD_PUNCTUATION)):] or kept[len(stem):].strip(_CLAUSE_PUNCTUATION)
+                result[-n - 1] = stem + trailing
+                del result[-n:]
+                del keys[-n:]
+                break
+    return result[2 * max_n:], keys[2 * max_n:]
+
+def _is_near_duplicate(shingles, previous, similarity):
+    smaller, larger = sorted((len(shingles), len(previous)))
+    if smaller < similarity * larger:
+        return False  # Jaccard benzerliği en fazla küçük/büyük oranı kadar olabilir
+    common = len(shingles & previous)
+    return common >= similarity * (len(shingles) + len(previous) - common)
+
+def compact_segments(segments, language="tr", level=1, window=8, similarity=0.8):
+    """
+    [start, end, text] segmentlerini COMPACTION_FILLERS seviyelerine göre sıkıştırır; zaman damgaları korunur.
+    Her segment bir kez işlendiği için çok saatlik transkriptlerde de doğrusal zamanda çalışır.
+    Önce/sonra token sayıları çalıştırma raporuna yazılır.
+    """
+    if level <= 0:
+        return segments
+    filler_pattern = get_filler_pattern(language, level)
+    recent = deque(maxlen=window)
+    compacted = []
+    for start, end, text in merge_segment_fragments(segments):
+        if filler_pattern is not None:
+            text = filler_pattern.sub(" ", text)
+        words, keys = drop_repeated_ngrams(attach_orphan_punctuation(text.split()))
+        if not words:
+            continue
+        if level >= 3:
+            shingles = set(zip(keys, keys[1:], keys[2:])) or {tuple(keys)}
+            if any(_is_near_duplicate(shingles, previous, similarity) for previous in recent):
+                continue
+            recent.append(shingles)
+        compacted.append([start, end, " " + " ".join(words)])
+
+    tokens_before = estimate_tokens("".join(segment[2] for segment in segments))
+    tokens_after = estimate_tokens("".join(segment[2] for segment in compacted))
+    report_count("compaction_tokens_before", tokens_before)
+    report_count("compaction_tokens_after", tokens_after)
+    print(Fore.YELLOW + f"Transkript sıkıştırıldı (seviye {level}): ~{tokens_before} -> ~{tokens_after} token "
+          f"(%{100 * (1 - tokens_after / max(tokens_before, 1)):.0f} azalma)")
+    return compacted
+
+AUDIO_EXTENSIONS = (".pcm", ".mp3", ".m4a", ".webm", ".opus", ".ogg", ".mp4", ".aac", ".wav", ".flac")
+WHISPER_SAMPLING_RATE = 16000
+VAD_PARAMETERS = dict(min_silence_duration_ms=100)
+
+def find_cached_audio(output_path):
+    """Önbellekteki ses dosyasını bulur; çözülmüş PCM varsa onu tercih eder."""
+    for extension in AUDIO_EXTENSIONS:
+        if os.path.exists(output_path + extension):
+            CacheManager.touch(output_path + extension)
+            return output_path + extension
+    return None
+
+def decode_audio_to_pcm(input_file, output_file=None, sampling_rate=WHISPER_SAMPLING_RATE, start=0.0, end=math.inf):
+    """
+    Sesi tek bir ffmpeg geçişiyle 16 kHz mono float32 ham PCM'e çözer.
+    output_file verilirse ffmpeg doğrudan dosyaya yazar (bellek kullanılmaz) ve dosya yolu döner,
+    verilmezse numpy dizisi döner. start/end verilirse ffmpeg o konuma atlar ve yalnızca aralığı çözer.
+    """
+    command = ["ffmpeg", "-nostdin", "-v", "error"]
+    if start > 0:
+        command += ["-ss", f"{start:.3f}"]
+    if not math.isinf(end):
+        command += ["-to", f"{end:.3f}"]
+    command += ["-i", input_file, "-f", "f32le", "-ac", "1", "-ar", str(sampling_rate)]
+    if output_file is not None:
+        temp_file = output_file + ".tmp"
+        with report_stage("decode"):
+            subprocess.run(command + ["-y", temp_file], check=True)
+        os.replace(temp_file, output_file)
+        return output_file
+
+    import numpy as np
+    with report_stage("decode"):
+        result = subprocess.run(command + ["-"], capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def load_pcm(pcm_path):
+    """Ham float32 PCM önbellek dosyasını belleğe kopyalamadan (memmap) açar."""
+    import numpy as np
+    return np.memmap(pcm_path, dtype=np.float32, mode="r")
+
+def load_audio(input_file):
+    """run_whisper için girdiyi hazırlar: .pcm dosyaları memmap olarak, diğerleri olduğu gibi verilir."""
+    if isinstance(input_file, str) and input_file.endswith(".pcm"):
+        return load_pcm(input_file)
+    return input_file
+
+def decode_native_to_pcm(native_path, output_path):
+    pcm_path = decode_audio_to_pcm(native_path, output_path + ".pcm")
+    os.remove(native_path)
+    return pcm_path
+
+# Video kimliği -> başlık, süre, ses ve transkript yolları. Önbellekteki videolar ağa çıkmadan açılır.
+METADATA_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY, title TEXT, duration REAL, channel TEXT, url TEXT,
+    audio_path TEXT, transcript_path TEXT, updated_at REAL
+);
+"""
+METADATA_FIELDS = ("title", "duration", "channel", "url", "audio_path", "transcript_path")
+
+def get_metadata_index_path(video_cache_path=None):
+    return os.path.join(video_cache_path or get_cache_dir(), "metadata.sqlite3")
+
+def open_metadata_index(video_cache_path=None):
+    import sqlite3
+    os.makedirs(video_cache_path or get_cache_dir(), exist_ok=True)
+    connection = sqlite3.connect(get_metadata_index_path(video_cache_path), timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(METADATA_INDEX_SCHEMA)
+    return connection
+
+def get_video_metadata(video_id, video_cache_path=None):
+    """Kayıtlı video bilgilerini sözlük olarak döndürür, yoksa None."""
+    connection = open_metadata_index(video_cache_path)
+    try:
+        row = connection.execute(f"SELECT {', '.join(METADATA_FIELDS)} FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+    finally:
+        connection.close()
+    return dict(zip(METADATA_FIELDS, row)) if row else None
+
+def update_video_metadata(video_id, video_cache_path=None, **fields):
+    """Verilen alanları kaydeder; None olan alanlar mevcut değerin üzerine yazılmaz."""
+    fields = {key: value for key, value in fields.items() if key in METADATA_FIELDS and value is not None}
+    columns = ", ".join(fields)
+    placeholders = ", ".join("?" for _ in fields)
+    updates = ", ".join(f"{key} = excluded.{key}" for key in fields)
+    connection = open_metadata_index(video_cache_path)
+    try:
+        with connection:
+            connection.execute(
+                f"INSERT INTO videos (video_id, updated_at{', ' if fields else ''}{columns}) VALUES (?, ?{', ' if fields else ''}{placeholders}) "
+                f"ON CONFLICT(video_id) DO UPDATE SET updated_at = excluded.updated_at{', ' if fields else ''}{updates}",
+                (video_id, time.time(), *fields.values()),
+            )
+    finally:
+        connection.close()
 
-def download_audio_from_youtube(url, video_cache_path):
-    os.makedirs(video_cache_path, exist_ok=True)
-    
-    # Video bilgilerini çek
+def update_video_metadata_safe(video_id, video_cache_path=None, **fields):
+    """Metadata indeksi yazılamazsa ana akış durmaz; bir sonraki çalıştırma bilgiyi tekrar çeker."""
     try:
-        with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True}) as ydl:
-            info = ydl.extract_info(url, download=False)
-            video_id = info.get("id", url.split("v=")[-1])
-            title = info.get("title", "unknown_title")
+        update_video_metadata(video_id, video_cache_path, **fields)
     except Exception as e:
-        print("Video bilgileri alınamadı:", e)
-        return None, None
+        print(Fore.YELLOW + "Video bilgileri indekse yazılamadı:", e)
+
+def metadata_from_info(info):
+    return {
+        "title": info.get("title", "unknown_title"),
+        "duration": info.get("duration"),
+        "channel": info.get("channel") or info.get("uploader"),
+        "url": info.get("webpage_url"),
+    }
+
+def _audio_download_options(output_template, audio_format, codec="mp3"):
+    if audio_format in ("native", "pcm"):
+        return {'format': 'bestaudio/best', 'outtmpl': output_template + ".%(ext)s", 'noplaylist': True, 'quiet': True, 'no_warnings': True}
+    return {
+        'format': 'bestaudio/best',
+        'noplaylist': True,
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': codec,
+            'preferredquality': '192',
+        }],
+        'outtmpl': output_template,
+        'quiet': codec == "mp3",
+        'no_warnings': True
+    }
+
+def _download_native_audio(info, output_template, output_path, audio_format):
+    """Sesi kabıyla indirir; "pcm" ise PCM'e çözer. Çözme başarısız olursa yarım kalan dosyalar silinir."""
+    with report_stage("download"), yt_dlp.YoutubeDL(_audio_download_options(output_template, audio_format)) as ydl:
+        downloaded_info = ydl.process_ie_result(info, download=True)
+        audio_path = ydl.prepare_filename(downloaded_info)
+    if audio_format != "pcm":
+        return audio_path
+    try:
+        return decode_native_to_pcm(audio_path, output_path)
+    except subprocess.CalledProcessError:
+        for path in (audio_path, output_path + ".pcm.tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+def _download_encoded_audio(info, output_template, output_path):
+    """Sesi mp3'e, o da başarısız olursa m4a'ya dönüştürerek indirir; ikisi de başarısız olursa None döndürür."""
+    for codec, extension in (("mp3", ".mp3"), ("aac", ".m4a")):
+        try:
+            with report_stage("download"), yt_dlp.YoutubeDL(_audio_download_options(output_template, "mp3", codec)) as ydl:
+                ydl.process_ie_result(info, download=True)
+            return output_path + extension
+        except Exception as e:
+            print("Hata:", e)
+            if codec == "mp3":
+                print("mp3 formatında indirme başarısız. m4a formatında indiriliyor.")
+    print("Ses indirilemedi.")
+    return None
 
-    output_path = os.path.join(video_cache_path, "audio_files", f"{video_id}")
+def download_audio_from_youtube(url, video_cache_path, audio_format="native", info=None):
+    """
+    audio_format:
+      - "native": bestaudio kabı (webm/m4a) yeniden kodlanmadan saklanır, Whisper tek seferde çözer.
+      - "pcm": kap tek bir ffmpeg geçişiyle 16 kHz mono float32 .pcm dosyasına çözülür, kap silinir.
+      - "mp3": eski davranış, 192 kbps mp3'e (başarısız olursa aac) dönüştürülür.
+    native/pcm indirmesi ya da çözme başarısız olursa mp3/m4a indirmesine düşülür; o da başarısız olursa
+    (None, None) döner.
+    Video kimliği bağlantıdan yerelde çıkarılır; ses ve başlık önbellekteyse ağa hiç çıkılmaz.
+    Aksi halde bilgiler tek bir extract_info ile alınır ve aynı sonuç indirme için yeniden kullanılır;
+    bilgiler daha önce çekildiyse (ör. altyazı denemesinde) info ile verilir ve hiç çıkarma yapılmaz.
+    """
+    audio_dir = os.path.join(video_cache_path, "audio_files")
+    os.makedirs(audio_dir, exist_ok=True)
+
+    def cached_result(video_id, title):
+        output_path = os.path.join(audio_dir, video_id)
+        cached_audio = find_cached_audio(output_path)
+        if cached_audio is None:
+            return None
+        if audio_format == "pcm" and not cached_audio.endswith(".pcm"):
+            cached_audio = decode_native_to_pcm(cached_audio, output_path)
+            update_video_metadata_safe(video_id, video_cache_path, audio_path=cached_audio)
+        return cached_audio, title
+
+    video_id = info["id"] if info is not None else parse_youtube_video_id(url)
+    metadata = get_video_metadata(video_id, video_cache_path) if video_id else None
+    if metadata is not None and metadata.get("title"):
+        result = cached_result(video_id, metadata["title"])
+        report_cache("metadata", True)
+        report_cache("audio", result is not None)
+        if result is not None:
+            return result
+    else:
+        report_cache("metadata", False)
 
-    if os.path.exists(output_path + ".mp3"):
-        return output_path + ".mp3", title
-    elif os.path.exists(output_path + ".m4a"):
-        return output_path + ".m4a", title
+    # Video bilgilerini tek seferde çek; indirme aynı bilgi sözlüğüyle yapılır
+    output_template = os.path.join(audio_dir, "%(id)s")
+    if info is None:
+        try:
+            with report_stage("metadata"), yt_dlp.YoutubeDL(_audio_download_options(output_template, audio_format)) as ydl:
+                info = ydl.extract_info(url, download=False)
+        except Exception as e:
+            print("Video bilgileri alınamadı:", e)
+            return None, None
+
+    video_id = info.get("id", video_id or url.split("v=")[-1])
+    video_metadata = metadata_from_info(info)
+    title = video_metadata["title"]
+    update_video_metadata_safe(video_id, video_cache_path, **video_metadata)
+
+    # Aynı videoyu indiren başka bir süreç varsa onu bekle; bittiğinde ses önbellekten okunur
+    with get_cache_manager(video_cache_path).lock(f"audio-{video_id}"):
+        result = cached_result(video_id, title)
+        if metadata is None or not metadata.get("title"):
+            report_cache("audio", result is not None)
+        if result is not None:
+            update_video_metadata_safe(video_id, video_cache_path, audio_path=result[0])
+            return result
+
+        output_path = os.path.join(audio_dir, video_id)
+        audio_path = None
+        if audio_format in ("native", "pcm"):
+            try:
+                audio_path = _download_native_audio(info, output_template, output_path, audio_format)
+            except (yt_dlp.utils.DownloadError, subprocess.CalledProcessError) as e:
+                print("Hata:", e)
+                print("Ses özgün biçiminde indirilemedi. mp3 formatında indiriliyor.")
+        if audio_path is None:
+            audio_path = _download_encoded_audio(info, output_template, output_path)
+        if audio_path is None:
+            return None, None
+
+        update_video_metadata_safe(video_id, video_cache_path, audio_path=audio_path)
+        prune_cache_safe(video_cache_path, keep=(audio_path,))
+    return audio_path, title
+
+# Altyazı hızlı yolu: videonun mevcut altyazılarından Whisper çıktısıyla aynı yapıda transkript üretir
+CAPTION_FORMATS = ("json3", "srv3", "srv2", "srv1", "vtt")
+
+def _caption_words(start, end, text):
+    """Kelime zamanı olmayan altyazı satırının süresini kelimelere uzunluklarıyla orantılı dağıtır."""
+    words = text.split()
+    total = sum(len(word) + 1 for word in words)
+    result = []
+    cursor = start
+    for word in words:
+        word_end = cursor + (end - start) * (len(word) + 1) / total
+        result.append([cursor, word_end, " " + word])
+        cursor = word_end
+    return result
+
+def _captions_to_lists(cues):
+    """(başlangıç, bitiş, metin, kelimeler) listesini print_segments çıktısı biçimine çevirir."""
+    word_by_word = []
+    senteces = []
+    for start, end, text, words in cues:
+        text = re.sub(r"\s+", " ", text).strip()
+        if not text:
+            continue
+        words = words or _caption_words(start, end, text)
+        word_by_word.extend(words)
+        senteces.append([start, end, " " + text])
+    return word_by_word, senteces
+
+def parse_json3_captions(data):
+    """YouTube json3 altyazısını çözer; otomatik altyazılardaki kelime zamanları (tOffsetMs) korunur."""
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    events = [event for event in data.get("events", []) if event.get("segs") and not event.get("aAppend")]
+    cues = []
+    for index, event in enumerate(events):
+        start = event.get("tStartMs", 0) / 1000
+        end = start + event.get("dDurationMs", 0) / 1000
+        next_start = events[index + 1].get("tStartMs", 0) / 1000 if index + 1 < len(events) else None
+        if next_start is not None and next_start > start:
+            # Otomatik altyazılarda olaylar üst üste biner; satır bir sonraki olayın başında biter
+            end = min(end, next_start) if end > start else next_start
+        segs = [seg for seg in event["segs"] if seg.get("utf8", "").strip()]
+        text = "".join(seg.get("utf8", "") for seg in event["segs"]).replace("\n", " ")
+        words = None
+        if len(segs) > 1 and any("tOffsetMs" in seg for seg in segs):
+            words = []
+            for seg_index, seg in enumerate(segs):
+                word_start = start + seg.get("tOffsetMs", 0) / 1000
+                word_end = start + segs[seg_index + 1].get("tOffsetMs", 0) / 1000 if seg_index + 1 < len(segs) else max(end, word_start)
+                words.append([word_start, word_end, " " + seg["utf8"].strip()])
+        cues.append((start, end, text, words))
+    return _captions_to_lists(cues)
+
+def parse_srv_captions(text):
+    """YouTube srv1 (<text start dur>), srv2 (<text t d>) ve srv3 (<p t d><s t>) XML altyazılarını çözer."""
+    import xml.etree.ElementTree as ElementTree
+    import html
+    root = ElementTree.fromstring(text.encode("utf-8") if isinstance(text, str) else text)
+    cues = []
+    for element in root.iter():
+        if element.tag not in ("p", "text"):
+            continue
+        if "start" in element.attrib:
+            start = float(element.get("start"))
+            end = start + float(element.get("dur", 0))
+        else:
+            start = int(element.get("t", 0)) / 1000
+            end = start + int(element.get("d", 0)) / 1000
+        spans = [span for span in element if span.tag == "s" and (span.text or "").strip()]
+        content = html.unescape("".join(element.itertext()))
+        words = None
+        if len(spans) > 1 and any("t" in span.attrib for span in spans):
+            words = []
+            for index, span in enumerate(spans):
+                word_start = start + int(span.get("t", 0)) / 1000
+                word_end = start + int(spans[index + 1].get("t", 0)) / 1000 if index + 1 < len(spans) else max(end, word_start)
+                words.append([word_start, word_end, " " + html.unescape(span.text).strip()])
+        cues.append((start, end, content, words))
+    return _captions_to_lists(cues)
+
+_VTT_TIME = r"(?:(\d+):)?(\d{2}):(\d{2})\.(\d{3})"
+_VTT_CUE_TIMING = re.compile(_VTT_TIME + r"\s+-->\s+" + _VTT_TIME)
+_VTT_INLINE_TIME = re.compile(r"<" + _VTT_TIME + r">")
+_VTT_INLINE_SPLIT = re.compile(r"(<(?:\d+:)?\d{2}:\d{2}\.\d{3}>)")
+
+def _vtt_seconds(hours, minutes, seconds, milliseconds):
+    return int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds) + int(milliseconds) / 1000
+
+def parse_vtt_captions(text):
+    """
+    WebVTT altyazısını çözer. Otomatik altyazılardaki satır içi kelime zamanları (<00:00:01.500>) kullanılır
+    ve kayan altyazıların bir önceki ipucundan tekrarlanan satırları atlanır.
+    """
+    import html
+    cues = []
+    previous_lines = []
+    # YouTube'un otomatik altyazılarında ipucu içinde tek boşluklu satırlar bulunur; ipucunu yalnızca boş satır bitirir
+    for block in re.split(r"\n{2,}", text.replace("\r\n", "\n")):
+        lines = block.strip().split("\n")
+        timing_index = next((index for index, line in enumerate(lines) if _VTT_CUE_TIMING.search(line)), None)
+        if timing_index is None:
+            continue
+        timing = _VTT_CUE_TIMING.search(lines[timing_index]).groups()
+        start, end = _vtt_seconds(*timing[:4]), _vtt_seconds(*timing[4:])
+        raw_lines = [line for line in lines[timing_index + 1:] if line.strip()]
+        plain_lines = [html.unescape(re.sub(r"<[^>]+>", "", line)).strip() for line in raw_lines]
+        # Kayan altyazı: önceki ipucunda görünen satırlar tekrar yazılmaz
+        new = [(raw, plain) for raw, plain in zip(raw_lines, plain_lines) if plain and plain not in previous_lines]
+        previous_lines = plain_lines
+        if not new:
+            continue
+
+        words = []
+        for raw, plain in new:
+            if not _VTT_INLINE_TIME.search(raw):
+                words = None
+                break
+            # "<c> kelime</c><00:00:01.500><c> kelime</c>" -> her kelimenin başlangıcı önceki zaman etiketidir
+            cursor = start
+            for part in _VTT_INLINE_SPLIT.split(raw):
+                if not part:
+                    continue
+                match = _VTT_INLINE_TIME.fullmatch(part)
+                if match:
+                    cursor = _vtt_seconds(*match.groups())
+                    continue
+                for word in html.unescape(re.sub(r"<[^>]+>", "", part)).split():
+                    words.append([cursor, cursor, " " + word])
+        if words:
+            for index in range(len(words)):
+                words[index][1] = words[index + 1][0] if index + 1 < len(words) else max(end, words[index][0])
+        cues.append((start, end, " ".join(plain for _, plain in new), words or None))
+    return _captions_to_lists(cues)
+
+def parse_captions(text, ext):
+    if ext == "json3":
+        return parse_json3_captions(text)
+    if ext in ("srv1", "srv2", "srv3"):
+        return parse_srv_captions(text)
+    if ext == "vtt":
+        return parse_vtt_captions(text)
+    raise ValueError(f"Desteklenmeyen altyazı biçimi: {ext}")
+
+def select_caption_track(info, language="tr"):
+    """
+    İstenen dil için altyazı izini seçer: önce elle eklenmiş altyazılar, sonra videonun kendi dilindeki
+    otomatik altyazılar (makine çevirisi izleri kullanılmaz). (dil, biçim, url, tür) döndürür, yoksa None.
+    """
+    video_language = (info.get("language") or "").split("-")[0] or None
+    if language in (None, "None"):
+        language = video_language
+    manual = info.get("subtitles") or {}
+    automatic = info.get("automatic_captions") or {}
+
+    candidates = []
+    if language is None:
+        candidates += [(code, manual[code], "manual") for code in manual if code != "live_chat"]
+    else:
+        candidates += [(code, manual[code], "manual") for code in manual if code.split("-")[0] == language]
+        candidates += [(code, automatic[code], "auto") for code in automatic if code == f"{language}-orig"]
+        if video_language in (None, language):
+            candidates += [(code, automatic[code], "auto") for code in automatic if code == language]
 
-    # Download audio separately and extract it as mp3
-    try:
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'outtmpl': output_path,
-            'quiet': True,
-            'no_warnings': True
-        }
+    for code, formats, kind in candidates:
+        by_ext = {entry.get("ext"): entry.get("url") for entry in formats if entry.get("url")}
+        for ext in CAPTION_FORMATS:
+            if ext in by_ext:
+                return code.split("-")[0], ext, by_ext[ext], kind
+    return None
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-        return output_path + ".mp3", title
+_CAPTION_NAME_PATTERN = re.compile(r"^(.+)_captions-([A-Za-z0-9-]+)$")
 
-    except Exception as e:
-        print("Hata:", e)
-        print("mp3 formatında indirme başarısız. m4a formatında indiriliyor.")
-        
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'aac',
-                'preferredquality': '192',
-            }],
-            'outtmpl': output_path,
-            'quiet': False,
-            'no_warnings': True
-        }
+def get_whisper_audio_path(video_id, video_cache_path):
+    """Videonun tam Whisper transkriptinin önbellek anahtarı (indirilen sesle aynı ad, uzantısız)."""
+    return os.path.join(video_cache_path, "audio_files", video_id)
+
+def get_caption_audio_path(video_id, video_cache_path, language):
+    """
+    Altyazıdan gelen transkriptler için ses dosyası olmadan kullanılan önbellek anahtarı: <video_id>_captions-<dil>.
+    Whisper transkriptlerinden ve diğer dillerin altyazılarından ayrı tutulur.
+    """
+    return os.path.join(video_cache_path, "audio_files", f"{video_id}_captions-{language}")
+
+def split_caption_name(name):
+    """get_caption_audio_path adının tersi: (video_id, dil); altyazı adı değilse (ad, None)."""
+    match = _CAPTION_NAME_PATTERN.match(name)
+    return (match.group(1), match.group(2)) if match else (name, None)
+
+def find_cached_caption_transcript(video_id, video_cache_path, language):
+    """İstenen dildeki (dil verilmediyse herhangi bir dildeki) önbellekteki altyazı transkriptini yükler, yoksa None."""
+    if language not in (None, "None"):
+        return load_transcript_cache(get_caption_audio_path(video_id, video_cache_path, language), video_cache_path)
+    for store_path in sorted(glob.glob(os.path.join(video_cache_path, glob.escape(video_id) + "_captions-*_transcript"))):
+        name = os.path.basename(store_path)[:-len("_transcript")]
+        if split_caption_name(name)[0] == video_id:
+            cached = load_transcript_cache(os.path.join(video_cache_path, "audio_files", name), video_cache_path)
+            if cached is not None:
+                return cached
+    return None
+
+def load_caption_transcript(url, video_cache_path, language="tr", allow_whisper=True):
+    """
+    Önbellekte transkript varsa ağa çıkmadan onu, yoksa videonun altyazılarını kullanır.
+    allow_whisper=True ise önbellekteki tam Whisper transkripti de kabul edilir (--transcript_source auto).
+    (video_id, başlık, transkript ya da None, info ya da None) döndürür; info, Whisper'a düşülürse
+    download_audio_from_youtube'a verilerek ikinci bir çıkarma yapılmaz.
+    """
+    video_id = parse_youtube_video_id(url)
+    if video_id:
+        cached = find_cached_caption_transcript(video_id, video_cache_path, language)
+        if cached is None and allow_whisper:
+            cached = load_transcript_cache(get_whisper_audio_path(video_id, video_cache_path), video_cache_path)
+        metadata = get_video_metadata(video_id, video_cache_path)
+        if cached is not None and metadata and metadata.get("title"):
+            report_cache("segments", True)
+            return video_id, metadata["title"], cached, None
+
+    with report_stage("metadata"), yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'noplaylist': True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+        video_id = info["id"]
+        video_metadata = metadata_from_info(info)
+        update_video_metadata_safe(video_id, video_cache_path, **video_metadata)
+
+        track = select_caption_track(info, language)
+        if track is None:
+            report_count("captions_unavailable")
+            return video_id, video_metadata["title"], None, info
+        caption_language, ext, caption_url, kind = track
+        try:
+            with report_stage("captions"):
+                text = ydl.urlopen(caption_url).read().decode("utf-8")
+            word_by_word_segments, segments = parse_captions(text, ext)
+        except Exception as e:
+            print(Fore.YELLOW + "Altyazı alınamadı, Whisper kullanılacak:", e)
+            return video_id, video_metadata["title"], None, info
+    if not segments:
+        return video_id, video_metadata["title"], None, info
+
+    print(Fore.GREEN + f"{'Elle eklenmiş' if kind == 'manual' else 'Otomatik'} altyazı kullanılıyor ({caption_language}, {ext}).")
+    report_count(f"captions_{kind}")
+    save_transcript_cache(get_caption_audio_path(video_id, video_cache_path, caption_language), video_cache_path, word_by_word_segments, segments, caption_language,
+                          title=video_metadata["title"])
+    return video_id, video_metadata["title"], (word_by_word_segments, segments, caption_language), info
+
+# Zaman aralıkları: videonun yalnızca istenen bölümleri alınır ve yazıya dökülür. Aralık transkriptleri
+# "<video_id>_<başlangıç_ms>-<bitiş_ms|end>ms" adıyla önbelleğe alınır; zaman damgaları videonun başına göredir.
+_RANGE_NAME_PATTERN = re.compile(r"^(.+?)((?:_\d+-(?:\d+|end)ms)+)$")
+_RANGE_PART_PATTERN = re.compile(r"_(\d+)-(\d+|end)ms")
+
+def parse_timestamp(text):
+    """'90', '1:30', '1:02:03.5' biçimindeki zamanı saniyeye çevirir."""
+    parts = text.strip().split(":")
+    if len(parts) > 3 or not all(part.strip() for part in parts):
+        raise ValueError(f"Geçersiz zaman: {text}")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    if seconds < 0:
+        raise ValueError(f"Geçersiz zaman: {text}")
+    return seconds
+
+def parse_time_range(text):
+    """'10:00-20:00' ya da videonun sonuna kadar '10:00-' biçimindeki aralığı (başlangıç, bitiş) olarak döndürür."""
+    start, separator, end = text.partition("-")
+    if not separator:
+        raise ValueError(f"Geçersiz aralık, BAŞLANGIÇ-BİTİŞ bekleniyor: {text}")
+    return parse_timestamp(start) if start.strip() else 0.0, parse_timestamp(end) if end.strip() else math.inf
+
+def normalize_time_ranges(ranges, duration=None):
+    """Aralıkları sıralar, çakışanları birleştirir ve biliniyorsa video süresine kırpar."""
+    result = []
+    for start, end in sorted(ranges):
+        if duration:
+            end = min(end, duration)
+        if end <= start:
+            raise ValueError(f"Geçersiz aralık: {format_time_range(start, end)}")
+        if result and start <= result[-1][1]:
+            result[-1] = (result[-1][0], max(result[-1][1], end))
+        else:
+            result.append((start, end))
+    return result
+
+def format_time_range(start, end):
+    return f"{format_timestamp(start)}-{'son' if math.isinf(end) else format_timestamp(end)}"
+
+def _range_ms(seconds):
+    return "end" if math.isinf(seconds) else str(round(seconds * 1000))
+
+def get_range_name(video_id, ranges):
+    """Aralıklara özgü önbellek adı; not dosyaları ve transkript depoları bu adla saklanır."""
+    return video_id + "".join(f"_{_range_ms(start)}-{_range_ms(end)}ms" for start, end in ranges)
+
+def split_range_name(name):
+    """get_range_name'in tersi: (video_id, aralıklar); aralıksız adlarda aralık listesi boştur."""
+    match = _RANGE_NAME_PATTERN.match(name)
+    if match is None:
+        return name, []
+    return match.group(1), [(int(start) / 1000, math.inf if end == "end" else int(end) / 1000)
+                            for start, end in _RANGE_PART_PATTERN.findall(match.group(2))]
+
+def get_range_audio_path(video_id, start, end, video_cache_path):
+    """Aralığın indirilen sesi ve transkripti için önbellek anahtarı (uzantısız)."""
+    return os.path.join(video_cache_path, "audio_files", get_range_name(video_id, [(start, end)]))
+
+def slice_transcript(transcript, ranges):
+    """Transkriptten başlangıcı verilen aralıklara düşen kelime ve segmentleri seçer."""
+    word_by_word_segments, segments, language = transcript
+    def inside(row):
+        return any(start <= row[0] < end for start, end in ranges)
+    return [word for word in word_by_word_segments if inside(word)], [segment for segment in segments if inside(segment)], language
+
+def offset_rows(rows, offset):
+    return [[start + offset, end + offset, text] for start, end, text in rows]
+
+def find_cached_range_transcripts(video_id, video_cache_path):
+    """
+    Videonun önbellekteki Whisper transkriptlerini (başlangıç, bitiş, anahtar) olarak döndürür.
+    Tam transkript tüm videoyu kapsar; altyazı transkriptleri Whisper yerine geçmediği için sayılmaz.
+    """
+    def is_cached(key):
+        return (os.path.exists(os.path.join(get_transcript_store_path(key, video_cache_path), "meta.json"))
+                or os.path.exists(get_transcript_cache_path(key, video_cache_path)))
+
+    transcripts = []
+    full_key = get_whisper_audio_path(video_id, video_cache_path)
+    if is_cached(full_key):
+        transcripts.append((0.0, math.inf, full_key))
+    for store_path in glob.glob(os.path.join(video_cache_path, glob.escape(video_id) + "_*ms_transcript")):
+        name = os.path.basename(store_path)[:-len("_transcript")]
+        name_video_id, ranges = split_range_name(name)
+        if name_video_id == video_id and len(ranges) == 1 and is_cached(os.path.join(video_cache_path, "audio_files", name)):
+            transcripts.append((*ranges[0], os.path.join(video_cache_path, "audio_files", name)))
+    return transcripts
+
+def plan_range_pieces(cached, start, end):
+    """
+    [start, end) aralığını önbellekteki transkriptlerle kapsanan ve kapsanmayan (anahtarı None) parçalara böler.
+    Her noktada en uzağa uzanan önbellek kaydı seçilir, böylece çakışan istekler ortak kısmı yeniden kullanır.
+    """
+    pieces = []
+    cursor = start
+    while cursor < end:
+        covering = [item for item in cached if item[0] <= cursor < item[1]]
+        if covering:
+            _, covered_end, key = max(covering, key=lambda item: item[1])
+            piece_end = min(covered_end, end)
+        else:
+            key = None
+            piece_end = min([item[0] for item in cached if item[0] > cursor] + [end])
+        pieces.append((cursor, piece_end, key))
+        cursor = piece_end
+    return pieces
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([url])
-        return output_path + ".m4a", title
+def get_video_details(url, video_cache_path, info=None):
+    """
+    (video_id, başlık, süre, info) döndürür. Meta veri indeksinde kayıtlı videolar için ağa çıkılmaz ve info None olur,
+    aksi halde tek bir extract_info yapılır ve sonuç indirme için yeniden kullanılmak üzere döndürülür.
+    """
+    if info is None:
+        video_id = parse_youtube_video_id(url)
+        metadata = get_video_metadata(video_id, video_cache_path) if video_id else None
+        if metadata is not None and metadata.get("title"):
+            report_cache("metadata", True)
+            return video_id, metadata["title"], metadata.get("duration"), None
+        report_cache("metadata", False)
+        with report_stage("metadata"), yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'noplaylist': True}) as ydl:
+            info = ydl.extract_info(url, download=False)
+    video_metadata = metadata_from_info(info)
+    update_video_metadata_safe(info["id"], video_cache_path, **video_metadata)
+    return info["id"], video_metadata["title"], video_metadata["duration"], info
+
+def download_audio_range(url, range_path, start, end, info=None):
+    """yt-dlp'nin bölüm indirmesiyle yalnızca [start, end) aralığının sesini range_path.<uzantı> olarak indirir."""
+    options = _audio_download_options(range_path, "native")
+    options["download_ranges"] = yt_dlp.utils.download_range_func(None, [(start, end)])
+    with report_stage("download"), yt_dlp.YoutubeDL(options) as ydl:
+        if info is not None:
+            downloaded_info = ydl.process_ie_result(info, download=True)
+        else:
+            downloaded_info = ydl.extract_info(url, download=True)
+    downloads = downloaded_info.get("requested_downloads") or []
+    if downloads and downloads[0].get("filepath"):
+        return downloads[0]["filepath"]
+    return find_cached_audio(range_path)
 
-def run_whisper(input_file= "audio.mp3", word_timestamps=False, model_name="large_v3"):
-    model = WhisperModel(model_name, device="cuda", compute_type="float16")
-    segments, info = model.transcribe(input_file, vad_filter=True, vad_parameters=dict(min_silence_duration_ms=100), word_timestamps=word_timestamps)
+def load_range_audio(url, video_id, start, end, video_cache_path, info=None):
+    """
+    Aralığın sesini, aralığın başlangıcı 0 olacak şekilde döndürür (dosya yolu ya da numpy dizisi).
+    Videonun tam sesi önbellekteyse yalnızca o bölüm okunur: .pcm için memmap dilimi, diğer kaplar için
+    ffmpeg ile aranarak çözülür. Değilse yalnızca bu bölüm indirilir.
+    """
+    full_audio = find_cached_audio(os.path.join(video_cache_path, "audio_files", video_id))
+    if full_audio is not None:
+        report_cache("audio", True)
+        if full_audio.endswith(".pcm"):
+            first = int(start * WHISPER_SAMPLING_RATE)
+            last = None if math.isinf(end) else int(end * WHISPER_SAMPLING_RATE)
+            return load_pcm(full_audio)[first:last]
+        return decode_audio_to_pcm(full_audio, start=start, end=end)
+
+    range_path = get_range_audio_path(video_id, start, end, video_cache_path)
+    with get_cache_manager(video_cache_path).lock(f"audio-{get_video_name(range_path)}"):
+        cached_audio = find_cached_audio(range_path)
+        report_cache("audio", cached_audio is not None)
+        if cached_audio is not None:
+            return cached_audio
+        print(Fore.YELLOW + f"Yalnızca {format_time_range(start, end)} aralığı indiriliyor...")
+        audio_path = download_audio_range(url, range_path, start, end, info=info)
+        prune_cache_safe(video_cache_path, keep=(audio_path,))
+    return audio_path
+
+# Süreç genelinde yüklü Whisper modelleri: (model, cihaz, hesaplama tipi, ...) -> WhisperModel
+_WHISPER_MODELS = OrderedDict()
+_WHISPER_MODELS_LOCK = threading.Lock()
+WHISPER_MAX_MODELS = int(os.getenv("AI_NOTER_WHISPER_MAX_MODELS", "2"))
+
+def detect_whisper_device():
+    """GPU varsa (cuda, float16), yoksa (cpu, int8) döndürür."""
+    try:
+        import ctranslate2
+        if ctranslate2.get_cuda_device_count() > 0:
+            return "cuda", "float16"
+    except Exception:
+        pass
+    return "cpu", "int8"
+
+def get_whisper_model(model_name="base", device=None, compute_type=None, cpu_threads=0, num_workers=1):
+    """Her (model, cihaz, hesaplama tipi) kombinasyonunu bir kez yükler ve LRU sınırıyla önbellekte tutar."""
+    if device is None or device == "auto":
+        detected_device, detected_compute_type = detect_whisper_device()
+        device = detected_device
+        compute_type = compute_type or detected_compute_type
+    if compute_type is None:
+        compute_type = "float16" if device == "cuda" else "int8"
+
+    key = (model_name, device, compute_type, cpu_threads, num_workers)
+    with _WHISPER_MODELS_LOCK:
+        if key in _WHISPER_MODELS:
+            _WHISPER_MODELS.move_to_end(key)
+            return _WHISPER_MODELS[key]
+
+        from faster_whisper import WhisperModel
+        with report_stage("whisper_load"):
+            model = WhisperModel(model_name, device=device, compute_type=compute_type, cpu_threads=cpu_threads, num_workers=num_workers)
+        _WHISPER_MODELS[key] = model
+        while len(_WHISPER_MODELS) > max(1, WHISPER_MAX_MODELS):
+            _WHISPER_MODELS.popitem(last=False)
+        return model
+
+def run_whisper(input_file= "audio.mp3", word_timestamps=False, model_name="large_v3", device=None, compute_type=None, cpu_threads=0, num_workers=1):
+    model = get_whisper_model(model_name, device=device, compute_type=compute_type, cpu_threads=cpu_threads, num_workers=num_workers)
+    segments, info = model.transcribe(load_audio(input_file), vad_filter=True, vad_parameters=VAD_PARAMETERS, word_timestamps=word_timestamps)
+    report_audio(info.duration)
     # segments, info = model.detect_language_multi_segment(input_file)
     # print("Detected language '{}' with probability {:.2f}".format(info.language, info.language_probability))
     return segments, info.language
 
+def split_audio_on_silence(audio, target_chunk_seconds=300, sampling_rate=WHISPER_SAMPLING_RATE):
+    """
+    Sesi, run_whisper'daki VAD ayarlarıyla bulunan konuşma aralarındaki sessizliklerden yaklaşık
+    target_chunk_seconds uzunluğunda parçalara böler. (başlangıç, bitiş) örnek indeksleri döndürür.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+    speech_timestamps = get_speech_timestamps(audio, VadOptions(**VAD_PARAMETERS), sampling_rate=sampling_rate)
+    if not speech_timestamps:
+        return []
+
+    target_samples = int(target_chunk_seconds * sampling_rate)
+    chunks = []
+    chunk_start = 0
+    last_speech_end = None
+    for speech in speech_timestamps:
+        if last_speech_end is not None and speech["start"] - chunk_start >= target_samples:
+            # Kesimi önceki konuşmanın bitişi ile bu konuşmanın başlangıcı arasındaki sessizliğin ortasına koy
+            boundary = (last_speech_end + speech["start"]) // 2
+            chunks.append((chunk_start, boundary))
+            chunk_start = boundary
+        last_speech_end = speech["end"]
+    chunks.append((chunk_start, len(audio)))
+    return chunks
+
+_TRANSCRIPTION_WORKER = {}
+
+def _init_transcription_worker(pcm_path, model_name, device, compute_type, cpu_threads):
+    _TRANSCRIPTION_WORKER["audio"] = load_pcm(pcm_path)
+    _TRANSCRIPTION_WORKER["model"] = get_whisper_model(model_name, device=device, compute_type=compute_type, cpu_threads=cpu_threads, num_workers=1)
+
+def _detect_chunk_language(bounds):
+    import numpy as np
+    start, end = bounds
+    language, _, _ = _TRANSCRIPTION_WORKER["model"].detect_language(np.array(_TRANSCRIPTION_WORKER["audio"][start:end]), vad_filter=True, vad_parameters=VAD_PARAMETERS)
+    return language
+
+def _transcribe_chunk(bounds, language, word_timestamps=True, sampling_rate=WHISPER_SAMPLING_RATE):
+    import numpy as np
+    start, end = bounds
+    audio = np.array(_TRANSCRIPTION_WORKER["audio"][start:end])
+    segments, _ = _TRANSCRIPTION_WORKER["model"].transcribe(audio, language=language, vad_filter=True, vad_parameters=VAD_PARAMETERS, word_timestamps=word_timestamps)
+    word_by_word_segments, senteces = print_segments(segments)
+    offset = start / sampling_rate
+    return offset_rows(word_by_word_segments, offset), offset_rows(senteces, offset)
+
+def run_whisper_parallel(input_file, model_name="base", processes=None, device=None, compute_type=None, language=None, chunk_seconds=None, video_cache_path=None):
+    """
+    Uzun bir ses dosyasını sessizlik sınırlarından parçalara bölüp her biri kendi modeline sahip bir süreç havuzunda
+    yazıya döker. Zaman damgaları parça ofsetleriyle düzeltilip birleştirilir.
+    print_segments ile aynı yapıda (word_by_word_segments, segments, language) döndürür.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    processes = processes or os.cpu_count() or 1
+
+    # İşçiler sesi kopyalamadan okuyabilsin diye tek seferlik PCM dosyasına çöz
+    temp_pcm = None
+    if isinstance(input_file, str) and input_file.endswith(".pcm"):
+        pcm_path = input_file
+    elif isinstance(input_file, str):
+        temp_dir = video_cache_path or os.path.dirname(os.path.abspath(input_file))
+        temp_pcm = os.path.join(temp_dir, f"{get_video_name(input_file)}.{os.getpid()}.parallel.pcm")
+        pcm_path = decode_audio_to_pcm(input_file, temp_pcm)
+    else:
+        # Bellekteki ses (ör. bir aralık dilimi) işçilerin paylaşması için dosyaya yazılır
+        import numpy as np
+        temp_pcm = os.path.join(video_cache_path or ".", f"audio.{os.getpid()}.parallel.pcm")
+        np.asarray(input_file, dtype=np.float32).tofile(temp_pcm)
+        pcm_path = temp_pcm
+
+    try:
+        audio = load_pcm(pcm_path)
+        duration = len(audio) / WHISPER_SAMPLING_RATE
+        report_audio(duration)
+        # Varsayılan: her sürece birkaç parça düşsün ki yük dengelensin
+        chunk_seconds = chunk_seconds or max(60.0, duration / (processes * 3))
+        chunks = split_audio_on_silence(audio, target_chunk_seconds=chunk_seconds)
+        if not chunks:
+            return [], [], language
+        processes = min(processes, len(chunks))
+        cpu_threads = max(1, (os.cpu_count() or 1) // processes)
+        print(Fore.YELLOW + f"Ses {len(chunks)} parçaya bölündü, {processes} süreçte yazıya dökülüyor...")
+
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_transcription_worker,
+                                 initargs=(pcm_path, model_name, device, compute_type, cpu_threads)) as executor:
+            if language is None:
+                # Parçalar arasında tutarlılık için dili bir kez tespit et
+                first_start, first_end = chunks[0]
+                language = executor.submit(_detect_chunk_language, (first_start, min(first_end, first_start + 30 * WHISPER_SAMPLING_RATE))).result()
+            results = list(executor.map(_transcribe_chunk, chunks, [language] * len(chunks)))
+    finally:
+        if temp_pcm is not None and os.path.exists(temp_pcm):
+            os.remove(temp_pcm)
+
+    word_by_word_segments = []
+    segments = []
+    for chunk_words, chunk_segments in results:
+        word_by_word_segments.extend(chunk_words)
+        segments.extend(chunk_segments)
+    return word_by_word_segments, segments, language
+
+# Sütunlu transkript deposu (<video>_transcript/ klasörü):
+#   segment_times.npy / word_times.npy   float32 (n, 2) başlangıç-bitiş süreleri
+#   segment_text.bin / word_text.bin     tüm metinler tek bir UTF-8 blob
+#   segment_offsets.npy / word_offsets.npy  int64 (n + 1) blob ofsetleri
+#   word_segment.npy                     int32 (m,) her kelimenin ait olduğu segment
+#   meta.json                            sürüm, dil, sayılar
+TRANSCRIPT_STORE_VERSION = 1
+
+def get_video_name(audio_path):
+    return os.path.basename(audio_path).split(".")[0]
+
+def get_transcript_cache_path(audio_path, video_cache_path):
+    """Eski pickle önbelleğinin yolu (yalnızca taşıma için kullanılır)."""
+    return os.path.join(video_cache_path, f"{get_video_name(audio_path)}_segments.pkl")
+
+def get_transcript_store_path(audio_path, video_cache_path):
+    return os.path.join(video_cache_path, f"{get_video_name(audio_path)}_transcript")
+
+def _encode_texts(texts):
+    import numpy as np
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(item) for item in encoded])
+    return b"".join(encoded), offsets
+
+def _times_array(rows):
+    import numpy as np
+    return np.array([[row[0], row[1]] for row in rows], dtype=np.float32).reshape(-1, 2)
+
+def save_transcript_store(store_path, word_by_word_segments, segments, language):
+    """
+    Transkripti geçici klasöre yazıp rename ile yerine koyar. Var olan depo önce kenara taşınır ve yenisi
+    yerleştikten sonra silinir; eski depo yeni depo yerleşmeden silinmez.
+    """
+    import numpy as np
+    temp_path = f"{store_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    os.makedirs(temp_path, exist_ok=True)
+
+    segment_times = _times_array(segments)
+    word_times = _times_array(word_by_word_segments)
+    segment_blob, segment_offsets = _encode_texts([segment[2] for segment in segments])
+    word_blob, word_offsets = _encode_texts([word[2] for word in word_by_word_segments])
+    # Her kelime, başlangıcı kelimenin başlangıcından önce olan son segmente aittir
+    word_segment = np.searchsorted(segment_times[:, 0], word_times[:, 0], side="right") - 1
+    word_segment = np.clip(word_segment, 0, None).astype(np.int32)
+
+    np.save(os.path.join(temp_path, "segment_times.npy"), segment_times)
+    np.save(os.path.join(temp_path, "word_times.npy"), word_times)
+    np.save(os.path.join(temp_path, "segment_offsets.npy"), segment_offsets)
+    np.save(os.path.join(temp_path, "word_offsets.npy"), word_offsets)
+    np.save(os.path.join(temp_path, "word_segment.npy"), word_segment)
+    with open(os.path.join(temp_path, "segment_text.bin"), "wb") as file:
+        file.write(segment_blob)
+    with open(os.path.join(temp_path, "word_text.bin"), "wb") as file:
+        file.write(word_blob)
+    with open(os.path.join(temp_path, "meta.json"), "w") as file:
+        json.dump({"version": TRANSCRIPT_STORE_VERSION, "language": language,
+                   "segments": len(segments), "words": len(word_by_word_segments)}, file)
+
+    old_path = f"{store_path}.{os.getpid()}.{threading.get_ident()}.old"
+    for attempt in range(10):
+        try:
+            os.replace(store_path, old_path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.replace(temp_path, store_path)
+            break
+        except OSError as e:
+            # Başka bir yazar kenara taşıma ile yerleştirme arasında kendi deposunu koydu; onu da kenara al
+            if e.errno not in (errno.ENOTEMPTY, errno.EEXIST) or attempt == 9:
+                shutil.rmtree(temp_path, ignore_errors=True)
+                raise
+            shutil.rmtree(old_path, ignore_errors=True)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return store_path
+
+class TranscriptStore:
+    """
+    Sütunlu transkript deposunu memmap ile açar. Açılış yalnızca dosya eşlemesi yapar;
+    zaman aralığı sorguları tüm transkripti Python nesnelerine dönüştürmeden çalışır.
+    """
+    def __init__(self, store_path):
+        import numpy as np
+        self.path = store_path
+        with open(os.path.join(store_path, "meta.json"), "r") as file:
+            self.meta = json.load(file)
+        self.language = self.meta.get("language")
+        self.segment_times = np.load(os.path.join(store_path, "segment_times.npy"), mmap_mode="r")
+        self.word_times = np.load(os.path.join(store_path, "word_times.npy"), mmap_mode="r")
+        self.segment_offsets = np.load(os.path.join(store_path, "segment_offsets.npy"), mmap_mode="r")
+        self.word_offsets = np.load(os.path.join(store_path, "word_offsets.npy"), mmap_mode="r")
+        self.word_segment = np.load(os.path.join(store_path, "word_segment.npy"), mmap_mode="r")
+        self.segment_blob = self._map_blob(os.path.join(store_path, "segment_text.bin"))
+        self.word_blob = self._map_blob(os.path.join(store_path, "word_text.bin"))
+
+    @staticmethod
+    def _map_blob(path):
+        import numpy as np
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(path, dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return len(self.segment_times)
+
+    @staticmethod
+    def _text(blob, offsets, index):
+        return blob[offsets[index]:offsets[index + 1]].tobytes().decode("utf-8")
+
+    def segment(self, index):
+        start, end = self.segment_times[index]
+        return [float(start), float(end), self._text(self.segment_blob, self.segment_offsets, index)]
+
+    def word(self, index):
+        start, end = self.word_times[index]
+        return [float(start), float(end), self._text(self.word_blob, self.word_offsets, index)]
+
+    def _range(self, times, start, end, starting=False):
+        import numpy as np
+        # Sınırlar float64 karşılaştırılır, böylece sonuç float32 sütunlardan üretilen listelerle aynıdır
+        start, end = np.float64(start), np.float64(end)
+        # Başlangıçlar sıralı; bitişler için kümülatif maksimum ile sıralı bir üst sınır elde edilir
+        upper = int(np.searchsorted(times[:, 0], end, side="left"))
+        if starting:
+            return int(np.searchsorted(times[:upper, 0], start, side="left")), upper
+        lower = int(np.searchsorted(np.maximum.accumulate(times[:upper, 1]), start, side="right")) if upper else 0
+        return lower, upper
+
+    def segments_between(self, start, end, starting=False):
+        """
+        [start, end) aralığıyla kesişen segmentleri döndürür. starting=True ise yalnızca başlangıcı aralıkta
+        olanlar seçilir (slice_transcript ile aynı); bitişik aralıklar böylece aynı segmenti iki kez almaz.
+        """
+        lower, upper = self._range(self.segment_times, start, end, starting)
+        return [self.segment(index) for index in range(lower, upper)]
+
+    def words_between(self, start, end, starting=False):
+        lower, upper = self._range(self.word_times, start, end, starting)
+        return [self.word(index) for index in range(lower, upper)]
+
+    def words_of_segment(self, index):
+        import numpy as np
+        lower = int(np.searchsorted(self.word_segment, index, side="left"))
+        upper = int(np.searchsorted(self.word_segment, index, side="right"))
+        return [self.word(word_index) for word_index in range(lower, upper)]
+
+    def full_text(self):
+        return self.segment_blob.tobytes().decode("utf-8")
+
+    @staticmethod
+    def _rows(times, blob, offsets):
+        raw = blob.tobytes()
+        offset_list = offsets.tolist()
+        return [[start, end, raw[offset_list[index]:offset_list[index + 1]].decode("utf-8")]
+                for index, (start, end) in enumerate(times.tolist())]
+
+    def to_lists(self):
+        """Eski kod yolları için (word_by_word_segments, segments, language) listelerini üretir."""
+        segments = self._rows(self.segment_times, self.segment_blob, self.segment_offsets)
+        word_by_word_segments = self._rows(self.word_times, self.word_blob, self.word_offsets)
+        return word_by_word_segments, segments, self.language
+
+def migrate_segments_pickle(pkl_path, store_path=None):
+    """Eski <video>_segments.pkl dosyasını sütunlu depoya çevirir ve pickle'ı siler."""
+    if store_path is None:
+        store_path = pkl_path[:-len("_segments.pkl")] + "_transcript"
+    with open(pkl_path, "rb") as file:
+        word_by_word_segments, segments, language = pkl.load(file)
+    save_transcript_store(store_path, word_by_word_segments, segments, language)
+    os.remove(pkl_path)
+    return store_path
+
+def migrate_all_segment_pickles(video_cache_path):
+    migrated = []
+    for name in sorted(os.listdir(video_cache_path)):
+        if name.endswith("_segments.pkl"):
+            try:
+                migrated.append(migrate_segments_pickle(os.path.join(video_cache_path, name)))
+            except Exception as e:
+                print(Fore.RED + f"{name} taşınamadı:", e)
+    return migrated
+
+def load_transcript_store(audio_path, video_cache_path):
+    """Sütunlu depoyu açar; yalnızca eski pickle varsa önce bir kerelik taşıma yapar. Yoksa None."""
+    store_path = get_transcript_store_path(audio_path, video_cache_path)
+    if not os.path.exists(os.path.join(store_path, "meta.json")):
+        pkl_path = get_transcript_cache_path(audio_path, video_cache_path)
+        if not os.path.exists(pkl_path):
+            return None
+        migrate_segments_pickle(pkl_path, store_path)
+    return TranscriptStore(store_path)
+
+def open_transcript_store(audio_path, video_cache_path):
+    """Depoyu listelere çevirmeden açar (zaman aralığı sorguları için); yoksa ya da okunamıyorsa None."""
+    try:
+        store = load_transcript_store(audio_path, video_cache_path)
+    except (OSError, ValueError, EOFError, pkl.UnpicklingError) as e:
+        print(Fore.YELLOW + f"Bozuk transkript önbelleği yok sayılıyor ({get_video_name(audio_path)}):", e)
+        return None
+    if store is not None:
+        CacheManager.touch(store.path)
+    return store
+
+def load_transcript_cache(audio_path, video_cache_path, title=None):
+    """
+    Önbellekte transkript varsa (word_by_word_segments, segments, language) döndürür, yoksa None.
+    Okunamayan (ör. yarıda kalmış eski bir yazmadan kalan) kayıt önbellekte yokmuş gibi ele alınır.
+    İndeks kurulmadan önce önbelleğe alınmış transkriptler ilk yüklendiklerinde arama indeksine eklenir.
+    """
+    try:
+        store = load_transcript_store(audio_path, video_cache_path)
+        transcript = store.to_lists() if store is not None else None
+    except (OSError, ValueError, EOFError, pkl.UnpicklingError) as e:
+        print(Fore.YELLOW + f"Bozuk transkript önbelleği yok sayılıyor ({get_video_name(audio_path)}):", e)
+        return None
+    if transcript is not None:
+        CacheManager.touch(get_transcript_store_path(audio_path, video_cache_path))
+        if not is_video_indexed_safe(get_video_name(audio_path)):
+            save_transcript_index(audio_path, transcript, title)
+    return transcript
+
+def save_transcript_index(audio_path, transcript, title=None):
+    """Transkripti arama indeksine ekler; indeks hataları ana akışı durdurmaz."""
+    word_by_word_segments, segments, language = transcript
+    try:
+        index_transcript(get_video_name(audio_path), title, word_by_word_segments, segments, language)
+    except Exception as e:
+        print(Fore.YELLOW + "Transkript arama indeksine eklenemedi:", e)
+
+def save_transcript_cache(audio_path, video_cache_path, word_by_word_segments, segments, language, title=None):
+    store_path = get_transcript_store_path(audio_path, video_cache_path)
+    save_transcript_store(store_path, word_by_word_segments, segments, language)
+    # Meta verideki transcript_path yalnızca videonun tam Whisper transkriptini gösterir
+    if not split_range_name(get_video_name(audio_path))[1] and split_caption_name(get_video_name(audio_path))[1] is None:
+        update_video_metadata_safe(get_video_name(audio_path), video_cache_path, transcript_path=store_path)
+    save_transcript_index(audio_path, (word_by_word_segments, segments, language), title)
+
+# Tüm önbelleğe alınmış transkript ve notlar için kalıcı tam metin indeksi (SQLite FTS5)
+SEARCH_INDEX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (video_id TEXT PRIMARY KEY, title TEXT, language TEXT, indexed_at REAL);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    text, video_id UNINDEXED, segment_index UNINDEXED, start UNINDEXED, end UNINDEXED,
+    tokenize = "unicode61 remove_diacritics 2"
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(text, video_id UNINDEXED, tokenize = "unicode61 remove_diacritics 2");
+CREATE TABLE IF NOT EXISTS words (video_id TEXT, segment_index INTEGER, start REAL, end REAL, word TEXT);
+CREATE INDEX IF NOT EXISTS words_by_segment ON words (video_id, segment_index);
+"""
+
+def get_search_index_path():
+    return os.path.join(get_cache_dir(), "search_index.sqlite3")
+
+def open_search_index(index_path=None):
+    import sqlite3
+    connection = sqlite3.connect(index_path or get_search_index_path(), timeout=30)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SEARCH_INDEX_SCHEMA)
+    return connection
+
+def index_transcript(video_id, title, word_by_word_segments, segments, language, index_path=None):
+    """Videonun segmentlerini ve kelime zaman damgalarını indekse yazar (varsa eski kayıtların yerine)."""
+    segment_starts = [segment[0] for segment in segments]
+    connection = open_search_index(index_path)
+    try:
+        with connection:
+            connection.execute("DELETE FROM segments_fts WHERE video_id = ?", (video_id,))
+            connection.execute("DELETE FROM words WHERE video_id = ?", (video_id,))
+            connection.execute(
+                "INSERT INTO videos (video_id, title, language, indexed_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(video_id) DO UPDATE SET title = COALESCE(excluded.title, videos.title), language = excluded.language, indexed_at = excluded.indexed_at",
+                (video_id, title, language, time.time()),
+            )
+            connection.executemany(
+                "INSERT INTO segments_fts (text, video_id, segment_index, start, end) VALUES (?, ?, ?, ?, ?)",
+                ((segment[2], video_id, index, segment[0], segment[1]) for index, segment in enumerate(segments)),
+            )
+            connection.executemany(
+                "INSERT INTO words (video_id, segment_index, start, end, word) VALUES (?, ?, ?, ?, ?)",
+                ((video_id, max(bisect.bisect_right(segment_starts, word[0]) - 1, 0), word[0], word[1], word[2]) for word in word_by_word_segments),
+            )
+    finally:
+        connection.close()
+
+def index_notes(video_id, notes, index_path=None):
+    connection = open_search_index(index_path)
+    try:
+        with connection:
+            connection.execute("DELETE FROM notes_fts WHERE video_id = ?", (video_id,))
+            connection.execute("INSERT INTO notes_fts (text, video_id) VALUES (?, ?)", (notes, video_id))
+    finally:
+        connection.close()
+
+def is_video_indexed(video_id, index_path=None):
+    connection = open_search_index(index_path)
+    try:
+        return connection.execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone() is not None
+    finally:
+        connection.close()
+
+def is_video_indexed_safe(video_id):
+    try:
+        return is_video_indexed(video_id)
+    except Exception:
+        return True
+
+def to_fts_query(query):
+    """Kullanıcı sorgusunu FTS5 sözdizimine güvenli şekilde çevirir (her terim tırnaklı, son terim önek eşleşmeli)."""
+    terms = tokenize_query(query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms[:-1]) + (" " if len(terms) > 1 else "") + f'"{terms[-1]}"*'
+
+def strip_diacritics(text):
+    """FTS5'in remove_diacritics davranışına benzer şekilde aksanları atar (ör. ğ -> g, ü -> u)."""
+    return "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+
+def tokenize_query(query):
+    return [term.replace('"', '""') for term in re.findall(r"\w+", query.casefold())]
+
+def search_index(query, limit=20, include_notes=True, index_path=None):
+    """
+    Transkriptlerde (ve notlarda) arar. Her transkript sonucu video id, başlık, segment zaman aralığı,
+    vurgulanmış parça ve sorgu terimleriyle eşleşen kelimelerin zaman damgalarını içerir.
+    """
+    fts_query = to_fts_query(query)
+    if fts_query is None:
+        return []
+    terms = [strip_diacritics(term) for term in tokenize_query(query)]
+    connection = open_search_index(index_path)
+    try:
+        rows = connection.execute(
+            "SELECT s.video_id, v.title, s.segment_index, s.start, s.end, snippet(segments_fts, 0, '[', ']', '…', 16) "
+            "FROM segments_fts s LEFT JOIN videos v ON v.video_id = s.video_id "
+            "WHERE segments_fts MATCH ? ORDER BY bm25(segments_fts) LIMIT ?",
+            (fts_query, limit),
+        ).fetchall()
+        results = []
+        for video_id, title, segment_index, start, end, snippet in rows:
+            words = connection.execute(
+                "SELECT start, end, word FROM words WHERE video_id = ? AND segment_index = ? ORDER BY start",
+                (video_id, segment_index),
+            ).fetchall()
+            matched_words = [[word_start, word_end, word.strip()] for word_start, word_end, word in words
+                             if any(token.startswith(term) for term in terms for token in re.findall(r"\w+", strip_diacritics(word.casefold())))]
+            results.append({"type": "transcript", "video_id": video_id, "title": title, "start": start, "end": end,
+                            "snippet": snippet, "words": matched_words})
+
+        if include_notes:
+            note_rows = connection.execute(
+                "SELECT n.video_id, v.title, snippet(notes_fts, 0, '[', ']', '…', 16) "
+                "FROM notes_fts n LEFT JOIN videos v ON v.video_id = n.video_id "
+                "WHERE notes_fts MATCH ? ORDER BY bm25(notes_fts) LIMIT ?",
+                (fts_query, limit),
+            ).fetchall()
+            results += [{"type": "notes", "video_id": video_id, "title": title, "snippet": snippet} for video_id, title, snippet in note_rows]
+        return results
+    finally:
+        connection.close()
+
+def reindex_cache(video_cache_path, index_path=None):
+    """Önbellekteki tüm transkript depolarını ve notları indekse (yeniden) yazar."""
+    count = 0
+    for name in sorted(os.listdir(video_cache_path)):
+        if not name.endswith("_transcript"):
+            continue
+        video_id = name[:-len("_transcript")]
+        try:
+            word_by_word_segments, segments, language = TranscriptStore(os.path.join(video_cache_path, name)).to_lists()
+        except (OSError, ValueError) as e:
+            print(Fore.RED + f"{name} okunamadı:", e)
+            continue
+        index_transcript(video_id, None, word_by_word_segments, segments, language, index_path=index_path)
+        note_path = os.path.join(video_cache_path, f"{video_id}_notes.txt")
+        if os.path.exists(note_path):
+            with open(note_path, "r") as file:
+                index_notes(video_id, file.read(), index_path=index_path)
+        count += 1
+    return count
+
+def transcribe_with_cache(audio_path, video_cache_path, model_name="base", device=None, compute_type=None, cpu_threads=0, num_workers=1, title=None, parallel_processes=0,
+                          audio=None, offset=0.0, consume=None):
+    """
+    Önbellekte transkript varsa onu yükler, yoksa Whisper çalıştırıp sonucu önbelleğe yazar.
+    audio verilirse Whisper'a o ses verilir ve audio_path yalnızca önbellek anahtarıdır;
+    offset zaman damgalarına eklenir (aralık sesleri için aralığın başlangıcı).
+    consume verilirse Whisper'ın tembel segment üreteci consume(segmentler, dil) ile tüketilir (ör. artımlı
+    özetleme); consume yalnızca önbellek ıskalandığında çağrılır ve (word_by_word_segments, segments) döndürür.
+    """
+    cached = load_transcript_cache(audio_path, video_cache_path, title=title)
+    if cached is None:
+        # Aynı sesi yazıya döken başka bir süreç varsa onu bekle ve sonucunu önbellekten oku
+        with get_cache_manager(video_cache_path).lock(f"transcript-{get_video_name(audio_path)}"):
+            cached = load_transcript_cache(audio_path, video_cache_path, title=title)
+            if cached is None:
+                report_cache("segments", False)
+                return _transcribe_and_cache(audio_path, video_cache_path, model_name, device, compute_type, cpu_threads, num_workers,
+                                             title, parallel_processes, audio, offset, consume)
+    report_cache("segments", True)
+    return cached
+
+def _transcribe_and_cache(audio_path, video_cache_path, model_name, device, compute_type, cpu_threads, num_workers, title, parallel_processes, audio, offset, consume=None):
+    if parallel_processes > 1:
+        if consume is not None:
+            raise ValueError("Segmentleri geldikçe tüketmek paralel süreçlerle birlikte kullanılamaz.")
+        with report_stage("transcribe"):
+            word_by_word_segments, segments, language = run_whisper_parallel(audio_path if audio is None else audio, model_name=model_name, processes=parallel_processes, device=device,
+                                                                             compute_type=compute_type, video_cache_path=video_cache_path)
+    else:
+        # Model yükleme süresi gerçek zaman faktörüne karışmasın diye ayrı aşamada ölçülür
+        get_whisper_model(model_name, device=device, compute_type=compute_type, cpu_threads=cpu_threads, num_workers=num_workers)
+        with report_stage("transcribe"):
+            word_segments, language = run_whisper(input_file=audio_path if audio is None else audio, word_timestamps=True, model_name=model_name, device=device,
+                                                  compute_type=compute_type, cpu_threads=cpu_threads, num_workers=num_workers)
+            if consume is None:
+                word_by_word_segments, segments = print_segments(word_segments)
+        if consume is not None:
+            # Üreteç tüketilirken Whisper çalışır; consume kendi aşamasını ölçer
+            word_by_word_segments, segments = consume(word_segments, language)
+    if offset:
+        word_by_word_segments, segments = offset_rows(word_by_word_segments, offset), offset_rows(segments, offset)
+    save_transcript_cache(audio_path, video_cache_path, word_by_word_segments, segments, language, title=title)
+    return word_by_word_segments, segments, language
+
+def transcribe_time_ranges(url, video_id, ranges, video_cache_path, info=None, title=None, **whisper_options):
+    """
+    Yalnızca verilen aralıkları yazıya döker ve birleştirir; zaman damgaları videonun başına göredir.
+    Önbellekteki tam ya da aralık transkriptlerinin kapsadığı kısımlar yeniden kullanılır, Whisper yalnızca
+    kapsanmayan parçalarda çalışır ve her parça kendi aralık anahtarıyla önbelleğe yazılır.
+    Önbellekteki depolardan yalnızca parçaya düşen satırlar okunur; bellek ve süre seçilen süreyle ölçeklenir.
+    """
+    word_by_word_segments, segments, language = [], [], None
+    stores = {}
+    for start, end in ranges:
+        for piece_start, piece_end, key in plan_range_pieces(find_cached_range_transcripts(video_id, video_cache_path), start, end):
+            if key is not None and key not in stores:
+                stores[key] = open_transcript_store(key, video_cache_path)
+                if stores[key] is not None:
+                    report_cache("segments", True)
+            if key is None or stores[key] is None:
+                key = get_range_audio_path(video_id, piece_start, piece_end, video_cache_path)
+                audio = load_range_audio(url, video_id, piece_start, piece_end, video_cache_path, info=info)
+                transcript = transcribe_with_cache(key, video_cache_path, title=title, audio=audio, offset=piece_start, **whisper_options)
+                piece_words, piece_segments, piece_language = slice_transcript(transcript, [(piece_start, piece_end)])
+            else:
+                store = stores[key]
+                piece_words = store.words_between(piece_start, piece_end, starting=True)
+                piece_segments = store.segments_between(piece_start, piece_end, starting=True)
+                piece_language = store.language
+            word_by_word_segments += piece_words
+            segments += piece_segments
+            language = language or piece_language
+    return word_by_word_segments, segments, language
+
+_YOUTUBE_ID_PATTERN = re.compile(r"(?:v=|youtu\.be/|/shorts/|/embed/|/live/|/v/)([A-Za-z0-9_-]{11})(?![A-Za-z0-9_-])")
+
+def parse_youtube_video_id(url):
+    """Tek video bağlantısından ağa çıkmadan 11 karakterlik video kimliğini çıkarır, bulamazsa None döndürür."""
+    if re.fullmatch(r"[A-Za-z0-9_-]{11}", url.strip()):
+        return url.strip()
+    match = _YOUTUBE_ID_PATTERN.search(url)
+    return match.group(1) if match else None
+
+def is_collection_url(url):
+    """Playlist/kanal bağlantılarını tek video bağlantılarından ayırır."""
+    if "list=" in url and "v=" not in url:
+        return True
+    return any(part in url for part in ("/playlist", "/@", "/channel/", "/c/", "/user/"))
+
+def _flat_entries_to_urls(entries, ydl):
+    urls = []
+    for entry in entries or []:
+        if not entry:
+            continue
+        if entry.get("entries") is not None:
+            urls.extend(_flat_entries_to_urls(entry["entries"], ydl))
+        elif entry.get("ie_key") == "YoutubeTab" or entry.get("_type") == "playlist":
+            # Kanal sekmeleri (Videos, Shorts...) ayrı playlist olarak döner
+            tab = ydl.extract_info(entry["url"], download=False)
+            urls.extend(_flat_entries_to_urls(tab.get("entries"), ydl))
+        elif entry.get("id") and entry.get("ie_key", "Youtube") == "Youtube":
+            urls.append(f"https://www.youtube.com/watch?v={entry['id']}")
+        elif entry.get("url"):
+            urls.append(entry["url"])
+    return urls
+
+def expand_urls(inputs):
+    """URL listesi, URL içeren dosyalar ve playlist/kanal bağlantılarını tekil video URL'lerine açar."""
+    urls = []
+    for item in inputs:
+        item = item.strip()
+        if not item or item.startswith("#"):
+            continue
+        if os.path.isfile(item):
+            with open(item, "r", encoding="utf-8") as file:
+                urls.extend(expand_urls(file.read().splitlines()))
+        elif is_collection_url(item):
+            try:
+                with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'extract_flat': 'in_playlist'}) as ydl:
+                    info = ydl.extract_info(item, download=False)
+                    urls.extend(_flat_entries_to_urls(info.get("entries"), ydl))
+            except Exception as e:
+                print(Fore.RED + f"Playlist bilgileri alınamadı ({item}):", e)
+        else:
+            urls.append(item)
+    # Sırayı koruyarak tekrarları ayıkla
+    return list(dict.fromkeys(urls))
+
+_PIPELINE_STOP = object()
+
+def run_pipeline(items, stages, queue_size=2):
+    """
+    Öğeleri sınırlı kuyruklarla bağlı aşamalardan geçirir.
+    stages: (isim, fonksiyon, işçi sayısı) listesi. Her aşama kendi eşzamanlılık sınırıyla çalışır,
+    böylece indirme, transkripsiyon ve LLM çağrıları birbiriyle örtüşür.
+    Girdi sırasıyla (sonuç, hata) listesi döndürür; hata (aşama ismi, istisna) şeklindedir.
+    """
+    for name, _, workers in stages:
+        if workers < 1:
+            raise ValueError(f"'{name}' aşamasının işçi sayısı en az 1 olmalıdır (verilen: {workers}).")
+    if queue_size < 1:
+        raise ValueError(f"Kuyruk boyutu en az 1 olmalıdır (verilen: {queue_size}).")
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages] + [queue.Queue()]
+
+    def feeder():
+        for index, item in enumerate(items):
+            queues[0].put((index, item, None))
+        for _ in range(stages[0][2]):
+            queues[0].put(_PIPELINE_STOP)
+
+    def worker(stage_index):
+        name, func, _ = stages[stage_index]
+        in_queue, out_queue = queues[stage_index], queues[stage_index + 1]
+        while True:
+            job = in_queue.get()
+            if job is _PIPELINE_STOP:
+                break
+            index, value, error = job
+            if error is None:
+                try:
+                    value = func(value)
+                except Exception as e:
+                    print(Fore.RED + f"[{name}] Hata:", e)
+                    error = (name, e)
+            out_queue.put((index, value, error))
+
+    def run_stage(stage_index):
+        workers = [threading.Thread(target=worker, args=(stage_index,), daemon=True) for _ in range(stages[stage_index][2])]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        # Sonraki aşamanın işçilerine bitiş sinyali gönder
+        next_workers = stages[stage_index + 1][2] if stage_index + 1 < len(stages) else 1
+        for _ in range(next_workers):
+            queues[stage_index + 1].put(_PIPELINE_STOP)
+
+    threads = [threading.Thread(target=feeder, daemon=True)]
+    threads += [threading.Thread(target=run_stage, args=(i,), daemon=True) for i in range(len(stages))]
+    for thread in threads:
+        thread.start()
+
+    results = {}
+    while True:
+        job = queues[-1].get()
+        if job is _PIPELINE_STOP:
+            break
+        index, value, error = job
+        results[index] = (value, error)
+    for thread in threads:
+        thread.join()
+    return [results[index] for index in sorted(results)]
+
+def iter_segment_windows(segments, window_seconds=300, log=True):
+    """
+    faster-whisper'ın tembel segment üretecini akış halinde tüketir, segmentleri anlık yazdırır
+    ve her zaman penceresi tamamlandığında (word_by_word, segments) çiftini verir.
+    """
+    word_by_word = []
+    senteces = []
+    window_start = None
+
+    for segment in segments:
+        if window_start is None:
+            window_start = segment.start
+        for word in segment.words or []:
+            word_by_word.append([word.start, word.end, word.word])
+        if log:
+            print("[%.2fs -> %.2fs] %s" % (segment.start, segment.end, segment.text))
+        senteces.append([segment.start, segment.end, segment.text])
+
+        if segment.end - window_start >= window_seconds:
+            yield word_by_word, senteces
+            word_by_word = []
+            senteces = []
+            window_start = None
+
+    if senteces:
+        yield word_by_word, senteces
+
+def model_to_answer_incremental(segments, model_name='gemini-1.5-flash', language="tr", provider="openrouter", api_key=None, window_seconds=300, max_workers=4, max_tokens=6000,
+                                compact=0, stream=False):
+    """
+    Transkripsiyon sürerken her tamamlanan zaman penceresini hemen LLM'e gönderir ve kısmi notları yazdırır.
+    Son notlar pencere özetlerinden birleştirilir. (word_by_word_segments, segments, notes) döndürür.
+    """
+    word_by_word_segments = []
+    all_segments = []
+    chunk_prompt = get_chunk_prompt(language)
+    print_lock = threading.Lock()
+
+    def print_partial(future, time_range):
+        if future.exception() is not None:
+            return
+        with print_lock:
+            print(Fore.CYAN + f"\nKısmi notlar {time_range}:\n", future.result())
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for words, window in iter_segment_windows(segments, window_seconds=window_seconds):
+            word_by_word_segments.extend(words)
+            all_segments.extend(window)
+            text = chunk_to_text(compact_segments(window, language=language, level=compact))
+            future = executor.submit(bind_run_report(model_to_answer_choose), text, model_name=model_name, prompt=chunk_prompt, language=language, provider=provider, api_key=api_key)
+            future.add_done_callback(lambda f, time_range=text.split("\n", 1)[0]: print_partial(f, time_range))
+            futures.append(future)
+        partial_notes = [future.result() or "" for future in futures]
+
+    if len(partial_notes) == 1:
+        return word_by_word_segments, all_segments, partial_notes[0]
+    if stream:
+        print(Fore.CYAN + "Notes: ")
+    notes = reduce_notes(partial_notes, model_name, language=language, provider=provider, api_key=api_key, max_tokens=max_tokens, max_workers=max_workers, stream=stream)
+    return word_by_word_segments, all_segments, notes
+
+def split_long_paragraph(paragraph, max_tokens):
+    """Bütçeyi aşan paragrafı cümle sınırlarından, tek cümle de sığmıyorsa karakter sınırından böler."""
+    pieces = []
+    current = ""
+    for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+        while estimate_tokens(sentence) > max_tokens:
+            pieces.append(sentence[:max_tokens * 4])
+            sentence = sentence[max_tokens * 4:]
+        if current and estimate_tokens(current + sentence) > max_tokens:
+            pieces.append(current)
+            current = ""
+        current += sentence + " "
+    if current.strip():
+        pieces.append(current)
+    return pieces
+
+def iter_text_chunks(lines, max_tokens=6000, spool=None):
+    """
+    Metni satır satır okur ve paragraf sınırlarında token bütçesini aşmayan parçalar verir.
+    Bellekte en fazla bir parça tutulur; spool verilirse okunan metin aynı anda bu dosyaya yazılır.
+    """
+    current = []
+    current_tokens = 0
+    paragraph = []
+
+    def add(text):
+        nonlocal current, current_tokens
+        for piece in ([text] if estimate_tokens(text) <= max_tokens else split_long_paragraph(text, max_tokens)):
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                yield "\n\n".join(current)
+                current = []
+                current_tokens = 0
+            current.append(piece.strip())
+            current_tokens += tokens
+
+    for line in lines:
+        if spool is not None:
+            spool.write(line)
+        if line.strip():
+            paragraph.append(line.rstrip("\n"))
+        elif paragraph:
+            yield from add("\n".join(paragraph))
+            paragraph = []
+    if paragraph:
+        yield from add("\n".join(paragraph))
+    if current:
+        yield "\n\n".join(current)
+
+def model_to_answer_text_stream(lines, model_name='gemini-1.5-flash', language="tr", provider="openrouter", api_key=None, max_tokens=6000, max_workers=4, spool=None, stream=False):
+    """
+    Çok uzun metni (ör. yapıştırılan belge) okunurken parçalar ve parçaları paralel özetler, ardından birleştirir.
+    Okuma, işlenmeyi bekleyen parça sayısı max_workers * 2 ile sınırlı tutularak yapılır. (notlar, parça sayısı) döndürür.
+    """
+    chunks = iter_text_chunks(lines, max_tokens=max_tokens, spool=spool)
+    first = next(chunks, None)
+    if first is None:
+        return None, 0
+    second = next(chunks, None)
+    if second is None:
+        return model_to_answer_choose(first, model_name=model_name, prompt=None, language=language, provider=provider, api_key=api_key, stream=stream), 1
+
+    chunk_prompt = get_chunk_prompt(language)
+    in_flight = threading.BoundedSemaphore(max_workers * 2)
+    label = "Bölüm" if language == "tr" else "Part"
+    futures = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for index, text in enumerate(itertools.chain([first, second], chunks), start=1):
+            in_flight.acquire()
+            future = executor.submit(bind_run_report(model_to_answer_choose), f"[{label} {index}]\n{text}", model_name=model_name, prompt=chunk_prompt,
+                                     language=language, provider=provider, api_key=api_key)
+            future.add_done_callback(lambda _: in_flight.release())
+            futures.append(future)
+            print(Fore.YELLOW + f"\r{index} parça okundu...", end="", flush=True)
+        print()
+        partial_notes = [future.result() or "" for future in futures]
+
+    print(Fore.YELLOW + f"Metin {len(partial_notes)} parça halinde özetlendi, notlar birleştiriliyor...")
+    if stream:
+        print(Fore.CYAN + "Notes: ")
+    notes = reduce_notes(partial_notes, model_name, language=language, provider=provider, api_key=api_key, max_tokens=max_tokens, max_workers=max_workers, stream=stream)
+    return notes, len(partial_notes)
+
+# Yapıştırılan metinlerin geçmişi: her yapıştırma history.jsonl'e bir satır, metnin kendisi texts/<id>.txt dosyasına
+def get_paste_dir():
+    paste_dir = os.path.join(get_cache_dir(), "paste_notes")
+    os.makedirs(os.path.join(paste_dir, "texts"), exist_ok=True)
+    return paste_dir
+
+def get_paste_history_path():
+    return os.path.join(get_paste_dir(), "history.jsonl")
+
+def new_paste_id():
+    return time.strftime("%Y%m%d-%H%M%S") + f"-{random.randrange(16 ** 4):04x}"
+
+def get_paste_text_path(paste_id):
+    return os.path.join(get_paste_dir(), "texts", f"{paste_id}.txt")
+
+def append_paste_record(record):
+    """Kaydı geçmişe tek satır olarak ekler; önceki kayıtlar yeniden yazılmaz."""
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with open(get_paste_history_path(), "a", encoding="utf-8") as file:
+        file.write(line)
+
+def iter_lines_reversed(path, block_size=65536):
+    """Dosyanın satırlarını sondan başa okur; büyük geçmiş dosyasının tamamı belleğe alınmaz."""
+    with open(path, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        position = file.tell()
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            file.seek(position)
+            lines = (file.read(read_size) + remainder).split(b"\n")
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line.strip():
+                    yield line.decode("utf-8")
+        if remainder.strip():
+            yield remainder.decode("utf-8")
+
+def load_paste_record(paste_id=None):
+    """Verilen kimliğin (verilmezse en son yapıştırmanın) en güncel kaydını döndürür, yoksa None."""
+    history_path = get_paste_history_path()
+    if not os.path.exists(history_path):
+        return None
+    for line in iter_lines_reversed(history_path):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if paste_id is None or record.get("id") == paste_id:
+            return record
+    return None
+
 def print_segments(segments, log=False):
     word_by_word = []
     senteces = []